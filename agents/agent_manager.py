@@ -1,52 +1,228 @@
+import os
+import time
 import asyncio
+import itertools
+from collections import defaultdict, deque
 from llm_chat.chat_handler import ChatHandler
 from auto_coder.code_generator import CodeGenerator
+from auto_coder.executor import CodeExecutor
+from llm_chat.health import ResiliencePolicy, use_policy
+from utils.tracing import start_span, current_span
+
+DEFAULT_NUM_WORKERS = 8
+# Upper bound of simultaneously running tasks per type
+DEFAULT_CONCURRENCY_LIMITS = {"chat": 8, "generate_code": 4, "improve_code": 4, "generate_module": 8}
+# Lower runs first; interactive chat goes ahead of bulk code generation
+DEFAULT_PRIORITIES = {"chat": 0, "improve_code": 1, "plan_project": 1, "generate_code": 2, "generate_module": 2}
+
+def default_policies():
+    """Resilience policies per task type; none unless THOTH_BACKUP_MODEL names a backup model.
+
+    Chat is hedged (a second request after the primary's p95, or for a streamed reply
+    once its first token is later than usual) since someone is waiting on it; code tasks, whose long generations would double the cost, only fail over.
+    """
+    backup_model = os.getenv("THOTH_BACKUP_MODEL")
+    if not backup_model:
+        return {}
+    return {
+        "chat": ResiliencePolicy(backup_model, hedge=True, max_retries=1),
+        "generate_code": ResiliencePolicy(backup_model, max_retries=2),
+        "improve_code": ResiliencePolicy(backup_model, max_retries=2),
+        "plan_project": ResiliencePolicy(backup_model, max_retries=2),
+        "generate_module": ResiliencePolicy(backup_model, max_retries=2),
+    }
+
+class TaskHandle:
+    """Handle to a scheduled task. Await it (or `result()`) for `(result, usage)`."""
+
+    def __init__(self, task_id, task_type, priority, kwargs):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.priority = priority
+        self.kwargs = kwargs
+        # Workers run in their own tasks, so the caller's span is carried over explicitly
+        self.parent_span = current_span()
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(self._on_done)
+        self._task = None
+
+    def _on_done(self, future):
+        # Cancelling the handle (or a waiter being cancelled) stops the running work too
+        if future.cancelled() and self._task is not None:
+            self._task.cancel()
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def cancelled(self):
+        return self.future.cancelled()
+
+    def done(self):
+        return self.future.done()
+
+    async def result(self):
+        return await self.future
+
+    def __await__(self):
+        return self.future.__await__()
+
+    def __lt__(self, other):
+        return self.task_id < other.task_id
 
 class AgentManager:
-    def __init__(self, chat_handler: ChatHandler, code_generator: CodeGenerator):
+    def __init__(self, chat_handler: ChatHandler, code_generator: CodeGenerator, num_workers=DEFAULT_NUM_WORKERS, concurrency_limits=None, executor: CodeExecutor = None, quiet=False, policies=None):
         self.chat_handler = chat_handler
         self.code_generator = code_generator
-        self.task_queue = asyncio.Queue()
+        self.executor = executor or CodeExecutor()
+        self.task_queue = asyncio.PriorityQueue()
+        self.num_workers = num_workers
+        self.concurrency_limits = {**DEFAULT_CONCURRENCY_LIMITS, **(concurrency_limits or {})}
+        # task type -> ResiliencePolicy for the provider calls that task makes
+        self.policies = {**default_policies(), **(policies or {})}
+        # Headless callers: nothing is printed and failures are raised from the task handle
+        self.quiet = quiet
+        self._task_ids = itertools.count()
+        self._workers = []
+        self._running = defaultdict(int)
+        self._active = set()
+        # Tasks pulled off the queue while their type was at its limit
+        self._deferred = defaultdict(deque)
+
+    async def add_task(self, task_type, priority=None, **kwargs):
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(task_type, 1)
+        handle = TaskHandle(next(self._task_ids), task_type, priority, kwargs)
+        self.start()
+        await self.task_queue.put((priority, handle))
+        return handle
 
-    async def add_task(self, task_type, **kwargs):
-        await self.task_queue.put((task_type, kwargs))
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        # Taken first: a cancelled worker drops its running task from _active
+        pending = list(self._active)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        pending += [handle for handles in self._deferred.values() for handle in handles]
+        self._deferred.clear()
+        while not self.task_queue.empty():
+            pending.append(self.task_queue.get_nowait()[1])
+        for handle in pending:
+            handle.cancel()
+        # Cancelling a handle cancels its work; wait for that to unwind
+        await asyncio.gather(*(handle._task for handle in pending if handle._task), return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            _, handle = await self.task_queue.get()
+            try:
+                if handle.done():
+                    continue
+                limit = self.concurrency_limits.get(handle.task_type, self.num_workers)
+                if self._running[handle.task_type] >= limit:
+                    self._deferred[handle.task_type].append(handle)
+                    continue
+                await self._run(handle)
+            finally:
+                self.task_queue.task_done()
+
+    async def _run(self, handle):
+        task_type = handle.task_type
+        self._running[task_type] += 1
+        self._active.add(handle)
+        try:
+            queue_wait = time.monotonic() - handle.enqueued_at
+            with start_span(f"agent.{task_type}", parent=handle.parent_span, task_id=handle.task_id,
+                            priority=handle.priority, queue_wait_ms=round(queue_wait * 1000, 3)) as span:
+                handle._task = asyncio.create_task(self._execute(task_type, handle.kwargs))
+                await asyncio.wait([handle._task])
+                span.set(cancelled=handle._task.cancelled())
+            if handle._task.cancelled():
+                handle.future.cancel()
+            elif handle.future.done():
+                pass
+            elif handle._task.exception() is not None:
+                handle.future.set_exception(handle._task.exception())
+            else:
+                handle.future.set_result(handle._task.result())
+        finally:
+            self._running[task_type] -= 1
+            self._active.discard(handle)
+            if self._deferred[task_type]:
+                deferred = self._deferred[task_type].popleft()
+                self.task_queue.put_nowait((deferred.priority, deferred))
 
     async def process_next_task(self):
         if self.task_queue.empty():
             return None, None
 
-        task_type, kwargs = await self.task_queue.get()
+        _, handle = await self.task_queue.get()
+        try:
+            if handle.done():
+                return None, None
+            await self._run(handle)
+            return handle.future.result() if not handle.cancelled() else (None, None)
+        finally:
+            self.task_queue.task_done()
+
+    async def _execute(self, task_type, kwargs):
+        with use_policy(self.policies.get(task_type)):
+            return await self._execute_task(task_type, kwargs)
 
+    async def _execute_task(self, task_type, kwargs):
         try:
             if task_type == "chat":
-                response, usage = await self.chat_handler.send_message(kwargs["message"])
+                chat_handler = kwargs.get("chat_handler") or self.chat_handler
+                response, usage = await chat_handler.send_message(kwargs["message"])
                 return response, usage
             elif task_type == "generate_code":
                 code = await self.code_generator.generate_code(kwargs["instructions"], kwargs["file_path"])
                 if code:
-                    print(f"Generated code for {kwargs['file_path']}:\n{code}")
+                    self._report(f"Generated code for {kwargs['file_path']}:\n{code}")
                     return code, None
                 else:
-                    print(f"Failed to generate code for {kwargs['file_path']}")
+                    self._report(f"Failed to generate code for {kwargs['file_path']}")
                     return None, None
             elif task_type == "improve_code":
                 improved_code = await self.code_generator.improve_code(kwargs["existing_code"], kwargs["instructions"], kwargs["file_path"])
                 if improved_code:
-                    print(f"Improved code:\n{improved_code}")
+                    self._report(f"Improved code:\n{improved_code}")
                     return improved_code, None
                 else:
-                    print(f"Failed to improve code for {kwargs['file_path']}")
+                    self._report(f"Failed to improve code for {kwargs['file_path']}")
                     return None, None
+            elif task_type == "plan_project":
+                return await self.code_generator.plan_project(kwargs["instructions"]), None
+            elif task_type == "generate_module":
+                code = await self.code_generator.generate_module(
+                    kwargs["instructions"], kwargs["plan"], kwargs["module"], kwargs["dependencies"], kwargs["file_path"]
+                )
+                return code, None
             else:
-                print(f"Unknown task type: {task_type}")
-                return None, None
+                raise ValueError(f"Unknown task type: {task_type}")
         except Exception as e:
+            if self.quiet:
+                raise
             print(f"Error processing task: {str(e)}")
             return None, None
 
+    def _report(self, text):
+        if not self.quiet:
+            print(text)
+
     async def process_chat(self, message):
-        await self.add_task("chat", message=message)
-        return await self.process_next_task()
+        handle = await self.add_task("chat", message=message)
+        return await handle
+
+    def stream_chat(self, message, chat_handler=None):
+        return (chat_handler or self.chat_handler).stream_message(message, policy=self.policies.get("chat"))
 
     def reset_chat(self):
-        self.chat_handler.reset_conversation()
\ No newline at end of file
+        self.chat_handler.reset_conversation()
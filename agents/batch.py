@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import asyncio
+from rich.console import Console
+from agents.agent_manager import AgentManager
+from auto_coder.code_generator import CodeGenerator
+from llm_chat.router import create_chat_handler
+from utils.tracing import start_span
+
+console = Console()
+
+# Headless batch mode. Each input line is a JSON task:
+#   {"id": "q1", "type": "chat", "message": "..."}
+#   {"id": "c1", "type": "generate_code", "instructions": "...", "file_path": "out/c1.py"}
+#   {"id": "c2", "type": "improve_code", "instructions": "...", "file_path": "src/a.py"}
+# ("existing_code" is read from file_path when omitted). One result line per task is
+# appended to the output file as soon as the task finishes; the output file doubles as
+# the checkpoint, so running the same command again skips every task already "ok".
+
+DEFAULT_PARALLELISM = 4
+DEFAULT_BATCH_MODEL = "llama-3.1-70b-versatile"
+REQUIRED_FIELDS = {
+    "chat": ("message",),
+    "generate_code": ("instructions", "file_path"),
+    "improve_code": ("instructions", "file_path"),
+}
+
+class BatchTaskError(ValueError):
+    def __init__(self, message, task_id=None):
+        super().__init__(message)
+        self.task_id = task_id
+
+def parse_task(line, line_number):
+    """(task_id, task_type, kwargs) for one input line."""
+    try:
+        task = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise BatchTaskError(f"invalid JSON: {e}")
+    if not isinstance(task, dict):
+        raise BatchTaskError("a task must be a JSON object")
+    task_id = str(task.pop("id", f"line-{line_number}"))
+    task_type = task.pop("type", None)
+    if task_type not in REQUIRED_FIELDS:
+        raise BatchTaskError(f"unknown task type {task_type!r}", task_id)
+    missing = [field for field in REQUIRED_FIELDS[task_type] if field not in task]
+    if missing:
+        raise BatchTaskError(f"missing {', '.join(missing)}", task_id)
+    return task_id, task_type, task
+
+def read_checkpoint(output_path):
+    """Ids of the tasks already finished successfully in `output_path`.
+
+    A line cut short by an interrupted write is dropped so the next record starts
+    on a line of its own.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            f.truncate(len(complete))
+    for line in complete.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("status") == "ok":
+            done.add(record.get("id"))
+        else:
+            # A later failure of the same id (e.g. --restart was not used) reopens it
+            done.discard(record.get("id"))
+    return done
+
+class BatchRunner:
+    def __init__(self, agent_manager: AgentManager, output_path, parallelism=DEFAULT_PARALLELISM):
+        self.agent_manager = agent_manager
+        self.output_path = output_path
+        self.parallelism = parallelism
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+        self._output = None
+
+    async def run(self, tasks_path, restart=False):
+        if restart and os.path.exists(self.output_path):
+            os.remove(self.output_path)
+        done = read_checkpoint(self.output_path)
+        if done:
+            console.print(f"[cyan]Resuming: {len(done)} task(s) already finished in {self.output_path}[/cyan]")
+
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # At most `parallelism` tasks are in flight; the input is read as slots free up
+        slots = asyncio.Semaphore(self.parallelism)
+        running = set()
+        seen = set()
+        with open(self.output_path, "a", encoding="utf-8") as self._output:
+            try:
+                with open(tasks_path, "r", encoding="utf-8") as f:
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            task_id, task_type, kwargs = parse_task(line, line_number)
+                        except BatchTaskError as e:
+                            self._write({"id": e.task_id or f"line-{line_number}", "type": None, "status": "error", "error": str(e)})
+                            continue
+                        if task_id in seen:
+                            console.print(f"[yellow]Skipping duplicate task id {task_id!r} on line {line_number}[/yellow]")
+                            continue
+                        seen.add(task_id)
+                        if task_id in done:
+                            self.counts["skipped"] += 1
+                            continue
+
+                        await slots.acquire()
+                        task = asyncio.create_task(self._run_task(task_id, task_type, kwargs))
+                        running.add(task)
+                        task.add_done_callback(running.discard)
+                        task.add_done_callback(lambda _: slots.release())
+                await asyncio.gather(*running)
+            finally:
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                self._output = None
+        return self.counts
+
+    async def _run_task(self, task_id, task_type, kwargs):
+        started = time.perf_counter()
+        record = {"id": task_id, "type": task_type}
+        with start_span("batch.task", task_id=task_id, task_type=task_type) as span:
+            try:
+                result, usage = await self._submit(task_type, kwargs)
+                if result is None:
+                    raise RuntimeError("no result")
+                record.update(status="ok", result=result, usage=usage)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                span.set_error(e)
+                record.update(status="error", error=str(e) or type(e).__name__)
+            record.update(duration_s=round(time.perf_counter() - started, 3), trace_id=span.trace_id)
+        self._write(record)
+
+    async def _submit(self, task_type, kwargs):
+        if task_type == "chat":
+            # Every chat task is its own conversation
+            kwargs["chat_handler"] = self.agent_manager.chat_handler.new_session()
+        elif task_type == "improve_code" and "existing_code" not in kwargs:
+            with open(kwargs["file_path"], "r", encoding="utf-8") as f:
+                kwargs["existing_code"] = f.read()
+        handle = await self.agent_manager.add_task(task_type, **kwargs)
+        return await handle
+
+    def _write(self, record):
+        self._output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._output.flush()
+        os.fsync(self._output.fileno())
+        self.counts[record["status"]] += 1
+        style = "green" if record["status"] == "ok" else "red"
+        detail = f"{record['duration_s']}s" if "duration_s" in record else ""
+        if record["status"] != "ok":
+            detail = f"{detail} {record['error']}".strip()
+        console.print(f"[{style}]{record['status']:>5}[/{style}] {record['id']} {detail}")
+
+async def run_batch(tasks_path, output_path=None, parallelism=DEFAULT_PARALLELISM, model_id=None, restart=False):
+    output_path = output_path or os.path.splitext(tasks_path)[0] + ".results.jsonl"
+    chat_handler = create_chat_handler(model_id or os.getenv("THOTH_BATCH_MODEL", DEFAULT_BATCH_MODEL))
+    code_generator = CodeGenerator(chat_handler)
+    limits = {task_type: parallelism for task_type in REQUIRED_FIELDS}
+    agent_manager = AgentManager(chat_handler, code_generator, num_workers=parallelism,
+                                 concurrency_limits=limits, quiet=True)
+    runner = BatchRunner(agent_manager, output_path, parallelism)
+    try:
+        return await runner.run(tasks_path, restart=restart)
+    finally:
+        await agent_manager.stop()
+        counts = runner.counts
+        console.print(f"[cyan]Batch: {counts['ok']} ok, {counts['error']} failed, "
+                      f"{counts['skipped']} already done -> {output_path}[/cyan]")
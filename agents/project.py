@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+from rich.console import Console
+from agents.agent_manager import AgentManager
+from auto_coder.patching import error_lines, trim_error
+from auto_coder.project_plan import module_interface
+from utils.tracing import start_span
+
+console = Console()
+
+# Multi-file generation. Every file is requested as soon as the files it imports from
+# exist, so independent files are written at the same time (up to the generate_module
+# concurrency limit) and a project takes about as long as its longest dependency
+# chain, not the sum of its files. Each file is import-checked as it lands.
+
+# Fix attempts for a file whose import fails because of its own code
+MODULE_FIX_ATTEMPTS = 1
+
+class ModuleResult:
+    def __init__(self, path, status, duration=0.0, error=None):
+        self.path = path
+        # "ok", "import_error" (written but does not import), "failed" or "skipped" (a dependency failed)
+        self.status = status
+        self.duration = duration
+        self.error = error
+
+    @property
+    def written(self):
+        return self.status in ("ok", "import_error")
+
+class ProjectBuilder:
+    def __init__(self, agent_manager: AgentManager, project_path):
+        self.agent_manager = agent_manager
+        self.project_path = project_path
+        self.results = {}
+
+    async def plan(self, instructions):
+        handle = await self.agent_manager.add_task("plan_project", instructions=instructions)
+        plan, _ = await handle
+        return plan
+
+    async def build(self, instructions, plan):
+        """Generate every file of `plan` into the project directory; returns {path: ModuleResult}."""
+        loop = asyncio.get_running_loop()
+        # path -> future of the file's interface, or None if it could not be generated
+        interfaces = {path: loop.create_future() for path in plan.modules}
+        tasks = [asyncio.create_task(self._build_module(instructions, plan, path, interfaces)) for path in plan.order()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.results
+
+    async def _build_module(self, instructions, plan, path, interfaces):
+        module = plan.modules[path]
+        try:
+            dependencies = {}
+            for dependency in module.depends_on:
+                interface = await interfaces[dependency]
+                if interface is None:
+                    self._finish(ModuleResult(path, "skipped", error=f"{dependency} could not be generated"))
+                    return
+                dependencies[dependency] = interface
+
+            started = time.monotonic()
+            file_path = os.path.join(self.project_path, *path.split("/"))
+            with start_span("project.module", file=path, dependencies=len(dependencies)) as span:
+                handle = await self.agent_manager.add_task(
+                    "generate_module", instructions=instructions, plan=plan, module=module,
+                    dependencies=dependencies, file_path=file_path
+                )
+                code, _ = await handle
+                if not code:
+                    self._finish(ModuleResult(path, "failed", time.monotonic() - started))
+                    return
+                # Dependents can start now; the import check runs alongside them
+                interfaces[path].set_result(module_interface(code))
+                error = await self._check_import(module, file_path, code)
+                span.set(imports=error is None)
+            self._finish(ModuleResult(path, "ok" if error is None else "import_error", time.monotonic() - started, error))
+        finally:
+            if not interfaces[path].done():
+                interfaces[path].set_result(None)
+
+    async def _check_import(self, module, file_path, code):
+        """None if the module imports cleanly (after at most MODULE_FIX_ATTEMPTS fixes), else the error."""
+        code_generator = self.agent_manager.code_generator
+        for attempt in range(MODULE_FIX_ATTEMPTS + 1):
+            result = await self.agent_manager.executor.check_import(module.module_name, self.project_path)
+            if result.success:
+                return None
+            error = trim_error(result.stderr) or result.describe_failure()
+            # A traceback that never passes through this file is a dependency's problem
+            if attempt == MODULE_FIX_ATTEMPTS or not error_lines(result.stderr, file_path):
+                return error
+            console.print(f"[yellow]{module.path} does not import, attempting to fix it...[/yellow]")
+            fixed = await code_generator.patch_code(code, result.stderr, file_path, bypass_cache=True)
+            if not fixed:
+                instructions = f"Fix the following error raised while importing this module:\n\n{error}"
+                fixed = await code_generator.improve_code(code, instructions, file_path, bypass_cache=True)
+            if not fixed:
+                return error
+            code = fixed
+        return error
+
+    def _finish(self, result):
+        self.results[result.path] = result
+        style = "green" if result.status == "ok" else "yellow" if result.written else "red"
+        detail = f"{result.duration:.1f}s" if result.duration else ""
+        if result.error:
+            detail = f"{detail} {result.error.strip().splitlines()[-1]}".strip()
+        console.print(f"[{style}]{result.status:>12}[/{style}] {result.path} {detail}")
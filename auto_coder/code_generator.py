@@ -1,18 +1,103 @@
 from llm_chat.chat_handler import ChatHandler
+from llm_chat.providers import ResponseBlocked
+from llm_chat.retrieval import BM25Index
+from llm_chat.tokens import count_tokens
+from auto_coder.patching import PatchError, error_lines, trim_error, relevant_context, format_context, parse_replacements, apply_replacements
+from auto_coder.stream_validation import StreamingCodeValidator
+from auto_coder.project_plan import MAX_PROJECT_FILES, ProjectPlanError, parse_plan
+import ast
 from utils.helpers import log_token_usage
+from utils.metrics import metrics
+from utils.tracing import start_span, add_event
 import os
 from rich.console import Console
 
 console = Console()
 
+GEMINI_SAFETY_CATEGORIES = [
+    "HARM_CATEGORY_DANGEROUS",
+    "HARM_CATEGORY_HARASSMENT",
+    "HARM_CATEGORY_HATE_SPEECH",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    "HARM_CATEGORY_DANGEROUS_CONTENT",
+]
+GEMINI_GENERATION_CONFIG = {"temperature": 0.7, "top_p": 0.9, "top_k": 40}
+# Spread of sampling temperatures used for speculative candidates
+SPECULATIVE_TEMPERATURES = [0.2, 0.7, 1.0]
+# Tokens of previously generated files from the same project included with a request
+RELATED_CODE_TOKENS = 1500
+RELATED_CODE_FILES = 3
+RELATED_CODE_MIN_SCORE = 1.0
+# With a router, whole-file rewrites up to this size may go to the fast model first
+CHEAP_IMPROVE_TOKENS = 1500
+# Whole-file responses requested before giving up; one that stops looking like Python is cut off and requested again
+CODE_ATTEMPTS = 3
+# Project files are generated one per request, so each may be longer than a single-file script
+MODULE_MAX_TOKENS = 4096
+PLAN_ATTEMPTS = 2
+
 class CodeGenerator:
     def __init__(self, chat_handler: ChatHandler):
         self.chat_handler = chat_handler
+        # Files this generator has written, so later requests can see related ones
+        self.code_index = BM25Index()
+        # (component, model_id) of the last code response, to report a routed fix that did not work
+        self.last_route = None
+        # Handlers for other models asked for speculative candidates, created on first use
+        self._candidate_handlers = {}
 
-    async def generate_code(self, instructions, file_path):
-        system_prompt = f"""
+    async def generate_code(self, instructions, file_path, bypass_cache=False):
+        message, system_prompt = self._generation_prompt(instructions, file_path)
+
+        code = await self._request_code(message, system_prompt, bypass_cache, validate=True)
+
+        if code:
+            with start_span("codegen.write_file", file=file_path):
+                # Remove any potential markdown formatting
+                code = clean_code(code)
+
+                write_code_file(file_path, code)
+            self.remember_file(file_path, code)
+
+            return code
+        else:
+            console.print("[bold red]Failed to generate code.[/bold red]")
+            return None
+
+    async def generate_candidate(self, instructions, temperature=None, model_id=None, bypass_cache=False):
+        """Request one cleaned-up candidate without writing it anywhere (for speculative generation)."""
+        message, system_prompt = self._generation_prompt(instructions)
+        chat_handler = self.candidate_handler(model_id)
+        if chat_handler is None:
+            return None
+        config = {"temperature": temperature} if temperature is not None else {}
+        code = await self._request_code(message, system_prompt, bypass_cache, chat_handler=chat_handler, component="generate_candidate", validate=True, **config)
+        return clean_code(code) if code else None
+
+    def candidate_handler(self, model_id=None):
+        if model_id in (None, self.chat_handler.model_id):
+            return self.chat_handler
+        if model_id not in self._candidate_handlers:
+            try:
+                # Shares the response cache; code requests never touch a conversation
+                self._candidate_handlers[model_id] = ChatHandler(model_id, cache=self.chat_handler.cache or False, session_store=False)
+            except Exception as e:
+                console.print(f"[bold red]Candidate model {model_id} is unavailable: {str(e)}[/bold red]")
+                self._candidate_handlers[model_id] = None
+        return self._candidate_handlers[model_id]
+
+    def candidate_settings(self, count, model_ids=None):
+        """(model_id, temperature) pairs for `count` candidates, cycling through models and temperatures."""
+        model_ids = model_ids or [self.chat_handler.model_id]
+        return [
+            (model_ids[i % len(model_ids)], SPECULATIVE_TEMPERATURES[(i // len(model_ids)) % len(SPECULATIVE_TEMPERATURES)])
+            for i in range(count)
+        ]
+
+    def _generation_prompt(self, instructions, file_path=None):
+        system_prompt = """
         You are an AI code generator. Your task is to generate high-quality, well-structured Python code based on the given instructions.
-        
+
         Follow these guidelines:
         1. Use appropriate naming conventions for classes, functions, and variables.
         2. Implement proper error handling and logging where necessary.
@@ -29,91 +114,83 @@ class CodeGenerator:
         """
 
         message = f"Generate Python code for the following task: {instructions}"
+        related = self._related_code(instructions, file_path)
+        if related:
+            message = f"{message}\n\n{related}"
+        return message, system_prompt
 
-        if "gemini" in self.chat_handler.model_id:
-            code = await self._generate_code_gemini(message, system_prompt)
-        else:
-            code, _ = await self.chat_handler.send_message(message, system_prompt)
+    async def plan_project(self, instructions):
+        """Ask for the files of a multi-file project and their interfaces; a ProjectPlan or None."""
+        system_prompt = """
+        You are an AI software architect. Split the requested Python project into modules.
 
-        if code:
-            # Remove any potential markdown formatting
-            code = code.strip().replace("```python", "").replace("```", "").strip()
+        Reply only with JSON in exactly this format:
+        {"entry_point": "main.py", "files": [{"path": "models.py", "purpose": "what the module is for", "interface": "the classes, functions and constants other modules use, as Python signatures", "depends_on": ["other project files this one imports"]}]}
 
-            # Create the file and write the code using UTF-8 encoding
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(code)
+        Follow these guidelines:
+        1. Keep modules small and focused; most should not depend on each other, so they can be written in parallel.
+        2. depends_on lists only files of this project. There must be no circular dependencies.
+        3. Paths are relative, end in .py and must be importable module names.
+        4. The entry point runs the program and depends on the modules it uses.
+        """
+        message = f"Plan the modules for the following project: {instructions}\n\nUse at most {MAX_PROJECT_FILES} files."
 
-            return code
-        else:
-            console.print("[bold red]Failed to generate code.[/bold red]")
-            return None
+        error = None
+        for attempt in range(PLAN_ATTEMPTS):
+            if error:
+                message += f"\n\nYour previous plan was rejected: {error}. Send a corrected plan."
+            response = await self._request_code(message, system_prompt, bypass_cache=attempt > 0, component="plan_project")
+            if not response:
+                break
+            try:
+                return parse_plan(response)
+            except ProjectPlanError as e:
+                error = str(e)
+                console.print(f"[yellow]The project plan was not usable: {error}[/yellow]")
+        console.print("[bold red]Failed to plan the project.[/bold red]")
+        return None
 
-    async def _generate_code_gemini(self, message, system_prompt):
-        try:
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-            ]
-
-            response = self.chat_handler.model.generate_content(
-                [system_prompt, message],
-                safety_settings=safety_settings,
-                generation_config={"temperature": 0.7, "top_p": 0.9, "top_k": 40},
-            )
+    async def generate_module(self, instructions, plan, module, dependencies, file_path, bypass_cache=False):
+        """Write one file of `plan`. `dependencies` maps the paths it imports from to their actual interfaces."""
+        entry_point = module.path == plan.entry_point
+        system_prompt = f"""
+        You are an AI code generator writing one module of a larger Python project.
 
-            if response.parts:
-                return response.text
-            elif response.prompt_feedback:
-                block_reason = response.prompt_feedback.block_reason
-                console.print(f"[bold yellow]Response blocked. Reason: {block_reason}[/bold yellow]")
-                
-                if block_reason == "SAFETY":
-                    # Güvenlik ayarlarını geçici olarak daha da gevşetelim
-                    relaxed_safety_settings = [
-                        {
-                            "category": category,
-                            "threshold": "BLOCK_NONE"
-                        } for category, _ in safety_settings
-                    ]
-                    console.print("[yellow]Attempting with relaxed safety settings...[/yellow]")
-                    response = self.chat_handler.model.generate_content(
-                        [system_prompt, message],
-                        safety_settings=relaxed_safety_settings,
-                        generation_config={"temperature": 0.7, "top_p": 0.9, "top_k": 40},
-                    )
-                    if response.parts:
-                        return response.text
-                
-                raise ValueError(f"Response blocked: {block_reason}")
-            else:
-                raise ValueError("No valid response or feedback from Gemini API")
-        except Exception as e:
-            console.print(f"[bold red]Error in Gemini code generation: {str(e)}[/bold red]")
+        Follow these guidelines:
+        1. Provide exactly the interface the plan gives for this module.
+        2. Import from other project modules only what their interfaces show, using absolute imports.
+        3. Implement proper error handling and include docstrings where they help.
+        4. Use type hints where appropriate.
+        5. {"Include a `if __name__ == '__main__':` block that runs the program." if entry_point else "Do not run anything at import time and do not include a `if __name__ == '__main__':` block."}
+        6. Do not include any markdown formatting or code block indicators (like ```python).
+
+        Generate only the code of this one file, without any additional explanations.
+        """
+        overview = "\n".join(f"- {path}: {other.purpose}" for path, other in plan.modules.items())
+        message = (
+            f"Project: {instructions}\n\nFiles in the project:\n{overview}\n\n"
+            f"Write {module.path}: {module.purpose}\n\nIts planned interface:\n{module.interface or '(not specified)'}"
+        )
+        if dependencies:
+            sections = "\n\n".join(f"# {path} (import as {plan.modules[path].module_name})\n{interface}"
+                                   for path, interface in dependencies.items())
+            message += f"\n\nInterfaces of the modules it uses:\n\n{sections}"
+
+        code = await self._request_code(message, system_prompt, bypass_cache, component="generate_module",
+                                        validate=True, max_tokens=MODULE_MAX_TOKENS)
+        if not code:
+            console.print(f"[bold red]Failed to generate {module.path}.[/bold red]")
             return None
+        with start_span("codegen.write_file", file=file_path):
+            code = clean_code(code)
+            write_code_file(file_path, code)
+        self.remember_file(file_path, code)
+        return code
 
-    async def improve_code(self, existing_code, instructions, file_path):
+    async def improve_code(self, existing_code, instructions, file_path, bypass_cache=False, cheap=False):
         system_prompt = """
         You are an AI code improver. Your task is to analyze the existing code and improve it based on the given instructions.
-        
+
         Follow these guidelines:
         1. Maintain or enhance code readability and efficiency.
         2. Ensure proper error handling and logging.
@@ -126,93 +203,233 @@ class CodeGenerator:
         9. Provide only the improved code, without any additional explanations or comments.
         10. Do not include any introductory text like "Here's the corrected code:". Start directly with the Python code.
         """
-        
+
         message = f"Existing code:\n\n{existing_code}\n\nInstructions for improvement:\n{instructions}"
-        
-        if "gemini" in self.chat_handler.model_id:
-            improved_code = await self._improve_code_gemini(message, system_prompt)
-        else:
-            improved_code, _ = await self.chat_handler.send_message(message, system_prompt)
-        
+        related = self._related_code(instructions, file_path)
+        if related:
+            message = f"{message}\n\n{related}"
+
+        check = _parses_after_cleaning if cheap and count_tokens(existing_code) <= CHEAP_IMPROVE_TOKENS else None
+        improved_code = await self._request_code(message, system_prompt, bypass_cache, component="improve_code", check=check, validate=True)
+
         if improved_code:
-            # Remove any potential markdown formatting and introductory text
-            improved_code = improved_code.strip()
-            improved_code = improved_code.replace("```python", "").replace("```", "").strip()
-            if improved_code.startswith("Here's the corrected code:"):
-                improved_code = improved_code.replace("Here's the corrected code:", "", 1).strip()
-        
-            # Update the file using UTF-8 encoding
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(improved_code)
-        
+            with start_span("codegen.write_file", file=file_path):
+                # Remove any potential markdown formatting and introductory text
+                improved_code = clean_code(improved_code)
+
+                # Update the file using UTF-8 encoding
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(improved_code)
+            self.remember_file(file_path, improved_code)
+
             return improved_code
         else:
             console.print("[bold red]Failed to improve code.[/bold red]")
             return None
 
-    async def _improve_code_gemini(self, message, system_prompt):
+    async def patch_code(self, existing_code, error_output, file_path, bypass_cache=False, cheap=False):
+        """Fix `error_output` by sending only the code around the traceback and applying the returned edits.
+
+        Returns the patched code, or None when the error cannot be localised or the
+        edits do not apply cleanly; callers then fall back to `improve_code`.
+        With `cheap` and a router, the fast model is tried first and escalated
+        from when its edits do not apply.
+        """
+        lines = error_lines(error_output, file_path)
+        if not lines:
+            return None
         try:
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_ONLY_HIGH",
-                },
-            ]
-
-            response = self.chat_handler.model.generate_content(
-                [system_prompt, message],
-                safety_settings=safety_settings,
-                generation_config={"temperature": 0.7, "top_p": 0.9, "top_k": 40},
+            spans = relevant_context(existing_code, lines)
+        except SyntaxError:
+            return None
+
+        system_prompt = """
+        You are an AI code fixer. You are given an error and the parts of a Python file involved in it.
+
+        Reply only with one or more edits in exactly this format:
+        <<<<<<< SEARCH
+        lines copied exactly from the given code, including indentation
+        =======
+        the replacement lines
+        >>>>>>> REPLACE
+
+        Keep every SEARCH section short but unique within the file. To add an import, search for an existing import line and repeat it in the replacement.
+        Do not include explanations or markdown formatting.
+        """
+        message = f"Error:\n{trim_error(error_output)}\n\nRelevant code from {os.path.basename(file_path)}:\n\n{format_context(existing_code, spans)}"
+
+        check = (lambda response: _patch_applies(existing_code, response)) if cheap else None
+        response = await self._request_code(message, system_prompt, bypass_cache, component="patch_code", check=check)
+        if not response:
+            return None
+        with start_span("codegen.apply_patch", file=file_path) as span:
+            try:
+                blocks = parse_replacements(response)
+                span.set(blocks=len(blocks))
+                patched_code = apply_replacements(existing_code, blocks)
+                ast.parse(patched_code)
+            except (PatchError, SyntaxError) as e:
+                span.set_error(e)
+                console.print(f"[yellow]Could not apply the patch: {str(e).splitlines()[0]}[/yellow]")
+                return None
+
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write(patched_code)
+        self.remember_file(file_path, patched_code)
+        return patched_code
+
+    def remember_file(self, file_path, code):
+        self.code_index.add(os.path.abspath(file_path), f"{os.path.basename(file_path)}\n{code}")
+
+    def _related_code(self, query, file_path):
+        """Other generated files from `file_path`'s project that match `query`, as prompt text."""
+        if not file_path or not len(self.code_index):
+            return None
+        target = os.path.abspath(file_path)
+        project = os.path.dirname(target)
+
+        def accept(path):
+            return path != target and os.path.dirname(path) == project
+
+        sections, used = [], 0
+        for _, path in self.code_index.search(query, RELATED_CODE_FILES, accept=accept, min_score=RELATED_CODE_MIN_SCORE):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    code = file.read()
+            except OSError:
+                self.code_index.remove(path)
+                continue
+            tokens = count_tokens(code)
+            if used + tokens > RELATED_CODE_TOKENS:
+                continue
+            used += tokens
+            sections.append(f"# {os.path.basename(path)}\n{code}")
+        if not sections:
+            return None
+        return "Related files already in the project:\n\n" + "\n\n".join(sections)
+
+    def report_failed_fix(self):
+        """The last fix did not make the code run; count it against the model that wrote it."""
+        router = self.chat_handler.router
+        if router and self.last_route:
+            router.retract(self.last_route[1], self.last_route[0])
+        self.last_route = None
+
+    async def _request_code(self, message, system_prompt, bypass_cache=False, chat_handler=None, component="generate_code",
+                            check=None, validate=False, **config):
+        """Send a code request; with `validate` the answer is a whole Python file and is checked as it streams in."""
+        chat_handler = chat_handler or self.chat_handler
+        with start_span(f"codegen.{component}", model=chat_handler.model_id):
+            return await self._send_code_request(message, system_prompt, bypass_cache, chat_handler, component, check, validate, **config)
+
+    async def _send_code_request(self, message, system_prompt, bypass_cache, chat_handler, component, check=None, validate=False, **config):
+        # Code requests stay out of the chat history so identical ones hit the response cache
+        messages = [{"role": "user", "content": message}]
+        complete = self._complete_validated if validate else self._complete
+
+        if chat_handler.router and check:
+            # Answers that can be checked may come from the fast model; the primary fixes the rest
+            code, usage, model_id = await chat_handler.router.complete_routed(
+                component, chat_handler, messages, system_prompt, check=check,
+                primary=lambda: complete(chat_handler, messages, system_prompt, bypass_cache, **config),
+                bypass_cache=bypass_cache, **config
             )
+        else:
+            code, usage = await complete(chat_handler, messages, system_prompt, bypass_cache, **config)
+            model_id = chat_handler.model_id
+        log_token_usage(component, usage)
+        self.last_route = (component, model_id) if code else None
+        return code
 
-            if response.parts:
-                improved_code = response.text.strip()
-                if improved_code.startswith("Here's the corrected code:"):
-                    improved_code = improved_code.replace("Here's the corrected code:", "", 1).strip()
-                return improved_code
-            elif response.prompt_feedback:
-                block_reason = response.prompt_feedback.block_reason
-                console.print(f"[bold yellow]Response blocked. Reason: {block_reason}[/bold yellow]")
-                
-                if block_reason == "SAFETY":
-                    # Güvenlik ayarlarını geçici olarak daha da gevşetelim
-                    relaxed_safety_settings = [
-                        {
-                            "category": category,
-                            "threshold": "BLOCK_NONE"
-                        } for category, _ in safety_settings
-                    ]
-                    console.print("[yellow]Attempting with relaxed safety settings...[/yellow]")
-                    response = self.chat_handler.model.generate_content(
-                        [system_prompt, message],
-                        safety_settings=relaxed_safety_settings,
-                        generation_config={"temperature": 0.7, "top_p": 0.9, "top_k": 40},
-                    )
-                    if response.parts:
-                        improved_code = response.text.strip()
-                        if improved_code.startswith("Here's the corrected code:"):
-                            improved_code = improved_code.replace("Here's the corrected code:", "", 1).strip()
-                        return improved_code
-                
-                raise ValueError(f"Response blocked: {block_reason}")
+    async def _complete_validated(self, chat_handler, messages, system_prompt, bypass_cache, **config):
+        """`_complete` for a whole Python file, returning the cleaned-up code.
+
+        The response is streamed through a StreamingCodeValidator; once it cannot
+        become valid Python the stream is cancelled and the request sent again.
+        """
+        for attempt in range(CODE_ATTEMPTS):
+            # The cache or a shared in-flight call would hand back the same bad sample
+            bypass = bypass_cache or attempt > 0
+            validator = StreamingCodeValidator()
+            if "gemini" in chat_handler.model_id:
+                # Relaxing the safety settings after a block needs whole responses, so these are checked at the end
+                code, usage = await self._complete(chat_handler, messages, system_prompt, bypass, **config)
+                if code is None:
+                    return None, None
+                validator.feed(code)
+                aborted = False
             else:
-                raise ValueError("No valid response or feedback from Gemini API")
-        except Exception as e:
-            console.print(f"[bold red]Error in Gemini code improvement: {str(e)}[/bold red]")
-            return None
\ No newline at end of file
+                code, usage = await self._stream_code(validator, chat_handler, messages, system_prompt, bypass, **config)
+                aborted = validator.reason is not None
+                if code is None and not aborted:
+                    return None, None
+            if validator.finish():
+                return validator.code, usage
+
+            metrics.inc("thoth_rejected_code_responses_total", model=chat_handler.model_id, stage="streaming" if aborted else "complete")
+            add_event("code_rejected", reason=validator.reason, attempt=attempt + 1, aborted=aborted)
+            console.print(f"[yellow]The response is not valid Python ({validator.reason}).[/yellow]")
+            if attempt < CODE_ATTEMPTS - 1:
+                console.print("[yellow]Requesting a new one...[/yellow]")
+        return None, None
+
+    async def _stream_code(self, validator, chat_handler, messages, system_prompt, bypass_cache, **config):
+        stream = chat_handler.stream(messages, system_prompt, bypass_cache=bypass_cache, **config)
+        async for delta in stream:
+            if not validator.feed(delta):
+                # Every further token would be paid for and thrown away
+                await stream.aclose()
+                return None, None
+        if stream.error:
+            return None, None
+        return stream.text, stream.usage
+
+    async def _complete(self, chat_handler, messages, system_prompt, bypass_cache, **config):
+        if "gemini" not in chat_handler.model_id:
+            return await chat_handler.complete(messages, system_prompt, bypass_cache=bypass_cache, **config)
+
+        for threshold in ("BLOCK_ONLY_HIGH", "BLOCK_NONE"):
+            safety_settings = [{"category": category, "threshold": threshold} for category in GEMINI_SAFETY_CATEGORIES]
+            try:
+                return await chat_handler.complete(
+                    messages,
+                    system_prompt,
+                    bypass_cache=bypass_cache,
+                    raise_blocked=True,
+                    safety_settings=safety_settings,
+                    **{**GEMINI_GENERATION_CONFIG, **config}
+                )
+            except ResponseBlocked:
+                # Güvenlik ayarlarını geçici olarak daha da gevşetelim
+                if threshold != "BLOCK_NONE":
+                    console.print("[yellow]Attempting with relaxed safety settings...[/yellow]")
+        return None, None
+
+def write_code_file(file_path, code):
+    """Write `code` to `file_path` as UTF-8, creating its directory if it has one."""
+    directory = os.path.dirname(file_path)
+    # A bare file name ("main.py") goes in the current directory
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(code)
+
+def _parses_after_cleaning(code):
+    try:
+        ast.parse(clean_code(code))
+        return True
+    except SyntaxError:
+        return False
+
+def _patch_applies(existing_code, response):
+    try:
+        ast.parse(apply_replacements(existing_code, parse_replacements(response)))
+        return True
+    except (PatchError, SyntaxError):
+        return False
+
+def clean_code(code):
+    code = code.strip().replace("```python", "").replace("```", "").strip()
+    if code.startswith("Here's the corrected code:"):
+        code = code.replace("Here's the corrected code:", "", 1).strip()
+    return code
@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass, asdict
+from typing import Optional
+from llm_chat.response_cache import ResponseCache
+from utils.tracing import start_span
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, scripts run with the wall-clock timeout only
+    resource = None
+
+DEFAULT_WALL_TIMEOUT = 30.0
+DEFAULT_CPU_TIMEOUT = 20
+DEFAULT_MEMORY_LIMIT_MB = 1024
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+DEFAULT_MAX_PARALLEL = 4
+# How long killed scripts get to close their output pipes before reading stops
+KILL_GRACE_SECONDS = 2.0
+DEFAULT_RUN_CACHE_PATH = os.path.join(".thoth", "run_cache.sqlite")
+DEFAULT_RUN_CACHE_MAX_ENTRIES = 500
+DEFAULT_RUN_CACHE_TTL = 24 * 3600
+# Projects larger than this are not hashed for the run cache; they just run
+MAX_HASHED_BYTES = 32 * 1024 * 1024
+SKIPPED_DIRS = {"__pycache__", "node_modules", "venv", "env"}
+
+# Runs the candidate script in-process so it can report its own peak RSS and CPU time
+BOOTSTRAP = """
+import atexit, os, resource, runpy, sys
+stats_path, script = sys.argv[1], sys.argv[2]
+sys.argv = sys.argv[2:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+def report():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss survives exec and would include the parent's footprint; VmHWM does not
+    peak_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    peak_kb = int(line.split()[1])
+    except OSError:
+        pass
+    with open(stats_path, "w") as stats:
+        stats.write(f"{peak_kb} {usage.ru_utime + usage.ru_stime}")
+atexit.register(report)
+runpy.run_path(script, run_name="__main__")
+"""
+# Imports one module of a project the way its entry point would
+IMPORT_CHECK = """
+import importlib, os, sys
+sys.path.insert(0, os.getcwd())
+importlib.import_module(sys.argv[1])
+"""
+# Prints the given top-level modules that a script in argv[1] would fail to import; find_spec imports nothing
+FIND_MODULES = """
+import importlib.util, json, os, sys
+helper_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path[:] = [sys.argv[1]] + [path for path in sys.path if path != helper_dir]
+def found(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+print(json.dumps([name for name in sys.argv[2:] if not found(name)]))
+"""
+# Runs a module like `python -m`, from the project directory
+RUN_MODULE = """
+import os, runpy, sys
+sys.path.insert(0, os.getcwd())
+module = sys.argv[1]
+sys.argv = [module] + sys.argv[2:]
+runpy.run_module(module, run_name="__main__", alter_sys=True)
+"""
+
+@dataclass
+class ExecutionResult:
+    exit_code: int
+    duration: float
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    cpu_time: Optional[float] = None
+    peak_rss_kb: Optional[int] = None
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    # Served from the run cache instead of running again
+    cached: bool = False
+
+    @property
+    def success(self):
+        return self.exit_code == 0 and not self.timed_out
+
+    def describe_failure(self):
+        if self.timed_out:
+            return f"The script was killed after exceeding the {self.duration:.0f}s wall-clock limit."
+        sigxcpu = getattr(signal, "SIGXCPU", None)
+        if sigxcpu and self.exit_code == -sigxcpu:
+            return "The script was killed for exceeding its CPU time limit."
+        if self.exit_code < 0:
+            return f"The script was killed by signal {-self.exit_code} (possibly the memory limit)."
+        return f"The script exited with code {self.exit_code}."
+
+class CodeExecutor:
+    """Runs generated scripts in isolated subprocesses with time, memory and output limits.
+
+    With `cache=True`, `run` first looks the run up in the run cache, keyed by the
+    contents of every file under `cwd`, the interpreter, the arguments, stdin and
+    the limits; code that has already run is not run again.
+    """
+
+    def __init__(self, wall_timeout=DEFAULT_WALL_TIMEOUT, cpu_timeout=DEFAULT_CPU_TIMEOUT,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, output_limit=DEFAULT_OUTPUT_LIMIT,
+                 max_parallel=DEFAULT_MAX_PARALLEL, python=sys.executable, run_cache=None):
+        self.wall_timeout = wall_timeout
+        self.cpu_timeout = cpu_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.output_limit = output_limit
+        self.python = python
+        # None: the process-wide run cache (if enabled); False: no caching
+        self.run_cache = get_run_cache() if run_cache is None else run_cache or None
+        self._slots = asyncio.Semaphore(max_parallel)
+
+    async def run(self, script, cwd, args=(), stdin=None, on_output=None, cache=False):
+        """Run `script` (relative to `cwd`) and return an ExecutionResult.
+
+        `on_output(stream_name, text)` is called for every chunk of stdout/stderr
+        as it arrives, including output beyond the capture limit. A cached result
+        replays its captured output instead.
+        """
+        queued = time.monotonic()
+        with start_span("executor.run", script=os.path.basename(script)) as span:
+            key = self._cache_key(script, cwd, args, stdin) if cache and self.run_cache else None
+            cached = self.run_cache.get(key) if key else None
+            span.set(cache_hit=bool(cached))
+            if cached:
+                result = ExecutionResult(**{**json.loads(cached[0]), "cached": True})
+                if on_output:
+                    on_output("stdout", result.stdout)
+                    on_output("stderr", result.stderr)
+                return result
+
+            async with self._slots:
+                span.set(slot_wait_ms=round((time.monotonic() - queued) * 1000, 3))
+                result = await self._run(script, cwd, list(args), stdin, on_output)
+            span.set(exit_code=result.exit_code, timed_out=result.timed_out,
+                     cpu_time=result.cpu_time, peak_rss_kb=result.peak_rss_kb)
+            # Timeouts and kills depend on the machine's load as much as on the code
+            if key and not result.timed_out and result.exit_code >= 0:
+                self.run_cache.put(key, json.dumps(asdict(result)))
+            return result
+
+    async def check_import(self, module, cwd):
+        """Import `module` (e.g. "pkg.models") from `cwd` under the same limits as `run`."""
+        return await self._run_helper(IMPORT_CHECK, "import_check.py", cwd, (module,))
+
+    async def missing_modules(self, names, cwd, script_dir=None):
+        """The top-level modules in `names` that a script in `script_dir` (default `cwd`) run
+        from `cwd` could not import, as this executor's interpreter sees it; None if that
+        could not be determined."""
+        if not names:
+            return set()
+        result = await self._run_helper(FIND_MODULES, "find_modules.py", cwd, (script_dir or cwd, *names))
+        if not result.success:
+            return None
+        try:
+            return set(json.loads(result.stdout))
+        except ValueError:
+            return None
+
+    async def run_module(self, module, cwd, args=(), on_output=None, cache=False):
+        """Run `module` like `python -m module args` from `cwd`, e.g. "pytest"."""
+        return await self._run_helper(RUN_MODULE, "run_module.py", cwd, (module, *args), on_output, cache)
+
+    async def _run_helper(self, source, name, cwd, args, on_output=None, cache=False):
+        with tempfile.TemporaryDirectory(prefix="thoth_helper_") as scratch:
+            script = os.path.join(scratch, name)
+            with open(script, "w", encoding="utf-8") as f:
+                f.write(source)
+            return await self.run(script, cwd, args=args, on_output=on_output, cache=cache)
+
+    def _cache_key(self, script, cwd, args, stdin):
+        digest = project_digest(cwd)
+        if digest is None:
+            return None
+        script = os.path.abspath(os.path.join(cwd, script))
+        try:
+            with open(script, "rb") as f:
+                script_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        inside = os.path.commonpath([script, os.path.abspath(cwd)]) == os.path.abspath(cwd)
+        return ResponseCache.make_key(self.python, None, [], {
+            "python_version": sys.version if self.python == sys.executable else None,
+            # Helper scripts live in a fresh temporary directory each time; only their contents matter
+            "script": os.path.relpath(script, cwd) if inside else os.path.basename(script),
+            "script_hash": script_hash,
+            "project": digest,
+            "args": list(args),
+            "stdin": stdin if stdin is None or isinstance(stdin, str) else hashlib.sha256(stdin).hexdigest(),
+            "limits": [self.wall_timeout, self.cpu_timeout, self.memory_limit_mb, self.output_limit],
+        })
+
+    async def _run(self, script, cwd, args, stdin, on_output):
+        stats_path = None
+        script = os.path.abspath(os.path.join(cwd, script))
+        if resource is not None:
+            fd, stats_path = tempfile.mkstemp(prefix="thoth_exec_", suffix=".stats")
+            os.close(fd)
+            command = [self.python, "-c", BOOTSTRAP, stats_path, script, *args]
+        else:
+            command = [self.python, script, *args]
+
+        try:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=cwd,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                preexec_fn=self._apply_limits if resource is not None else None,
+                start_new_session=resource is not None,
+            )
+            stdout = _CappedOutput("stdout", self.output_limit, on_output)
+            stderr = _CappedOutput("stderr", self.output_limit, on_output)
+            readers = asyncio.gather(stdout.drain(process.stdout), stderr.drain(process.stderr))
+            if stdin is not None:
+                process.stdin.write(stdin.encode("utf-8") if isinstance(stdin, str) else stdin)
+                process.stdin.close()
+
+            # The run ends when the script has exited and its output pipes are closed; a
+            # child it started can keep them open after the script itself is gone
+            finished = asyncio.ensure_future(_wait_for_exit(process, readers))
+            timed_out = False
+            try:
+                await asyncio.wait_for(asyncio.shield(finished), timeout=self.wall_timeout)
+            except asyncio.TimeoutError:
+                # Only a script killed while still running timed out; one that had already
+                # exited keeps its exit code, and whatever it left behind is killed all the same
+                timed_out = process.returncode is None
+                self._kill(process)
+                await _settle(finished)
+            except asyncio.CancelledError:
+                self._kill(process)
+                await _settle(finished)
+                raise
+            duration = time.monotonic() - started
+
+            peak_rss_kb, cpu_time = _read_stats(stats_path)
+            return ExecutionResult(
+                exit_code=process.returncode if process.returncode is not None else -signal.SIGKILL,
+                duration=duration,
+                stdout=stdout.text(),
+                stderr=_strip_bootstrap_frames(stderr.text()) if stats_path else stderr.text(),
+                timed_out=timed_out,
+                cpu_time=cpu_time,
+                peak_rss_kb=peak_rss_kb,
+                stdout_truncated=stdout.truncated,
+                stderr_truncated=stderr.truncated,
+            )
+        finally:
+            if stats_path and os.path.exists(stats_path):
+                os.unlink(stats_path)
+
+    def _apply_limits(self):
+        # Runs in the child between fork and exec
+        if self.cpu_timeout:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_timeout, self.cpu_timeout + 1))
+        if self.memory_limit_mb:
+            limit = self.memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def _kill(self, process):
+        try:
+            # The child leads its own session, so this also takes down anything it spawned,
+            # even after the child itself has exited
+            if resource is not None:
+                os.killpg(process.pid, signal.SIGKILL)
+            elif process.returncode is None:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+async def _wait_for_exit(process, readers):
+    await process.wait()
+    await readers
+
+async def _settle(finished):
+    # After a kill the pipes close at once, unless something escaped into a session of its own
+    try:
+        await asyncio.wait_for(finished, timeout=KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+
+def project_digest(path):
+    """Hash of every file under `path` (names and contents), or None if there is too much to hash."""
+    digest = hashlib.sha256()
+    total = 0
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                with open(file_path, "rb") as f:
+                    data = f.read(MAX_HASHED_BYTES - total + 1)
+            except OSError:
+                continue
+            total += len(data)
+            if total > MAX_HASHED_BYTES:
+                return None
+            digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+            digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+_run_cache = None
+
+def get_run_cache():
+    """Process-wide cache of execution results, or None when disabled with THOTH_RUN_CACHE=0."""
+    global _run_cache
+    if os.getenv("THOTH_RUN_CACHE", "1").lower() in ("0", "false", "off"):
+        return None
+    if _run_cache is None:
+        _run_cache = ResponseCache(
+            os.getenv("THOTH_RUN_CACHE_PATH", DEFAULT_RUN_CACHE_PATH),
+            max_entries=DEFAULT_RUN_CACHE_MAX_ENTRIES,
+            ttl=float(os.getenv("THOTH_RUN_CACHE_TTL", DEFAULT_RUN_CACHE_TTL)),
+        )
+    return _run_cache
+
+class _CappedOutput:
+    def __init__(self, name, limit, on_output):
+        self.name = name
+        self.limit = limit
+        self.on_output = on_output
+        self.chunks = []
+        self.size = 0
+        self.truncated = False
+
+    async def drain(self, stream):
+        # Keep reading past the limit so the child never blocks on a full pipe
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                return
+            if self.on_output:
+                self.on_output(self.name, chunk.decode("utf-8", errors="replace"))
+            room = self.limit - self.size
+            if room > 0:
+                self.chunks.append(chunk[:room])
+                self.size += min(room, len(chunk))
+            if len(chunk) > room:
+                self.truncated = True
+
+    def text(self):
+        text = b"".join(self.chunks).decode("utf-8", errors="replace")
+        if self.truncated:
+            text += f"\n... [{self.name} truncated after {self.limit} bytes]"
+        return text
+
+def _strip_bootstrap_frames(stderr):
+    # Hide the bootstrap and runpy frames so tracebacks look like a plain `python script.py` run
+    lines = []
+    skipping = False
+    for line in stderr.splitlines(keepends=True):
+        if line.startswith('  File "'):
+            skipping = line.startswith('  File "<string>"') or "runpy" in line.split(",")[0]
+        elif not line.startswith("    "):
+            skipping = False
+        if not skipping:
+            lines.append(line)
+    return "".join(lines)
+
+def _read_stats(stats_path):
+    if not stats_path:
+        return None, None
+    try:
+        with open(stats_path) as stats:
+            peak_rss_kb, cpu_time = stats.read().split()
+        return int(peak_rss_kb), float(cpu_time)
+    except (OSError, ValueError):
+        # Killed before the atexit hook could run
+        return None, None
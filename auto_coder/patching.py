@@ -0,0 +1,118 @@
+import os
+import re
+import ast
+
+# Lines of module-level code shown around an error that is not inside a def/class
+MODULE_CONTEXT_LINES = 5
+# Tail of stderr sent to the model; the last traceback is what matters
+MAX_ERROR_LINES = 40
+
+_FRAME_PATTERN = re.compile(r'^\s*File "(?P<path>[^"]+)", line (?P<line>\d+)(?:, in (?P<name>\S+))?', re.MULTILINE)
+_BLOCK_PATTERN = re.compile(
+    r"<<<<<<< SEARCH[ \t]*\n(?P<search>.*?)\n?[ \t]*=======[ \t]*\n(?P<replace>.*?)\n?[ \t]*>>>>>>> REPLACE",
+    re.DOTALL,
+)
+
+class PatchError(ValueError):
+    pass
+
+def error_lines(stderr, file_path):
+    """Line numbers in `file_path` mentioned by the traceback(s) in `stderr`, innermost last."""
+    target = os.path.abspath(file_path)
+    lines = []
+    for match in _FRAME_PATTERN.finditer(stderr):
+        path = match.group("path")
+        if os.path.abspath(path) == target or os.path.basename(path) == os.path.basename(target):
+            lines.append(int(match.group("line")))
+    return lines
+
+def trim_error(stderr):
+    # Keep only the last traceback, and only its tail
+    start = stderr.rfind("Traceback (most recent call last):")
+    if start > 0:
+        stderr = stderr[start:]
+    lines = stderr.strip().splitlines()
+    return "\n".join(lines[-MAX_ERROR_LINES:])
+
+def relevant_context(code, line_numbers):
+    """Source of the innermost functions/classes around `line_numbers`, plus the module's imports.
+
+    Returns a list of (start_line, end_line, label) tuples, merged and sorted.
+    """
+    tree = ast.parse(code)
+    spans = []
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    if imports:
+        spans.append((imports[0].lineno, imports[-1].end_lineno, "imports"))
+
+    total_lines = len(code.splitlines())
+    for line in set(line_numbers):
+        node, qualified_name = _innermost_definition(tree, line)
+        if node is not None:
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            kind = "class" if isinstance(node, ast.ClassDef) else "function"
+            spans.append((start, node.end_lineno, f"{kind} {qualified_name}"))
+        else:
+            spans.append((max(1, line - MODULE_CONTEXT_LINES), min(total_lines, line + MODULE_CONTEXT_LINES), "module code"))
+    return _merge_spans(spans)
+
+def _innermost_definition(tree, line):
+    found, names = None, []
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.lineno <= line <= node.end_lineno:
+            found = node
+            names.append(node.name)
+            nodes = list(node.body)
+    return found, ".".join(names)
+
+def _merge_spans(spans):
+    merged = []
+    for start, end, label in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            previous = merged[-1]
+            merged[-1] = (previous[0], max(previous[1], end), previous[2] if end <= previous[1] else f"{previous[2]}, {label}")
+        else:
+            merged.append((start, end, label))
+    return merged
+
+def format_context(code, spans):
+    lines = code.splitlines()
+    sections = []
+    for start, end, label in spans:
+        sections.append(f"# Lines {start}-{end} ({label})\n" + "\n".join(lines[start - 1:end]))
+    return "\n\n".join(sections)
+
+def parse_replacements(response):
+    blocks = [(m.group("search"), m.group("replace")) for m in _BLOCK_PATTERN.finditer(response)]
+    if not blocks:
+        raise PatchError("No SEARCH/REPLACE blocks in the response")
+    return blocks
+
+def apply_replacements(code, blocks):
+    for search, replace in blocks:
+        if not search.strip():
+            raise PatchError("Empty SEARCH block")
+        count = code.count(search)
+        if count == 1:
+            code = code.replace(search, replace, 1)
+            continue
+        if count > 1:
+            raise PatchError(f"SEARCH block matches {count} places:\n{search}")
+        code = _replace_ignoring_trailing_whitespace(code, search, replace)
+    return code
+
+def _replace_ignoring_trailing_whitespace(code, search, replace):
+    code_lines = code.splitlines()
+    search_lines = [line.rstrip() for line in search.splitlines()]
+    stripped = [line.rstrip() for line in code_lines]
+    matches = [
+        i for i in range(len(code_lines) - len(search_lines) + 1)
+        if stripped[i:i + len(search_lines)] == search_lines
+    ]
+    if len(matches) != 1:
+        raise PatchError(f"SEARCH block not found exactly once:\n{search}")
+    i = matches[0]
+    patched = code_lines[:i] + replace.splitlines() + code_lines[i + len(search_lines):]
+    return "\n".join(patched) + ("\n" if code.endswith("\n") else "")
@@ -0,0 +1,145 @@
+import ast
+import json
+import posixpath
+
+# A multi-file project is planned first: every file with its purpose, the interface
+# it must provide and the files it imports from. Files are then generated in
+# dependency order, each one seeing the real interfaces of the files it uses.
+
+MAX_PROJECT_FILES = 12
+
+class ProjectPlanError(ValueError):
+    pass
+
+class ModulePlan:
+    def __init__(self, path, purpose="", interface="", depends_on=()):
+        self.path = path
+        self.purpose = purpose
+        self.interface = interface
+        self.depends_on = list(depends_on)
+
+    @property
+    def module_name(self):
+        return self.path[:-len(".py")].replace("/", ".")
+
+class ProjectPlan:
+    def __init__(self, modules, entry_point):
+        # path -> ModulePlan, in the order the planner listed them
+        self.modules = {module.path: module for module in modules}
+        self.entry_point = entry_point
+
+    def __len__(self):
+        return len(self.modules)
+
+    def order(self):
+        """Paths with every file after the files it depends on; raises ProjectPlanError on a cycle."""
+        remaining = {path: set(module.depends_on) for path, module in self.modules.items()}
+        ordered = []
+        while remaining:
+            ready = [path for path, depends_on in remaining.items() if not depends_on]
+            if not ready:
+                raise ProjectPlanError(f"dependency cycle between {', '.join(sorted(remaining))}")
+            for path in ready:
+                del remaining[path]
+                ordered.append(path)
+            for depends_on in remaining.values():
+                depends_on.difference_update(ready)
+        return ordered
+
+    def longest_chain(self):
+        """Files on the longest dependency chain: the least number of generation rounds."""
+        depth = {}
+        for path in self.order():
+            depth[path] = 1 + max((depth[dep] for dep in self.modules[path].depends_on), default=0)
+        return max(depth.values(), default=0)
+
+def parse_plan(text):
+    """ProjectPlan from the planner's JSON answer (markdown fences and prose around it are ignored)."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ProjectPlanError("no JSON object in the plan")
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ProjectPlanError(f"invalid JSON: {e}")
+
+    files = data.get("files") if isinstance(data, dict) else None
+    if not isinstance(files, list) or not files:
+        raise ProjectPlanError("the plan lists no files")
+    if len(files) > MAX_PROJECT_FILES:
+        raise ProjectPlanError(f"the plan has {len(files)} files, at most {MAX_PROJECT_FILES} are allowed")
+
+    modules = []
+    for entry in files:
+        if not isinstance(entry, dict):
+            raise ProjectPlanError("every file must be a JSON object")
+        path = _module_path(entry.get("path"))
+        if any(module.path == path for module in modules):
+            raise ProjectPlanError(f"{path} is listed twice")
+        depends_on = entry.get("depends_on") or []
+        if not isinstance(depends_on, list):
+            raise ProjectPlanError(f"depends_on of {path} must be a list")
+        modules.append(ModulePlan(path, str(entry.get("purpose") or ""), str(entry.get("interface") or ""), depends_on))
+
+    known = {module.path for module in modules}
+    for module in modules:
+        # Standard library or third-party names in depends_on are not files of this project
+        normalized = (posixpath.normpath(str(dep).replace("\\", "/")) for dep in module.depends_on)
+        module.depends_on = list(dict.fromkeys(dep for dep in normalized if dep in known and dep != module.path))
+
+    entry_point = data.get("entry_point")
+    if entry_point not in known:
+        raise ProjectPlanError(f"entry point {entry_point!r} is not one of the planned files")
+    plan = ProjectPlan(modules, entry_point)
+    plan.order()
+    return plan
+
+def _module_path(path):
+    if not isinstance(path, str) or not path.endswith(".py"):
+        raise ProjectPlanError(f"invalid file path {path!r}")
+    path = posixpath.normpath(path.replace("\\", "/"))
+    parts = path[:-len(".py")].split("/")
+    if path.startswith("/") or not all(part.isidentifier() for part in parts):
+        raise ProjectPlanError(f"{path} cannot be imported as a module")
+    return path
+
+def module_interface(code):
+    """Signatures, class outlines and constants of a module, without the bodies.
+
+    This is what a file that imports the module needs to see, at a fraction of
+    the tokens of the full source.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+    lines = code.splitlines()
+    outline = []
+
+    def header(node):
+        first = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        outline.extend(lines[first - 1:max(node.body[0].lineno - 1, node.lineno)])
+
+    def summary(node, indent):
+        docstring = ast.get_docstring(node)
+        outline.append(f'{indent}    """{docstring.strip().splitlines()[0]}"""' if docstring else f"{indent}    ...")
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_"):
+            header(node)
+            summary(node, "")
+        elif isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
+            header(node)
+            if ast.get_docstring(node):
+                summary(node, "")
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                        not item.name.startswith("_") or item.name == "__init__"):
+                    header(item)
+                    summary(item, "    ")
+                elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+                    outline.extend(lines[item.lineno - 1:item.end_lineno])
+            outline.append("")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            outline.extend(lines[node.lineno - 1:node.end_lineno])
+    return "\n".join(outline).strip()
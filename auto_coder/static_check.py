@@ -0,0 +1,399 @@
+import os
+import ast
+import asyncio
+import builtins
+import difflib
+import symtable
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from utils.tracing import start_span
+
+# In-process checks run on generated code before it is executed. They only report
+# what is certain to fail at run time: undefined names, imports of modules that are
+# not installed, and attributes missing from classes defined in the same file.
+# Anything the analysis cannot see through (star imports, unknown base classes,
+# __getattr__, setattr) is left for the real run to judge.
+
+MAX_DIAGNOSTICS = 10
+DEFAULT_WORKERS = 2
+# Bound in every module without being assigned
+MODULE_NAMES = {"__name__", "__file__", "__doc__", "__builtins__", "__spec__", "__loader__",
+                "__package__", "__path__", "__annotations__", "__dict__"}
+# Attributes every instance has
+OBJECT_ATTRIBUTES = set(dir(object)) | {"__dict__", "__weakref__", "__module__"}
+
+@dataclass
+class Diagnostic:
+    line: int
+    message: str
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}"
+
+def static_check_enabled():
+    return os.getenv("THOTH_STATIC_CHECK", "1").lower() not in ("0", "false", "off")
+
+def analyze(code, project_path=None, check_imports=True, missing_modules=None):
+    """Diagnostics for `code`, sorted by line; empty when nothing is certain to fail.
+
+    Imports are resolved against the files in `project_path`, then against this
+    interpreter, unless `missing_modules` names the top-level modules that the
+    interpreter the code will run under lacks (see `check_file`).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [Diagnostic(e.lineno or 1, f"SyntaxError: {e.msg}")]
+    diagnostics = _import_diagnostics(tree, project_path, missing_modules) if check_imports else []
+    diagnostics += _name_diagnostics(code, tree)
+    diagnostics += _attribute_diagnostics(tree)
+    return sorted(diagnostics, key=lambda d: d.line)[:MAX_DIAGNOSTICS]
+
+def format_diagnostics(diagnostics, file_name):
+    return "\n".join(f"{file_name}, {diagnostic}" for diagnostic in diagnostics)
+
+_pool = None
+
+async def check_file(file_path, project_path=None, check_imports=True, executor=None):
+    """`analyze` the file in a worker thread, so the event loop keeps serving other tasks.
+
+    With a CodeExecutor, imports are resolved by its interpreter, from the file's own
+    directory as when it runs, instead of against this process's sys.path.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="thoth_static_check")
+    with open(file_path, 'r', encoding='utf-8') as file:
+        code = file.read()
+    loop = asyncio.get_running_loop()
+    with start_span("static_check", file=os.path.basename(file_path)) as span:
+        missing_modules = None
+        if check_imports and executor is not None:
+            names = await loop.run_in_executor(_pool, imported_modules, code, project_path)
+            missing_modules = await executor.missing_modules(names, project_path or os.path.dirname(file_path),
+                                                             os.path.dirname(os.path.abspath(file_path)))
+            # The interpreter could not be asked; the real run will tell
+            check_imports = missing_modules is not None
+        diagnostics = await loop.run_in_executor(_pool, analyze, code, project_path, check_imports, missing_modules)
+        span.set(diagnostics=len(diagnostics))
+    return diagnostics
+
+def _suggestion(name, candidates):
+    matches = difflib.get_close_matches(name, sorted(candidates), n=1)
+    return f" (did you mean '{matches[0]}'?)" if matches else ""
+
+def _unconditional_imports(tree):
+    """(line, top-level module) of the module-level imports, each module once."""
+    # Only unconditional imports: those under if/try or in functions may be platform or optional ones
+    seen = {"__main__"}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            # Only the top-level package: finding a submodule would import its parent
+            top = name.split(".")[0]
+            if top not in seen:
+                seen.add(top)
+                yield node.lineno, top
+
+def imported_modules(code, project_path=None):
+    """Top-level modules `code` imports unconditionally that are not files of the project."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    return [name for _, name in _unconditional_imports(tree) if not _project_module(name, project_path)]
+
+def _import_diagnostics(tree, project_path, missing_modules=None):
+    diagnostics = []
+    for line, name in _unconditional_imports(tree):
+        if _project_module(name, project_path):
+            continue
+        missing = name in missing_modules if missing_modules is not None else not _module_exists(name)
+        if missing:
+            diagnostics.append(Diagnostic(line, f"ModuleNotFoundError: No module named '{name}'"))
+    return diagnostics
+
+def _project_module(name, project_path):
+    return bool(project_path) and (os.path.exists(os.path.join(project_path, f"{name}.py"))
+                                   or os.path.isdir(os.path.join(project_path, name)))
+
+def _module_exists(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def _name_diagnostics(code, tree):
+    if _namespace_is_dynamic(tree):
+        return []
+    try:
+        module = symtable.symtable(code, "<generated>", "exec")
+    except SyntaxError:
+        return []
+
+    # Module-level bindings, including those made through `global` inside functions
+    bound = {symbol.get_name() for symbol in module.get_symbols()
+             if symbol.is_assigned() or symbol.is_imported() or symbol.is_namespace()}
+    # (line, name) of each scope -> names it looks up in the module namespace
+    lookups = {}
+    tables = [module]
+    while tables:
+        table = tables.pop()
+        tables.extend(table.get_children())
+        for symbol in table.get_symbols():
+            if table is module:
+                global_lookup = symbol.is_referenced()
+            else:
+                if symbol.is_declared_global() and symbol.is_assigned():
+                    bound.add(symbol.get_name())
+                # is_local() as well: in 3.11 a function named "top" reports its locals as global
+                global_lookup = symbol.is_referenced() and symbol.is_global() and not symbol.is_local()
+            if global_lookup:
+                lookups.setdefault((table.get_lineno(), table.get_name()), set()).add(symbol.get_name())
+
+    known = bound | MODULE_NAMES | set(dir(builtins))
+    lookups = {key: names - known for key, names in lookups.items() if names - known}
+    if not lookups:
+        return []
+    scopes = {(0, "top"): tree}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            scopes.setdefault((node.lineno, node.name), node)
+        elif type(node) in _SCOPE_NAMES:
+            scopes.setdefault((node.lineno, _SCOPE_NAMES[type(node)]), node)
+
+    ignored, optional = _guarded_names(tree)
+    first_use = {}
+    for key, undefined in lookups.items():
+        undefined = undefined - optional
+        scope = scopes.get(key)
+        if scope is None:
+            continue
+        for node in _scope_nodes(scope):
+            if (isinstance(node, ast.Name) and node.id in undefined and isinstance(node.ctx, ast.Load)
+                    and id(node) not in ignored):
+                first_use[node.id] = min(first_use.get(node.id, node.lineno), node.lineno)
+    return [
+        Diagnostic(line, f"NameError: name '{name}' is not defined{_suggestion(name, known - MODULE_NAMES)}")
+        for name, line in first_use.items()
+    ]
+
+# symtable names of the scopes that have no name in the source
+_SCOPE_NAMES = {ast.Lambda: "lambda", ast.ListComp: "listcomp", ast.SetComp: "setcomp",
+                ast.DictComp: "dictcomp", ast.GeneratorExp: "genexpr"}
+
+def _namespace_is_dynamic(tree):
+    """True if the module may define names the source does not show (star imports, globals(), exec...)."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names):
+            return True
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and (node.func.id in ("exec", "eval", "globals")
+                                                     or (node.func.id == "vars" and not node.args)):
+                return True
+            # e.g. Enum._convert_("Name", __name__, ...) or setattr(sys.modules[__name__], ...)
+            if any(isinstance(arg, ast.Name) and arg.id == "__name__" for arg in node.args):
+                return True
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Name) and node.slice.id == "__name__":
+            return True
+    return False
+
+def _guarded_names(tree):
+    """ids of the Name nodes whose NameError the code handles or may never trigger, and the
+    names the code itself treats as optional."""
+    ignored, optional = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and any(_catches_name_error(handler) for handler in node.handlers):
+            for child in node.body:
+                for n in ast.walk(child):
+                    ignored.add(id(n))
+                    if isinstance(n, ast.Name):
+                        optional.add(n.id)
+        elif isinstance(node, (ast.If, ast.IfExp)) and _is_environment_test(node.test):
+            # Only one branch runs on a given platform or Python version
+            branches = [node.body, node.orelse] if isinstance(node, ast.IfExp) else node.body + node.orelse
+            for child in branches:
+                ignored.update(id(n) for n in ast.walk(child))
+        elif (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store)
+              and isinstance(node.value, ast.Name) and node.value.id == "builtins"):
+            optional.add(node.attr)
+    if any(isinstance(node, ast.ImportFrom) and node.module == "__future__"
+           and any(alias.name == "annotations" for alias in node.names) for node in tree.body):
+        # Annotations are never evaluated
+        for node in ast.walk(tree):
+            annotations = []
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs + [node.args.vararg, node.args.kwarg]
+                annotations = [arg.annotation for arg in arguments if arg is not None] + [node.returns]
+            elif isinstance(node, ast.AnnAssign):
+                annotations = [node.annotation]
+            for annotation in annotations:
+                if annotation is not None:
+                    ignored.update(id(n) for n in ast.walk(annotation))
+    return ignored, optional
+
+def _is_environment_test(test):
+    for node in ast.walk(test):
+        if isinstance(node, ast.Attribute) and node.attr in ("version_info", "version", "platform", "name"):
+            return True
+        if isinstance(node, ast.Name) and node.id.startswith("PY") and node.id[2:3].isdigit():
+            return True
+    return False
+
+def _catches_name_error(handler):
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(t is None or (isinstance(t, ast.Name) and t.id in ("NameError", "Exception", "BaseException"))
+               for t in types)
+
+def _attribute_diagnostics(tree):
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    if not classes:
+        return []
+    # `obj.attr += 1` reads the attribute before it stores it
+    augmented = {id(node.target) for node in ast.walk(tree) if isinstance(node, ast.AugAssign)}
+    # Attributes set from outside the class (`obj.attr = ...`) may belong to any instance
+    stored_anywhere = {node.attr for node in ast.walk(tree)
+                       if isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store) and id(node) not in augmented}
+    instantiated = {node.func.id for node in ast.walk(tree)
+                    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in classes}
+    own = {}
+
+    def attributes(name, visiting=()):
+        """Attributes instances of local class `name` may have, or None if that cannot be known."""
+        if name in own:
+            return own[name]
+        node = classes[name]
+        names = set(OBJECT_ATTRIBUTES)
+        known = not node.keywords  # a metaclass can add anything
+        for base in node.bases:
+            if isinstance(base, ast.Name) and base.id == "object":
+                continue
+            if isinstance(base, ast.Name) and base.id in classes and base.id not in visiting:
+                inherited = attributes(base.id, visiting + (name,))
+                if inherited is None:
+                    known = False
+                else:
+                    names |= inherited
+            else:
+                known = False
+        # Class-level definitions, also those under if/try in the class body
+        for item in _scope_nodes(node):
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(item.name)
+                if item.name in ("__getattr__", "__getattribute__"):
+                    known = False
+            elif isinstance(item, ast.Name) and isinstance(item.ctx, ast.Store):
+                names.add(item.id)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Attribute):
+                if isinstance(child.ctx, (ast.Store, ast.Del)) and id(child) not in augmented:
+                    names.add(child.attr)
+                elif child.attr in ("__dict__", "__setattr__"):
+                    known = False
+            elif isinstance(child, ast.Call) and isinstance(child.func, ast.Name) and child.func.id == "setattr":
+                known = False
+        own[name] = names if known else None
+        return own[name]
+
+    # A base class method may use attributes only its subclasses define
+    descendants = {name: {name} for name in classes}
+    for name, node in classes.items():
+        for base in node.bases:
+            if isinstance(base, ast.Name) and base.id in classes:
+                descendants[base.id].add(name)
+    changed = True
+    while changed:
+        changed = False
+        for name, family in descendants.items():
+            extended = set().union(*(descendants[member] for member in family))
+            if extended != family:
+                descendants[name] = extended
+                changed = True
+
+    def allowed(name):
+        result = set(stored_anywhere)
+        for member in descendants[name]:
+            member_attributes = attributes(member)
+            if member_attributes is None:
+                return None
+            result |= member_attributes
+        return result
+
+    diagnostics = []
+
+    def check(scope, variable, class_name):
+        names = allowed(class_name)
+        if names is None:
+            return
+        for node in _scope_nodes(scope):
+            if (isinstance(node, ast.Attribute) and (isinstance(node.ctx, ast.Load) or id(node) in augmented)
+                    and isinstance(node.value, ast.Name) and node.value.id == variable
+                    and node.attr not in names):
+                diagnostics.append(Diagnostic(node.lineno, (
+                    f"AttributeError: '{class_name}' object has no attribute '{node.attr}'"
+                    f"{_suggestion(node.attr, names - OBJECT_ATTRIBUTES)}"
+                )))
+
+    # `self` inside the methods of the local classes this file instantiates; a class that is
+    # never instantiated here may be a base for subclasses in other files
+    for class_name, node in classes.items():
+        if not descendants[class_name] & instantiated:
+            continue
+        for item in node.body:
+            if (isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.args.args
+                    and item.name not in ("__new__", "__init_subclass__", "__class_getitem__")
+                    and all(_is_property(d) for d in item.decorator_list)):
+                check(item, item.args.args[0].arg, class_name)
+
+    # Variables bound only to `LocalClass(...)` within a function or the module body
+    scopes = [tree] + [node for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    for scope in scopes:
+        constructed, stores = {}, {}
+        for node in _scope_nodes(scope):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stores[node.id] = stores.get(node.id, 0) + 1
+            elif (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                  and isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name)
+                  and node.value.func.id in classes):
+                constructed[node.targets[0].id] = node.value.func.id
+        if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Parameters and global/nonlocal names are bound elsewhere too
+            arguments = scope.args.posonlyargs + scope.args.args + scope.args.kwonlyargs + [scope.args.vararg, scope.args.kwarg]
+            for arg in arguments:
+                if arg is not None:
+                    stores[arg.arg] = stores.get(arg.arg, 0) + 1
+            for node in _scope_nodes(scope):
+                if isinstance(node, (ast.Global, ast.Nonlocal)):
+                    for name in node.names:
+                        stores[name] = stores.get(name, 0) + 1
+        for variable, class_name in constructed.items():
+            if stores.get(variable) == 1:
+                check(scope, variable, class_name)
+    return diagnostics
+
+def _is_property(decorator):
+    if isinstance(decorator, ast.Name):
+        return decorator.id == "property"
+    return isinstance(decorator, ast.Attribute) and decorator.attr in ("setter", "getter", "deleter")
+
+def _scope_nodes(scope):
+    """Nodes of a scope's own code, without the bodies of nested functions, classes, lambdas and comprehensions."""
+    pending = list(ast.iter_child_nodes(scope))
+    while pending:
+        node = pending.pop()
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Decorators, defaults and bases still run in this scope
+            pending.extend(node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                pending.extend(node.bases + [keyword.value for keyword in node.keywords])
+            else:
+                pending.extend(d for d in node.args.defaults + node.args.kw_defaults if d is not None)
+        elif type(node) not in _SCOPE_NAMES:
+            pending.extend(ast.iter_child_nodes(node))
@@ -0,0 +1,169 @@
+import re
+import ast
+
+# Checks a code completion while it streams in. Markdown fences and lead-in prose
+# are stripped line by line, and every finished top-level statement is parsed as
+# soon as the next one starts, so output that can no longer become valid Python
+# is caught after a few lines instead of after the whole completion.
+
+# Prose allowed before the code starts
+MAX_PREAMBLE_CHARS = 500
+# Lines that look like the start of Python code rather than an introduction
+_CODE_START = re.compile(
+    r"(?:import\s|from\s+[\w.]+\s+import\s|(?:async\s+)?def\s|class\s|@\w|#|"
+    r"(?:if|for|while|with|try|raise|return|assert)\b|\"\"\"|'''|[A-Za-z_][\w.]*(?:\[[^\]]*\])?\s*[-+*/]?=(?!=)|[A-Za-z_][\w.]*\()"
+)
+# Column-0 lines that continue the statement before them
+_CONTINUATION = re.compile(r"(?:else|elif|except|finally)\b|[)\]}#]")
+# Explanation after the code: a sentence ("This script reads ..."), or a label such as
+# "Explanation:", "**Output:**" or "Note: run it with python."
+_PROSE = re.compile(r"(?:[*_]{1,2})?[A-Z][A-Za-z']*[:.!?,]?(?:[*_]{1,2})?(?: \S.*)?$")
+# Parser errors that only mean the statement goes on past the lines seen so far
+_UNFINISHED = re.compile(r"never closed|unterminated triple-quoted|EOF while")
+
+def looks_like_code(line):
+    return bool(_CODE_START.match(line)) or _parses_as_statement(line.strip())
+
+def _parses_as_statement(line):
+    """True for a line that is a statement, or the header of one, such as `match x:`,
+    `x: int = 0`, `global x` or `pass`, which the pattern above does not list."""
+    # A header needs a body to parse; `match` only accepts `case` blocks
+    candidates = [f"{line}\n    pass", f"{line}\n    case _:\n        pass"] if line.endswith(":") else [line]
+    for source in candidates:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            continue
+        statement = tree.body[0]
+        # A lone word ("Sure") is an expression too, and "Usage: python" an annotation
+        if isinstance(statement, ast.Expr):
+            return isinstance(statement.value, (ast.Call, ast.Await))
+        if isinstance(statement, ast.AnnAssign):
+            return statement.value is not None
+        return True
+    return False
+
+class StreamingCodeValidator:
+    """Feed it text deltas; `feed` returns False once the output cannot be valid Python.
+
+    `reason` says why. After the last delta, `finish()` checks the rest and
+    `code` holds the cleaned-up code.
+    """
+
+    def __init__(self, max_preamble=MAX_PREAMBLE_CHARS):
+        self.max_preamble = max_preamble
+        # "preamble", then "code" or "fenced"; "trailer" after a sentence that may end the
+        # code, and "after" once it has ended
+        self.state = "preamble"
+        self.lines = []
+        self.reason = None
+        self._pending = ""
+        self._preamble_chars = 0
+        # lines[:_parsed] is known to parse; later statements are checked from there on
+        self._parsed = 0
+
+    @property
+    def code(self):
+        return "\n".join(self.lines).strip()
+
+    def feed(self, delta):
+        if self.reason is not None:
+            return False
+        if not delta:
+            return True
+        *complete, self._pending = (self._pending + delta).split("\n")
+        for line in complete:
+            self._add_line(line.rstrip("\r"))
+            if self.reason is not None:
+                return False
+        return True
+
+    def finish(self):
+        """Check the code once the stream has ended; True if it parses."""
+        if self.reason is None and self._pending:
+            self._add_line(self._pending.rstrip("\r"))
+            self._pending = ""
+        if self.reason is not None:
+            return False
+        if not self.code:
+            self.reason = "no code in the response"
+            return False
+        if self._parsed < len(self.lines):
+            self._check(len(self.lines), final=True)
+        return self.reason is None
+
+    def _add_line(self, line):
+        stripped = line.strip()
+        if self.state == "after":
+            return
+        if self.state == "trailer":
+            if stripped.startswith("```"):
+                self.state = "after"
+            elif line[:1] not in (" ", "\t") and _parses_as_statement(stripped):
+                # "main() is called at the end." is still explanation; "main()" is more code
+                self.reason = "prose in the middle of the code"
+            return
+        if stripped.startswith("```"):
+            # An opening fence starts the code; any later fence ends it
+            if self.state == "preamble":
+                self.state = "fenced"
+            elif self.state == "code" or self.lines:
+                self._end_code()
+            return
+        if self.state == "preamble":
+            if not stripped:
+                return
+            if not looks_like_code(line):
+                self._preamble_chars += len(line) + 1
+                if self._preamble_chars > self.max_preamble:
+                    self.reason = f"no code in the first {self.max_preamble} characters"
+                return
+            self.state = "code"
+        elif self.state == "fenced" and not self.lines and not stripped:
+            return
+
+        # A new top-level statement means the ones before it are complete
+        if line[:1] not in ("", " ", "\t") and not _CONTINUATION.match(line) and self._statement_ended():
+            self._check(len(self.lines))
+            if self.state == "trailer":
+                # The line that ended the explanation is judged like any line after it
+                self._add_line(line)
+                return
+            if self.reason is not None:
+                return
+        self.lines.append(line)
+
+    def _statement_ended(self):
+        for line in reversed(self.lines):
+            if line.strip():
+                # A decorator belongs to the definition that follows it
+                return not line.startswith("@")
+        return False
+
+    def _end_code(self):
+        if self._parsed < len(self.lines):
+            self._check(len(self.lines), final=True)
+        self.state = "after"
+
+    def _check(self, end, final=False):
+        segment = "\n".join(self.lines[self._parsed:end]) + "\n"
+        try:
+            ast.parse(segment)
+        except SyntaxError as e:
+            if not final and _UNFINISHED.search(e.msg or ""):
+                # Inside a string or bracket that a later line may still close
+                return
+            first = self.lines[self._parsed]
+            if not looks_like_code(first) and _PROSE.match(first.strip()) and self._parsed:
+                # Explanation after the code: keep the code and ignore the rest, unless more code follows.
+                # A markdown heading over it ("## How it works") went in with the code as a comment.
+                del self.lines[self._parsed:]
+                while self.lines and (not self.lines[-1].strip() or self.lines[-1].startswith("#")):
+                    self.lines.pop()
+                self._parsed = len(self.lines)
+                self.state = "trailer" if not final else "after"
+                return
+            line = (e.lineno or 1) + self._parsed
+            self.reason = f"line {line}: {e.msg}"
+            return
+        self._parsed = end
@@ -0,0 +1,139 @@
+import os
+import ast
+import importlib.util
+from auto_coder.executor import SKIPPED_DIRS
+
+# Picks the pytest tests worth re-running after a patch: those whose code refers to
+# a function or class the patch changed. Selection is static (names used in each
+# test), so it needs no coverage data and costs a parse of the test files.
+
+# Stop at the first failure and print plain tracebacks, which patch_code can locate
+PYTEST_ARGS = ["-x", "-q", "--tb=native", "-p", "no:cacheprovider"]
+
+def pytest_available():
+    return importlib.util.find_spec("pytest") is not None
+
+def find_test_files(project_path):
+    """Paths (relative to `project_path`) of the files pytest would collect by default."""
+    found = []
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        for name in sorted(files):
+            if name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py")):
+                found.append(os.path.relpath(os.path.join(root, name), project_path))
+    return found
+
+def changed_names(old_code, new_code):
+    """Names of the functions and classes that differ between two versions of a module.
+
+    Returns None when code outside any function or class changed too, since then
+    anything importing the module may behave differently.
+    """
+    try:
+        old, new = _definitions(old_code), _definitions(new_code)
+    except SyntaxError:
+        return None
+    if old[1] != new[1]:
+        return None
+    old_defs, new_defs = old[0], new[0]
+    changed = set()
+    for qualified_name in old_defs.keys() | new_defs.keys():
+        if old_defs.get(qualified_name) != new_defs.get(qualified_name):
+            # A changed method also counts as a change to its class
+            changed.update(qualified_name.split("."))
+    return changed
+
+def _definitions(code):
+    """({qualified name: dump of its definition}, dump of everything else at module level)."""
+    tree = ast.parse(code)
+    definitions = {}
+    rest = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            definitions[node.name] = ast.dump(node)
+        elif isinstance(node, ast.ClassDef):
+            members = []
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    definitions[f"{node.name}.{item.name}"] = ast.dump(item)
+                else:
+                    members.append(ast.dump(item))
+            header = [ast.dump(part) for part in node.bases + node.keywords + node.decorator_list]
+            definitions[node.name] = "".join(header + members)
+        else:
+            rest.append(ast.dump(node))
+    return definitions, rest
+
+def collect_tests(project_path, test_files):
+    """[(pytest node id, names the test refers to)] for the test functions in `test_files`."""
+    tests = []
+    for test_file in test_files:
+        try:
+            with open(os.path.join(project_path, test_file), "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError, ValueError):
+            continue
+        node_prefix = test_file.replace(os.sep, "/")
+        helpers = {node.name: _referenced_names(node) for node in tree.body
+                   if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+                tests.append((f"{node_prefix}::{node.name}", _with_helpers(_referenced_names(node), helpers)))
+            elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+                # Setup methods and fixtures of the class are shared by all its tests
+                shared = set()
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and not item.name.startswith("test"):
+                        shared |= _referenced_names(item)
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test"):
+                        names = _with_helpers(_referenced_names(item) | shared, helpers)
+                        tests.append((f"{node_prefix}::{node.name}::{item.name}", names))
+    return tests
+
+def _referenced_names(node):
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr)
+        elif isinstance(child, ast.arg):
+            # Fixtures are requested by parameter name
+            names.add(child.arg)
+    return names
+
+def _with_helpers(names, helpers):
+    # Module-level helpers and fixtures of the test file count with what they use
+    for name in list(names):
+        if name in helpers:
+            names |= helpers[name]
+    return names
+
+def select_tests(tests, changed):
+    """Node ids of the tests that refer to one of the `changed` names, in collection order."""
+    return [node_id for node_id, names in tests if names & changed]
+
+def project_tests(project_path):
+    """`collect_tests` for the whole project, or None when it has no tests, pytest is
+    not installed or the test-aware fix loop is disabled with THOTH_FIX_TESTS=0."""
+    if os.getenv("THOTH_FIX_TESTS", "1").lower() in ("0", "false", "off") or not pytest_available():
+        return None
+    test_files = find_test_files(project_path)
+    if not test_files:
+        return None
+    return collect_tests(project_path, test_files)
+
+def strip_pytest_frames(output):
+    """Drop pytest's and pluggy's own frames from --tb=native tracebacks, leaving the project's."""
+    lines = []
+    skipping = False
+    for line in output.splitlines(keepends=True):
+        if line.startswith('  File "'):
+            path = line.split('"')[1].replace("\\", "/")
+            skipping = "/_pytest/" in path or "/pluggy/" in path
+        elif not line.startswith("    "):
+            skipping = False
+        if not skipping:
+            lines.append(line)
+    return "".join(lines)
@@ -0,0 +1,372 @@
+"""Offline benchmarks against the fake provider.
+
+    python -m benchmarks.run chat --requests 200 --concurrency 16
+    python -m benchmarks.run ws --clients 50 --messages 4
+    python -m benchmarks.run fix_loop --cycles 10
+    python -m benchmarks.run startup --startup-runs 10
+    python -m benchmarks.run all --transport http
+
+Every run is appended to benchmarks/results/results.jsonl together with the git
+revision, and compared with the previous run of the same scenario and settings.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+from llm_chat.fake_provider import FakeProvider
+from llm_chat.fake_server import create_fake_server
+from llm_chat.providers import GroqProvider
+from llm_chat.clients import register_provider
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.session_store import SessionStore
+from auto_coder.code_generator import CodeGenerator
+from auto_coder.executor import CodeExecutor
+from agents.agent_manager import AgentManager
+
+console = Console()
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "results.jsonl")
+BENCH_MODEL = "fake-bench"
+SCENARIOS = ("chat", "ws", "fix_loop", "startup")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules that must not be imported just to show the main menu
+LAZY_MODULES = ("groq", "google.generativeai", "httpx", "tiktoken")
+
+BUGGY_SCRIPT = '''def greet(name):
+    return "Hello, " + nme
+
+if __name__ == '__main__':
+    print(greet("Thoth"))
+'''
+FIXED_SCRIPT = BUGGY_SCRIPT.replace("+ nme", "+ name")
+PATCH_RESPONSE = '''<<<<<<< SEARCH
+    return "Hello, " + nme
+=======
+    return "Hello, " + name
+>>>>>>> REPLACE'''
+# The generator always writes the buggy script, so each cycle needs exactly one fix
+FIX_LOOP_SCRIPT = [
+    {"match": "AI code generator", "response": BUGGY_SCRIPT},
+    {"match": "AI code fixer", "response": PATCH_RESPONSE},
+    {"match": "AI code improver", "response": FIXED_SCRIPT},
+]
+
+class FakeHttpProvider(GroqProvider):
+    """The real Groq client talking to the fake server in-process, so SDK and SSE parsing are included.
+
+    httpx's ASGI transport buffers whole responses, so over this transport the
+    time to first token equals the full response time.
+    """
+
+    name = "fake"
+
+    def __init__(self, provider):
+        os.environ.setdefault("GROQ_BASE_URL", "http://fake-groq")
+        transport = httpx.ASGITransport(app=create_fake_server(provider))
+        super().__init__("fake", http_client=httpx.AsyncClient(transport=transport))
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def latency_stats(prefix, values):
+    return {
+        f"{prefix}_mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        f"{prefix}_p50_ms": _ms(percentile(values, 0.5)),
+        f"{prefix}_p95_ms": _ms(percentile(values, 0.95)),
+        f"{prefix}_p99_ms": _ms(percentile(values, 0.99)),
+    }
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+def setup(args, script=None):
+    provider = FakeProvider(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        completion_tokens=args.completion_tokens,
+        script=script,
+        seed=args.seed,
+    )
+    register_provider("fake", None, FakeHttpProvider(provider) if args.transport == "http" else provider)
+    # Sessions are persisted as in real use, but to a throwaway file
+    session_store = SessionStore(os.path.join(tempfile.mkdtemp(prefix="thoth_bench_"), "sessions.sqlite"))
+    chat_handler = ChatHandler(BENCH_MODEL, cache=False, session_store=session_store)
+    # Every cycle really runs its scripts, as the responses are never cached either
+    agent_manager = AgentManager(chat_handler, CodeGenerator(chat_handler), executor=CodeExecutor(run_cache=False))
+    return provider, agent_manager
+
+async def bench_chat(args):
+    """Chat throughput through AgentManager: `concurrency` sessions sending messages back to back."""
+    provider, agent_manager = setup(args)
+    latencies, failures = [], 0
+    per_client = max(1, args.requests // args.concurrency)
+
+    async def client(index):
+        nonlocal failures
+        session = agent_manager.chat_handler.new_session()
+        for turn in range(per_client):
+            started = time.perf_counter()
+            handle = await agent_manager.add_task("chat", message=f"Client {index} question {turn}", chat_handler=session)
+            response, _ = await handle
+            latencies.append(time.perf_counter() - started)
+            failures += response is None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    await agent_manager.stop()
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "provider_calls": provider.calls,
+        **latency_stats("latency", latencies),
+        "overhead_mean_ms": round((sum(latencies) - provider.simulated_seconds) / len(latencies) * 1000, 3),
+    }
+
+async def bench_ws(args):
+    """Concurrent /ws clients on the web UI app, driven in-process through the ASGI interface."""
+    from webui.app import create_app
+
+    provider, agent_manager = setup(args)
+    app = create_app(agent_manager)
+    latencies, first_tokens, failures = [], [], 0
+
+    async def client(index):
+        nonlocal failures
+        inbox, frames = asyncio.Queue(), asyncio.Queue()
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                await frames.put(json.loads(message["text"]))
+            elif message["type"] == "websocket.close":
+                await frames.put({"type": "closed"})
+
+        scope = {
+            "type": "websocket", "path": "/ws", "raw_path": b"/ws", "query_string": b"", "headers": [],
+            "scheme": "ws", "server": ("bench", 80), "client": ("bench", index), "root_path": "",
+            "subprotocols": [], "asgi": {"version": "3.0"},
+        }
+        await inbox.put({"type": "websocket.connect"})
+        connection = asyncio.create_task(app(scope, inbox.get, send))
+        for turn in range(args.messages):
+            started = time.perf_counter()
+            first_token = None
+            await inbox.put({"type": "websocket.receive", "text": f"Client {index} question {turn}"})
+            while True:
+                frame = await frames.get()
+                if frame["type"] == "delta" and first_token is None:
+                    first_token = time.perf_counter() - started
+                if frame["type"] in ("done", "error", "closed"):
+                    break
+            latencies.append(time.perf_counter() - started)
+            if first_token is not None:
+                first_tokens.append(first_token)
+            failures += frame["type"] != "done"
+            if frame["type"] == "closed":
+                # Rejected by the server (1013), e.g. more clients than max_connections
+                failures += args.messages - turn - 1
+                break
+        await inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await connection
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    wall = time.perf_counter() - started
+    await agent_manager.stop()
+    return {
+        "messages": len(latencies),
+        "failures": failures,
+        "wall_s": round(wall, 3),
+        "throughput_mps": round(len(latencies) / wall, 2),
+        **latency_stats("latency", latencies),
+        **latency_stats("first_token", first_tokens),
+        "overhead_mean_ms": round((sum(latencies) - provider.simulated_seconds) / len(latencies) * 1000, 3),
+    }
+
+async def bench_fix_loop(args):
+    """End-to-end generate -> run -> patch -> run cycles through main.run_and_fix_code."""
+    import main
+
+    main.console.quiet = not args.verbose
+    provider, agent_manager = setup(args, FIX_LOOP_SCRIPT)
+    durations, failures = [], 0
+    with tempfile.TemporaryDirectory(prefix="thoth_bench_") as workdir:
+        for cycle in range(args.cycles):
+            project_path = os.path.join(workdir, f"cycle_{cycle}")
+            file_path = os.path.join(project_path, "bench.py")
+            started = time.perf_counter()
+            await agent_manager.code_generator.generate_code("Greet Thoth", file_path)
+            await main.run_and_fix_code(agent_manager, project_path, "bench.py")
+            durations.append(time.perf_counter() - started)
+            result = await agent_manager.executor.run("bench.py", project_path)
+            failures += not result.success
+    await agent_manager.stop()
+    return {
+        "cycles": len(durations),
+        "failures": failures,
+        "provider_calls": provider.calls,
+        **latency_stats("cycle", durations),
+        "overhead_mean_ms": round((sum(durations) - provider.simulated_seconds) / len(durations) * 1000, 3),
+    }
+
+async def bench_startup(args):
+    """Cold import of main.py in fresh interpreters, with a `-X importtime` breakdown of the slowest modules."""
+    walls, imports = [], []
+    for _ in range(args.startup_runs):
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-X", "importtime", "-c", "import main",
+            cwd=REPO_ROOT, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        walls.append(time.perf_counter() - started)
+        imports.append(parse_importtime(stderr.decode()))
+
+    last = imports[-1]
+    slowest = sorted(((name, cumulative) for name, (_, cumulative) in last.items() if name != "main"), key=lambda item: -item[1])
+    table = Table(title="Slowest imports (cumulative, last run)")
+    table.add_column("Module")
+    table.add_column("ms", justify="right")
+    for name, cumulative in slowest[:args.startup_top]:
+        table.add_row(name, f"{cumulative / 1000:.1f}")
+    console.print(table)
+
+    loaded = [name for name in LAZY_MODULES if name in last]
+    if loaded:
+        console.print(f"[bold red]Imported at startup but should be lazy: {', '.join(loaded)}[/bold red]")
+
+    main_times = [timings["main"][1] / 1e6 for timings in imports if "main" in timings]
+    return {
+        "runs": len(walls),
+        **latency_stats("interpreter_wall", walls),
+        **latency_stats("import_main", main_times),
+        "modules_imported": len(last),
+        "lazy_modules_imported": len(loaded),
+    }
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from `python -X importtime` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue  # the header line
+    return timings
+
+BENCHMARKS = {"chat": bench_chat, "ws": bench_ws, "fix_loop": bench_fix_loop, "startup": bench_startup}
+# Settings that change what a scenario measures; runs are only compared when these match
+SCENARIO_PARAMS = {
+    "chat": ("requests", "concurrency"),
+    "ws": ("clients", "messages"),
+    "fix_loop": ("cycles",),
+    "startup": ("startup_runs",),
+}
+PROVIDER_PARAMS = ("transport", "latency", "tokens_per_second", "error_rate", "throttle_rate", "completion_tokens", "seed")
+PROVIDER_SCENARIOS = ("chat", "ws", "fix_loop")
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return revision, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_result(record, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+def print_result(record, previous):
+    title = f"{record['scenario']} @ {record['revision'] or 'unknown'}{' (dirty)' if record['dirty'] else ''}"
+    table = Table(title=title)
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    if previous:
+        table.add_column(f"Previous ({previous['revision'] or 'unknown'})", justify="right")
+        table.add_column("Change", justify="right")
+    for name, value in record["results"].items():
+        row = [name, str(value)]
+        if previous:
+            before = previous["results"].get(name)
+            row.append(str(before))
+            row.append(f"{(value - before) / before * 100:+.1f}%" if isinstance(value, (int, float)) and before else "")
+        table.add_row(*row)
+    console.print(table)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Thoth-Bot against the offline fake provider.")
+    parser.add_argument("scenario", choices=SCENARIOS + ("all",))
+    parser.add_argument("--requests", type=int, default=200, help="chat: total messages")
+    parser.add_argument("--concurrency", type=int, default=16, help="chat: concurrent sessions")
+    parser.add_argument("--clients", type=int, default=50, help="ws: concurrent connections")
+    parser.add_argument("--messages", type=int, default=4, help="ws: messages per connection")
+    parser.add_argument("--cycles", type=int, default=10, help="fix_loop: generate/fix cycles")
+    parser.add_argument("--startup-runs", type=int, default=10, help="startup: fresh interpreters to time")
+    parser.add_argument("--startup-top", type=int, default=15, help="startup: slowest imports to list")
+    parser.add_argument("--transport", choices=("inprocess", "http"), default="inprocess",
+                        help="call the fake provider directly, or through the Groq SDK and the fake HTTP server")
+    parser.add_argument("--latency", default="lognormal:0.3:0.4", help="time-to-first-token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-save", action="store_true", help="do not append the result to the results file")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's console output")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Injected failures would otherwise print a retry message per request
+        for module in ("llm_chat.chat_handler", "auto_coder.code_generator"):
+            sys.modules[module].console.quiet = True
+
+    revision, dirty = git_revision()
+    history = load_results()
+    for scenario in SCENARIOS if args.scenario == "all" else (args.scenario,):
+        names = SCENARIO_PARAMS[scenario] + (PROVIDER_PARAMS if scenario in PROVIDER_SCENARIOS else ())
+        params = {name: getattr(args, name) for name in names}
+        results = asyncio.run(BENCHMARKS[scenario](args))
+        record = {
+            "scenario": scenario,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": revision,
+            "dirty": dirty,
+            "python": platform.python_version(),
+            "params": params,
+            "results": results,
+        }
+        previous = next((r for r in reversed(history) if r["scenario"] == scenario and r["params"] == params), None)
+        print_result(record, previous)
+        if not args.no_save:
+            save_result(record)
+
+if __name__ == "__main__":
+    main()
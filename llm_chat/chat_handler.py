@@ -1,82 +1,593 @@
-import os
-import google.generativeai as genai
-from groq import Groq
-from rich.console import Console
+import copy
 import time
+import uuid
+import asyncio
+from rich.console import Console
+from llm_chat.providers import ResponseBlocked
+from llm_chat.clients import get_provider, get_api_key, provider_name_for
+from llm_chat.response_cache import ResponseCache, get_default_cache
+from llm_chat.history import ConversationHistory
+from llm_chat.session_store import get_session_store
+from llm_chat.rate_limiter import get_rate_limiter
+from llm_chat.tokens import count_tokens, count_message_tokens
+from llm_chat.coalescing import get_single_flight
+from llm_chat.router import is_cheap_chat, is_confident
+from llm_chat.health import CircuitOpenError, get_provider_health, current_policy
+from utils.metrics import metrics
+from utils.helpers import log_token_usage
+from utils.tracing import start_span, current_span, add_event
 
 console = Console()
 
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the previous summary (if any) with the new messages into one concise summary.
+Keep facts, decisions, names, file names and code identifiers the user may refer back to.
+Write plain prose without any introduction.
+"""
+
+class ChatStream:
+    """Async iterator of text deltas.
+
+    `text`, `usage` and `error` are set once the stream is exhausted; a failed
+    stream keeps whatever partial text arrived but is not passed to `on_complete`.
+    Iterating again (or calling `collect()`) after a `break` carries on where the
+    last loop stopped.
+    """
+
+    def __init__(self, chunks, on_complete=None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self._parts = []
+        self._iterator = None
+        self.text = None
+        self.usage = None
+        self.error = None
+
+    def __aiter__(self):
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    async def _iterate(self):
+        try:
+            async for delta, usage in self._chunks:
+                if usage:
+                    self.usage = usage
+                if delta:
+                    self._parts.append(delta)
+                    yield delta
+        except Exception as e:
+            self.error = e
+        self.text = "".join(self._parts)
+        if self._on_complete and not self.error:
+            self._on_complete(self)
+
+    async def aclose(self):
+        """Stop reading early; the upstream request is abandoned and `text` keeps what arrived."""
+        if self._iterator is not None:
+            await self._iterator.aclose()
+        await self._chunks.aclose()
+        if self.text is None:
+            self.text = "".join(self._parts)
+
+    async def collect(self):
+        async for _ in self:
+            pass
+        if self.error:
+            return None, None
+        return self.text, self.usage
+
+class _StreamRacer:
+    """Reads a stream in its own task so that it can be raced, and cancelled, before it produces text.
+
+    `decided` is done once the first text delta has arrived or the stream has ended;
+    `error` is set if it failed before producing any text.
+    """
+
+    def __init__(self, source):
+        self.queue = asyncio.Queue()
+        self.decided = asyncio.get_running_loop().create_future()
+        self.error = None
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for delta, usage in source:
+                self.queue.put_nowait((delta, usage))
+                if delta:
+                    self._decide()
+        except Exception as e:
+            if not self.decided.done():
+                self.error = e
+            self.queue.put_nowait(e)
+        else:
+            self.queue.put_nowait(None)
+        self._decide()
+
+    def _decide(self):
+        if not self.decided.done():
+            self.decided.set_result(None)
+
+    async def chunks(self):
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.task.cancel()
+
 class ChatHandler:
-    def __init__(self, model_id):
+    max_retries = 3
+    retry_base_delay = 1.0
+    # 429s wait on the rate limiter instead of using up max_retries
+    max_throttle_retries = 6
+    # Optional ModelRouter: cheap requests try a fast model before this one
+    router = None
+
+    def __init__(self, model_id, cache=None, session_store=None):
         self.model_id = model_id
-        
-        if "gemini" in model_id:
-            self.api_key = os.getenv("GEMINI_API_KEY")
-            if not self.api_key:
-                raise ValueError("GEMINI_API_KEY is not set. Please set it in the Settings menu.")
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(model_id)
-            self.chat = self.model.start_chat(history=[])
-        else:
-            self.api_key = os.getenv("GROQ_API_KEY")
-            if not self.api_key:
-                raise ValueError("GROQ_API_KEY is not set. Please set it in the Settings menu.")
-            self.client = Groq(api_key=self.api_key)
-        
-        self.conversation_history = []
+        # cache=False disables response caching for this handler
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        # session_store=False keeps conversations in memory only
+        self.session_store = get_session_store() if session_store is None else (session_store or None)
+
+        # Provider clients (and their connection pools) are shared process-wide
+        provider_name = provider_name_for(model_id)
+        self.api_key = get_api_key(provider_name)
+        self.provider = get_provider(provider_name, self.api_key)
+        if provider_name == "gemini":
+            self.model = self.provider.get_model(model_id)
+        elif provider_name == "groq":
+            self.client = self.provider.client
+
+        self.rate_limiter = get_rate_limiter(self.provider.name, model_id)
+        # Circuit breaker and latency window, shared by every handler of this provider
+        self.health = get_provider_health(self.provider.name)
+        # Handlers for backup models named by resilience policies, created on first use
+        self._backups = {}
+        # Identical requests in flight at the same time share one provider call
+        self.single_flight = get_single_flight()
+        self.session_id = uuid.uuid4().hex[:12]
+        self.history = self._new_history()
+
+    def new_session(self, session_id=None):
+        """A handler with its own conversation that shares this one's provider client and cache.
+
+        Given the id of a stored session, its conversation is resumed.
+        """
+        session = copy.copy(self)
+        session.session_id = session_id or uuid.uuid4().hex[:12]
+        session.history = session._new_history(self.history.token_budget)
+        return session
+
+    def _new_history(self, token_budget=None):
+        return ConversationHistory(self.model_id, token_budget, summarize=self._summarize,
+                                   store=self.session_store, session_id=self.session_id)
+
+    @property
+    def conversation_history(self):
+        return self.history.messages
 
     async def send_message(self, message, system_prompt=None):
-        max_retries = 3
-        for attempt in range(max_retries):
+        messages = await self.history.prompt_messages(message)
+        if self.router:
+            assistant_message, usage_dict = await self.router.complete(
+                "chat", self, messages, system_prompt, cheap=is_cheap_chat(message), check=is_confident
+            )
+        else:
+            assistant_message, usage_dict = await self.complete(messages, system_prompt)
+        if assistant_message is None:
+            return None, None
+
+        self.history.append("user", message)
+        self.history.append("assistant", assistant_message)
+        log_token_usage("chat", usage_dict)
+
+        return assistant_message, usage_dict
+
+    async def complete(self, messages, system_prompt=None, bypass_cache=False, raise_blocked=False, coalesce=None, **config):
+        """One-shot completion with retries; does not touch the conversation history.
+
+        Blocked responses are not retried. They return (None, None) like any other
+        failure unless `raise_blocked` is set, in which case ResponseBlocked propagates.
+
+        Identical concurrent requests share one provider call unless `coalesce` is
+        False. It defaults to `not bypass_cache`: a caller that skips the cache wants
+        its own sample, not a copy of someone else's.
+        """
+        policy = current_policy()
+        with start_span("llm.complete", model=self.model_id, session=self.session_id):
             try:
-                if "gemini" in self.model_id:
-                    if system_prompt:
-                        message = f"{system_prompt}\n\n{message}"
-                    
-                    response = self.chat.send_message(message)
-                    if not response.text:
-                        raise ValueError("Empty response from Gemini API")
-                    assistant_message = response.text
-                    
-                    # Token sayısını hesaplamak için alternatif bir yöntem
-                    prompt_tokens = len(message.split())
-                    completion_tokens = len(assistant_message.split())
-                    total_tokens = prompt_tokens + completion_tokens
-                else:
-                    messages = self.conversation_history + [{"role": "user", "content": message}]
-                    if system_prompt:
-                        messages.insert(0, {"role": "system", "content": system_prompt})
-                    
-                    chat_completion = self.client.chat.completions.create(
-                        messages=messages,
-                        model=self.model_id,
-                        max_tokens=1024
-                    )
-                    assistant_message = chat_completion.choices[0].message.content
-                    prompt_tokens = chat_completion.usage.prompt_tokens
-                    completion_tokens = chat_completion.usage.completion_tokens
-                    total_tokens = chat_completion.usage.total_tokens
-                
-                usage_dict = {
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": total_tokens
-                }
-                
-                self.conversation_history.append({"role": "user", "content": message})
-                self.conversation_history.append({"role": "assistant", "content": assistant_message})
-                
-                return assistant_message, usage_dict
+                if policy and policy.backup_model and policy.backup_model != self.model_id:
+                    return await self._complete_resilient(policy, messages, system_prompt, bypass_cache, coalesce, **config)
+                return await self._complete(messages, system_prompt, bypass_cache, coalesce, **config)
+            except ResponseBlocked:
+                if raise_blocked:
+                    raise
+                return None, None
+
+    async def _complete_resilient(self, policy, messages, system_prompt, bypass_cache, coalesce, **config):
+        """`_complete` with failover to the policy's backup model and, if enabled, a hedged second request."""
+        backup = self.backup_handler(policy.backup_model)
+        if backup is None:
+            return await self._complete(messages, system_prompt, bypass_cache, coalesce, **config)
+        if self.health.is_open():
+            self._record_failover(backup, "circuit_open")
+            return await backup._complete(messages, system_prompt, bypass_cache, coalesce, **config)
+
+        primary = asyncio.ensure_future(self._complete(messages, system_prompt, bypass_cache, coalesce, **config))
+        racers = [primary]
+        try:
+            hedge_after = policy.hedge_after if policy.hedge_after is not None else self.health.p95(self.model_id)
+            if policy.hedge and hedge_after is not None:
+                done, _ = await asyncio.wait([primary], timeout=hedge_after)
+                if not done:
+                    # Slower than usual: ask the backup too and keep whichever answers first
+                    metrics.inc("thoth_hedged_requests_total", model=self.model_id, backup=backup.model_id)
+                    add_event("hedge", backup=backup.model_id, after_ms=round(hedge_after * 1000, 3))
+                    racers.append(asyncio.ensure_future(backup._complete(messages, system_prompt, bypass_cache, coalesce, **config)))
+            for next_done in asyncio.as_completed(racers):
+                try:
+                    response, usage = await next_done
+                except ResponseBlocked:
+                    raise
+                except Exception:
+                    continue
+                if response is not None:
+                    return response, usage
+        finally:
+            for task in racers:
+                task.cancel()
+
+        if len(racers) > 1:
+            return None, None
+        self._record_failover(backup, "failed")
+        return await backup._complete(messages, system_prompt, bypass_cache, coalesce, **config)
+
+    def backup_handler(self, model_id):
+        if model_id not in self._backups:
+            try:
+                self._backups[model_id] = type(self)(model_id, cache=self.cache or False, session_store=False)
             except Exception as e:
-                console.print(f"[bold yellow]Attempt {attempt + 1} failed: {str(e)}[/bold yellow]")
-                if attempt < max_retries - 1:
-                    console.print(f"[bold yellow]Retrying in 2 seconds...[/bold yellow]")
-                    time.sleep(2)
-                else:
-                    console.print(f"[bold red]Error in ChatHandler after {max_retries} attempts: {str(e)}[/bold red]")
+                console.print(f"[bold red]Backup model {model_id} is unavailable: {str(e)}[/bold red]")
+                self._backups[model_id] = None
+        return self._backups[model_id]
+
+    def _record_failover(self, backup, reason):
+        metrics.inc("thoth_failovers_total", model=self.model_id, backup=backup.model_id, reason=reason)
+        add_event("failover", backup=backup.model_id, reason=reason)
+        console.print(f"[bold yellow]{self.model_id} is unavailable, using {backup.model_id} instead...[/bold yellow]")
+
+    async def _complete(self, messages, system_prompt, bypass_cache, coalesce, **config):
+        cache_key = None
+        if self.cache and not bypass_cache:
+            cache_key = ResponseCache.make_key(self.model_id, system_prompt, messages, config)
+            cached = self.cache.get(cache_key)
+            self._record_cache_lookup(cached)
+            if cached:
+                return cached
+
+        if not self._should_coalesce(bypass_cache, coalesce):
+            return await self._complete_with_retries(cache_key, messages, system_prompt, **config)
+        key = cache_key or ResponseCache.make_key(self.model_id, system_prompt, messages, config)
+        return await self.single_flight.call(
+            key,
+            lambda: self._complete_with_retries(cache_key, messages, system_prompt, **config),
+            on_shared=self._record_coalesced
+        )
+
+    async def _complete_with_retries(self, cache_key, messages, system_prompt, **config):
+        # Raises ResponseBlocked so that every coalesced waiter can handle it its own way
+        retry_state = self._retry_state()
+        while True:
+            try:
+                response, usage = await self._call_provider(messages, system_prompt, **config)
+                if cache_key:
+                    self.cache.put(cache_key, response, usage)
+                return response, usage
+            except ResponseBlocked as e:
+                console.print(f"[bold yellow]{str(e)}[/bold yellow]")
+                raise
+            except Exception as e:
+                if not await self._should_retry(e, retry_state):
                     return None, None
 
+    def _should_coalesce(self, bypass_cache, coalesce):
+        if self.single_flight is None:
+            return False
+        return not bypass_cache if coalesce is None else coalesce
+
+    def _record_coalesced(self):
+        metrics.inc("thoth_coalesced_requests_total", model=self.model_id)
+        span = current_span()
+        if span is not None:
+            span.set(coalesced=True)
+
+    async def _call_provider(self, messages, system_prompt=None, **config):
+        self.health.check()
+        queued = time.monotonic()
+        async with self.rate_limiter.request(self._estimate_tokens(messages, system_prompt, config)) as permit:
+            started = time.monotonic()
+            with start_span("llm.provider_call", provider=self.provider.name, model=self.model_id,
+                            rate_limit_wait_ms=round((started - queued) * 1000, 3)):
+                try:
+                    response, usage = await self.provider.complete(
+                        self.model_id, messages, system_prompt, on_headers=permit.observe_headers, **config
+                    )
+                except Exception as e:
+                    self._check_throttle(e, permit)
+                    self._record_call(started, error=e)
+                    raise
+                permit.record_usage(usage)
+                self._record_call(started, usage)
+                return response, usage
+
+    def _record_call(self, started, usage=None, error=None):
+        # Latency covers the provider call only; time spent waiting for a rate-limit permit is excluded
+        if error is None:
+            status = "ok"
+        elif self.provider.throttle_delay(error) is not None:
+            status = "throttled"
+        else:
+            status = "error"
+        duration = time.monotonic() - started
+        metrics.inc("thoth_requests_total", model=self.model_id, status=status)
+        metrics.observe("thoth_request_duration_seconds", duration, model=self.model_id)
+        # Throttling is the rate limiter's business and a blocked response is the prompt's, not the provider's health
+        if status == "ok":
+            self.health.record_success(self.model_id, duration)
+        elif status == "error" and not isinstance(error, ResponseBlocked):
+            self.health.record_failure()
+        tokens = 0
+        if usage:
+            source = "estimate" if usage.get("estimated") else "provider"
+            metrics.inc("thoth_tokens_total", usage.get("prompt_tokens", 0), model=self.model_id, kind="prompt", source=source)
+            metrics.inc("thoth_tokens_total", usage.get("completion_tokens", 0), model=self.model_id, kind="completion", source=source)
+            tokens = usage.get("total_tokens", 0)
+        metrics.record_session(self.session_id, tokens=tokens, requests=1, errors=int(error is not None))
+        span = current_span()
+        if span is not None and usage:
+            span.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+
+    def _record_cache_lookup(self, cached):
+        span = current_span()
+        if span is not None:
+            span.set(cache_hit=bool(cached))
+        if cached:
+            metrics.inc("thoth_cache_hits_total", model=self.model_id)
+        else:
+            metrics.inc("thoth_cache_misses_total", model=self.model_id)
+
+    def _estimate_tokens(self, messages, system_prompt, config):
+        # Providers reserve max_tokens against the minute quota; record_usage refunds the difference
+        prompt_tokens = count_tokens(system_prompt) + sum(count_message_tokens(m) for m in messages)
+        return prompt_tokens + (config.get("max_tokens") or 1024)
+
+    def _check_throttle(self, error, permit):
+        retry_after = self.provider.throttle_delay(error)
+        if retry_after is not None:
+            permit.throttle(retry_after or None)
+
+    def _retry_state(self):
+        policy = current_policy()
+        max_retries = policy.max_retries if policy and policy.max_retries is not None else self.max_retries
+        return {"attempt": 0, "throttles": 0, "max_retries": max_retries}
+
+    async def _should_retry(self, error, retry_state):
+        """Back off after `error` and return True if the request should be sent again."""
+        if isinstance(error, CircuitOpenError):
+            # Failing fast is the point; waiting out the backoff would not close the circuit
+            console.print(f"[bold yellow]{str(error)}[/bold yellow]")
+            return False
+        if self.provider.throttle_delay(error) is not None and retry_state["throttles"] < self.max_throttle_retries:
+            # The limiter has already paused this model, so the next permit is the backoff
+            retry_state["throttles"] += 1
+            metrics.inc("thoth_retries_total", model=self.model_id)
+            add_event("retry", reason="rate_limited", attempt=retry_state["throttles"])
+            console.print(f"[bold yellow]Rate limited by {self.provider.name}, waiting for quota...[/bold yellow]")
+            return True
+
+        retry_state["attempt"] += 1
+        console.print(f"[bold yellow]Attempt {retry_state['attempt']} failed: {str(error)}[/bold yellow]")
+        if retry_state["attempt"] < retry_state["max_retries"]:
+            delay = self.retry_base_delay * 2 ** (retry_state["attempt"] - 1)
+            console.print(f"[bold yellow]Retrying in {delay:g} seconds...[/bold yellow]")
+            metrics.inc("thoth_retries_total", model=self.model_id)
+            add_event("retry", reason=type(error).__name__, attempt=retry_state["attempt"], delay=delay)
+            await asyncio.sleep(delay)
+            return True
+        console.print(f"[bold red]Error in ChatHandler after {retry_state['attempt']} attempts: {str(error)}[/bold red]")
+        return False
+
+    def stream_message(self, message, system_prompt=None, bypass_cache=False, coalesce=None, policy=None):
+        """Stream a reply to `message` and add both to the conversation once it completes.
+
+        With a `policy` that names a backup model, the reply comes from the backup when
+        this provider's circuit is open or the stream fails before its first token. A hedging
+        policy also starts the backup when the first token is later than usual, and the
+        stream that produces text first is the one shown.
+        """
+        policy = policy or current_policy()
+
+        def record(stream):
+            if stream.text:
+                self.history.append("user", message)
+                self.history.append("assistant", stream.text)
+                log_token_usage("chat", stream.usage)
+
+        async def chunks():
+            messages = await self.history.prompt_messages(message)
+            if self.router:
+                source = self.router.stream("chat", self, messages, system_prompt, cheap=is_cheap_chat(message),
+                                            bypass_cache=bypass_cache, coalesce=coalesce)
+            else:
+                source = self._stream_cached(messages, system_prompt, bypass_cache, coalesce)
+            if policy and policy.backup_model and policy.backup_model != self.model_id:
+                source = self._stream_with_failover(policy, source, messages, system_prompt, bypass_cache, coalesce)
+            async for chunk in source:
+                yield chunk
+
+        return ChatStream(chunks(), on_complete=record)
+
+    async def _stream_with_failover(self, policy, source, messages, system_prompt, bypass_cache, coalesce, **config):
+        backup = self.backup_handler(policy.backup_model)
+        if backup is None:
+            async for chunk in source:
+                yield chunk
+            return
+        if self.health.is_open():
+            reason = "circuit_open"
+        else:
+            hedged = False
+            hedge_after = policy.hedge_after if policy.hedge_after is not None else self.health.p95(self.model_id, first_token=True)
+            if policy.hedge and hedge_after is not None:
+                source, hedged = await self._hedge_stream(backup, hedge_after, source, messages, system_prompt,
+                                                          bypass_cache, coalesce, **config)
+            started = False
+            try:
+                async for delta, usage in source:
+                    started = started or bool(delta)
+                    yield delta, usage
+                return
+            except ResponseBlocked:
+                raise
+            except Exception:
+                # Text already shown cannot be replaced by another model's answer, and a hedged backup has had its turn
+                if started or hedged:
+                    raise
+            finally:
+                await source.aclose()
+            reason = "failed"
+        self._record_failover(backup, reason)
+        async for chunk in backup._stream_cached(messages, system_prompt, bypass_cache, coalesce, **config):
+            yield chunk
+
+    async def _hedge_stream(self, backup, hedge_after, source, messages, system_prompt, bypass_cache, coalesce, **config):
+        """Start the backup's stream too if `source` has no text after `hedge_after` seconds.
+
+        Returns the chunks of whichever stream produces text first (the other is cancelled)
+        and whether the backup was asked.
+        """
+        racers = [_StreamRacer(source)]
+        try:
+            done, _ = await asyncio.wait([racers[0].decided], timeout=hedge_after)
+            if done:
+                return racers.pop().chunks(), False
+            metrics.inc("thoth_hedged_requests_total", model=self.model_id, backup=backup.model_id)
+            add_event("hedge", backup=backup.model_id, after_ms=round(hedge_after * 1000, 3), first_token=True)
+            racers.append(_StreamRacer(backup._stream_cached(messages, system_prompt, bypass_cache, coalesce, **config)))
+            error = None
+            while racers:
+                await asyncio.wait([racer.decided for racer in racers], return_when=asyncio.FIRST_COMPLETED)
+                for racer in [racer for racer in racers if racer.decided.done()]:
+                    if racer.error is None:
+                        racers.remove(racer)
+                        return racer.chunks(), True
+                    if isinstance(racer.error, ResponseBlocked):
+                        raise racer.error
+                    racers.remove(racer)
+                    error = racer.error
+            raise error
+        finally:
+            for racer in racers:
+                racer.task.cancel()
+
+    def stream(self, messages, system_prompt=None, bypass_cache=False, coalesce=None, **config):
+        """Streaming counterpart of `complete`; fails over and hedges like `stream_message`."""
+        source = self._stream_cached(messages, system_prompt, bypass_cache, coalesce, **config)
+        policy = current_policy()
+        if policy and policy.backup_model and policy.backup_model != self.model_id:
+            source = self._stream_with_failover(policy, source, messages, system_prompt, bypass_cache, coalesce, **config)
+        return ChatStream(source)
+
+    async def _stream_cached(self, messages, system_prompt=None, bypass_cache=False, coalesce=None, **config):
+        cache_key = None
+        if self.cache and not bypass_cache:
+            cache_key = ResponseCache.make_key(self.model_id, system_prompt, messages, config)
+            cached = self.cache.get(cache_key)
+            self._record_cache_lookup(cached)
+            if cached:
+                yield cached
+                return
+
+        if self._should_coalesce(bypass_cache, coalesce):
+            # Late joiners replay the deltas already received, then follow live
+            key = cache_key or ResponseCache.make_key(self.model_id, system_prompt, messages, config)
+            chunks = self.single_flight.stream(
+                key,
+                lambda: self._stream_and_cache(cache_key, messages, system_prompt, **config),
+                on_shared=self._record_coalesced
+            )
+        else:
+            chunks = self._stream_and_cache(cache_key, messages, system_prompt, **config)
+        async for chunk in chunks:
+            yield chunk
+
+    async def _stream_and_cache(self, cache_key, messages, system_prompt=None, **config):
+        parts = []
+        usage = None
+        async for delta, chunk_usage in self._stream_with_retries(messages, system_prompt, **config):
+            if delta:
+                parts.append(delta)
+            usage = chunk_usage or usage
+            yield delta, chunk_usage
+        if cache_key:
+            self.cache.put(cache_key, "".join(parts), usage)
+
+    async def _stream_with_retries(self, messages, system_prompt=None, **config):
+        retry_state = self._retry_state()
+        while True:
+            started = False
+            try:
+                self.health.check()
+                async with self.rate_limiter.request(self._estimate_tokens(messages, system_prompt, config)) as permit:
+                    call_started = time.monotonic()
+                    final_usage = None
+                    with start_span("llm.provider_stream", provider=self.provider.name, model=self.model_id) as span:
+                        try:
+                            async for delta, usage in self.provider.stream(
+                                self.model_id, messages, system_prompt, on_headers=permit.observe_headers, **config
+                            ):
+                                if delta and not started:
+                                    first_token = time.monotonic() - call_started
+                                    metrics.observe("thoth_time_to_first_token_seconds", first_token, model=self.model_id)
+                                    self.health.record_first_token(self.model_id, first_token)
+                                    span.set(time_to_first_token_ms=round(first_token * 1000, 3))
+                                started = started or bool(delta)
+                                permit.record_usage(usage)
+                                final_usage = usage or final_usage
+                                yield delta, usage
+                        except Exception as e:
+                            self._check_throttle(e, permit)
+                            self._record_call(call_started, error=e)
+                            raise
+                        self._record_call(call_started, final_usage)
+                return
+            except ResponseBlocked as e:
+                console.print(f"[bold yellow]{str(e)}[/bold yellow]")
+                raise
+            except Exception as e:
+                # Once text has reached the caller a retry would duplicate it
+                if started:
+                    console.print(f"[bold red]Stream interrupted: {str(e)}[/bold red]")
+                    raise
+                if not await self._should_retry(e, retry_state):
+                    raise
+
+    async def _summarize(self, previous_summary, messages):
+        transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = f"Previous summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+        summary, _ = await self.complete(
+            [{"role": "user", "content": prompt}],
+            SUMMARY_SYSTEM_PROMPT,
+            max_tokens=self.history.summary_budget
+        )
+        return summary
+
     def reset_conversation(self):
-        self.conversation_history = []
-        if "gemini" in self.model_id:
-            self.chat = self.model.start_chat(history=[])
\ No newline at end of file
+        self.history.reset()
@@ -0,0 +1,60 @@
+import os
+import threading
+from llm_chat.providers import GroqProvider, GeminiProvider
+from llm_chat.fake_provider import FakeProvider
+
+PROVIDER_API_KEYS = {"groq": "GROQ_API_KEY", "gemini": "GEMINI_API_KEY"}
+
+# One keep-alive pool per API key, shared by every ChatHandler using it
+HTTP_LIMITS = {"max_connections": 100, "max_keepalive_connections": 20, "keepalive_expiry": 60}
+HTTP_TIMEOUT = {"timeout": 60.0, "connect": 10.0}
+
+_providers = {}
+_lock = threading.Lock()
+
+def provider_name_for(model_id):
+    if model_id.startswith("fake"):
+        return "fake"
+    return "gemini" if "gemini" in model_id else "groq"
+
+def get_api_key(provider_name):
+    env_name = PROVIDER_API_KEYS.get(provider_name)
+    if env_name is None:
+        # Local providers need no key
+        return None
+    api_key = os.getenv(env_name)
+    if not api_key:
+        raise ValueError(f"{env_name} is not set. Please set it in the Settings menu.")
+    return api_key
+
+def get_provider(provider_name, api_key):
+    """Process-wide provider client for (provider, API key), created on first use."""
+    key = (provider_name, api_key)
+    with _lock:
+        if key not in _providers:
+            _providers[key] = _create_provider(provider_name, api_key)
+        return _providers[key]
+
+def register_provider(provider_name, api_key, provider):
+    """Use `provider` for (provider, API key) from now on, e.g. a configured FakeProvider in benchmarks."""
+    with _lock:
+        _providers[(provider_name, api_key)] = provider
+
+def _create_provider(provider_name, api_key):
+    if provider_name == "fake":
+        return FakeProvider.from_env()
+    if provider_name == "gemini":
+        return GeminiProvider(api_key)
+    # httpx is only needed (and imported) once a Groq model is selected
+    import httpx
+
+    http_client = httpx.AsyncClient(limits=httpx.Limits(**HTTP_LIMITS), timeout=httpx.Timeout(**HTTP_TIMEOUT))
+    return GroqProvider(api_key, http_client=http_client)
+
+async def close_providers():
+    with _lock:
+        providers = list(_providers.values())
+        _providers.clear()
+    for provider in providers:
+        if hasattr(provider, "client"):
+            await provider.client.close()
@@ -0,0 +1,117 @@
+import os
+import asyncio
+
+# Concurrent identical requests share one upstream call ("single flight").
+# Keys are response-cache keys, so two requests coalesce exactly when a finished
+# one could have been served to the other from the cache.
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        # Cancelled because every waiter left; late arrivals must start a new call
+        self.abandoned = False
+
+class _StreamFlight:
+    """Pumps one upstream stream into a buffer that every subscriber replays from the start."""
+
+    def __init__(self, source):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.done:
+                    if self.error:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            # Nobody is listening any more; stop paying for the upstream call
+            if self.subscribers == 0 and not self.done:
+                self.abandoned = True
+                self.task.cancel()
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+
+    def in_flight(self, key):
+        return key in self._calls or key in self._streams
+
+    async def call(self, key, factory, on_shared=None):
+        """Await `factory()`, or the identical call already in flight under `key`.
+
+        The upstream call runs in its own task, so one waiter being cancelled does
+        not cancel it for the others; it is only cancelled when every waiter is gone.
+        """
+        flight = self._calls.get(key)
+        if flight is None or flight.abandoned:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+        elif on_shared:
+            on_shared()
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.abandoned = True
+                flight.task.cancel()
+
+    def stream(self, key, factory, on_shared=None):
+        """Async iterator over `factory()`'s chunks, shared with any identical stream in flight."""
+        flight = self._streams.get(key)
+        if flight is None or flight.abandoned:
+            flight = _StreamFlight(factory())
+            self._streams[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+        elif on_shared:
+            on_shared()
+        return flight.subscribe()
+
+    @staticmethod
+    def _forget(flights, key, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+
+_single_flight = None
+
+def get_single_flight():
+    """Process-wide SingleFlight, or None when THOTH_COALESCE=0."""
+    global _single_flight
+    if os.getenv("THOTH_COALESCE", "1").lower() in ("0", "false", "no"):
+        return None
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
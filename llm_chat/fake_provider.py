@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import math
+import random
+import asyncio
+from llm_chat.tokens import count_tokens
+
+# Offline stand-in for a model provider, selected by model ids starting with "fake".
+# Latency, throughput and failures are simulated so the rest of the stack can be
+# measured without spending API quota.
+
+DEFAULT_LATENCY = "lognormal:0.3:0.4"
+DEFAULT_TOKENS_PER_SECOND = 250.0
+DEFAULT_COMPLETION_TOKENS = 64
+DEFAULT_THROTTLE_RETRY_AFTER = 1.0
+
+_FILLER = (
+    "Thoth answers from a simulated model so that queueing, caching, retries and "
+    "streaming can be measured on their own without calling a real provider."
+).split()
+
+class FakeProviderError(RuntimeError):
+    """Injected transient failure; ChatHandler retries it like a 5xx."""
+
+class FakeRateLimitError(RuntimeError):
+    """Injected 429."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded (simulated), retry after {retry_after:g}s")
+        self.retry_after = retry_after
+
+class LatencyDistribution:
+    """Seconds until the first token, from a spec such as "0.2", "uniform:0.1:0.5",
+    "normal:0.3:0.05", "lognormal:0.3:0.4" (median, sigma) or "exp:0.3" (mean)."""
+
+    def __init__(self, spec):
+        self.spec = str(spec)
+        kind, _, params = self.spec.partition(":")
+        try:
+            if not params:
+                self.kind, self.params = "fixed", (float(kind),)
+            else:
+                self.kind, self.params = kind, tuple(float(p) for p in params.split(":"))
+        except ValueError:
+            raise ValueError(f"Invalid latency distribution: {self.spec!r}")
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution: {self.kind!r}")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        else:
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+class ScriptRule:
+    def __init__(self, pattern, responses):
+        self.pattern = re.compile(pattern, re.DOTALL) if pattern else None
+        self.responses = list(responses)
+        self.position = 0
+
+    def matches(self, prompt):
+        return self.pattern is None or self.pattern.search(prompt) is not None
+
+    def next_response(self):
+        # The last response repeats once the list is used up
+        response = self.responses[min(self.position, len(self.responses) - 1)]
+        self.position += 1
+        return response
+
+class FakeProvider:
+    """Simulated provider with the same interface as GroqProvider and GeminiProvider.
+
+    Scripted outputs are rules checked in order against the system prompt and
+    messages: {"match": regex, "responses": [...]} (or "response": text). Without
+    a matching rule the reply is filler text of `completion_tokens` tokens.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=DEFAULT_LATENCY, tokens_per_second=DEFAULT_TOKENS_PER_SECOND,
+                 error_rate=0.0, throttle_rate=0.0, throttle_retry_after=DEFAULT_THROTTLE_RETRY_AFTER,
+                 completion_tokens=DEFAULT_COMPLETION_TOKENS, script=None, seed=None):
+        self.latency = latency if isinstance(latency, LatencyDistribution) else LatencyDistribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.throttle_retry_after = throttle_retry_after
+        self.completion_tokens = completion_tokens
+        self.rng = random.Random(seed)
+        self.rules = []
+        self.set_script(script or [])
+        # Simulated provider time, so callers can subtract it from what they measured
+        self.calls = 0
+        self.simulated_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        script = None
+        script_path = os.getenv("THOTH_FAKE_SCRIPT")
+        if script_path:
+            with open(script_path, "r", encoding="utf-8") as f:
+                script = json.load(f)
+        seed = os.getenv("THOTH_FAKE_SEED")
+        return cls(
+            latency=os.getenv("THOTH_FAKE_LATENCY", DEFAULT_LATENCY),
+            tokens_per_second=float(os.getenv("THOTH_FAKE_TOKENS_PER_SECOND", DEFAULT_TOKENS_PER_SECOND)),
+            error_rate=float(os.getenv("THOTH_FAKE_ERROR_RATE", "0")),
+            throttle_rate=float(os.getenv("THOTH_FAKE_THROTTLE_RATE", "0")),
+            completion_tokens=int(os.getenv("THOTH_FAKE_COMPLETION_TOKENS", DEFAULT_COMPLETION_TOKENS)),
+            script=script,
+            seed=int(seed) if seed else None,
+        )
+
+    def set_script(self, script):
+        self.rules = [
+            ScriptRule(rule.get("match"), rule["responses"] if "responses" in rule else [rule["response"]])
+            for rule in script
+        ]
+
+    def reply_for(self, messages, system_prompt=None):
+        prompt = "\n\n".join([system_prompt or ""] + [m["content"] for m in messages])
+        for rule in self.rules:
+            if rule.matches(prompt):
+                return rule.next_response()
+        words, tokens = [], 0
+        while tokens < self.completion_tokens:
+            word = _FILLER[len(words) % len(_FILLER)]
+            words.append(word)
+            tokens += count_tokens(" " + word)
+        return " ".join(words)
+
+    def _inject_failure(self):
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            raise FakeRateLimitError(self.throttle_retry_after)
+        if roll < self.throttle_rate + self.error_rate:
+            raise FakeProviderError("Injected provider failure")
+
+    def _usage(self, messages, system_prompt, text):
+        prompt_tokens = count_tokens(system_prompt) + sum(count_tokens(m["content"]) for m in messages)
+        completion_tokens = count_tokens(text)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    async def _sleep(self, seconds):
+        self.simulated_seconds += seconds
+        await asyncio.sleep(seconds)
+
+    async def complete(self, model_id, messages, system_prompt=None, max_tokens=1024, on_headers=None, **config):
+        self.calls += 1
+        await self._sleep(self.latency.sample(self.rng))
+        self._inject_failure()
+        text = self.reply_for(messages, system_prompt)
+        usage = self._usage(messages, system_prompt, text)
+        if self.tokens_per_second:
+            await self._sleep(usage["completion_tokens"] / self.tokens_per_second)
+        return text, usage
+
+    async def stream(self, model_id, messages, system_prompt=None, max_tokens=1024, on_headers=None, **config):
+        self.calls += 1
+        await self._sleep(self.latency.sample(self.rng))
+        self._inject_failure()
+        text = self.reply_for(messages, system_prompt)
+        # Word-sized deltas, paced at tokens_per_second
+        for delta in re.findall(r"\S+\s*|\s+", text):
+            if self.tokens_per_second:
+                await self._sleep(count_tokens(delta) / self.tokens_per_second)
+            yield delta, None
+        yield None, self._usage(messages, system_prompt, text)
+
+    def throttle_delay(self, error):
+        """Seconds to wait if `error` is a rate-limit response, else None."""
+        if isinstance(error, FakeRateLimitError):
+            return error.retry_after
+        return None
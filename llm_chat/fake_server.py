@@ -0,0 +1,82 @@
+import json
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from llm_chat.fake_provider import FakeProvider, FakeRateLimitError
+
+# Groq-compatible HTTP stand-in for FakeProvider. Point the real Groq client at it with
+#   uvicorn llm_chat.fake_server:app --port 8001
+#   GROQ_BASE_URL=http://127.0.0.1:8001
+# to include the SDK, HTTP and SSE parsing in measurements.
+
+def create_fake_server(provider=None):
+    provider = provider or FakeProvider.from_env()
+    app = FastAPI()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model_id = body.get("model", "fake")
+        messages = body.get("messages", [])
+        system_prompt = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+        messages = [m for m in messages if m["role"] != "system"]
+        max_tokens = body.get("max_tokens") or 1024
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            chunks = provider.stream(model_id, messages, system_prompt, max_tokens)
+            try:
+                # Pull the first chunk up front so injected failures become HTTP errors, not broken streams
+                first = await chunks.__anext__()
+            except FakeRateLimitError as e:
+                return _error(429, str(e), {"retry-after": f"{e.retry_after:g}"})
+            except Exception as e:
+                return _error(500, str(e))
+            return StreamingResponse(
+                _sse(first, chunks, completion_id, created, model_id),
+                media_type="text/event-stream",
+            )
+
+        try:
+            text, usage = await provider.complete(model_id, messages, system_prompt, max_tokens)
+        except FakeRateLimitError as e:
+            return _error(429, str(e), {"retry-after": f"{e.retry_after:g}"})
+        except Exception as e:
+            return _error(500, str(e))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model_id,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop", "logprobs": None}],
+            "usage": usage,
+            "system_fingerprint": None,
+        }
+
+    return app
+
+async def _sse(first, chunks, completion_id, created, model_id):
+    def event(delta, usage):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model_id,
+            "choices": [{"index": 0, "delta": {"content": delta} if delta else {}, "finish_reason": None if delta else "stop", "logprobs": None}],
+            "system_fingerprint": None,
+        }
+        if usage:
+            chunk["x_groq"] = {"id": completion_id, "usage": usage}
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    yield event(*first)
+    async for delta, usage in chunks:
+        yield event(delta, usage)
+    yield "data: [DONE]\n\n"
+
+def _error(status, message, headers=None):
+    return JSONResponse({"error": {"message": message, "type": "fake_provider_error"}}, status_code=status, headers=headers)
+
+app = create_fake_server()
@@ -0,0 +1,139 @@
+import os
+import time
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Per-provider circuit breakers plus per-model latency windows, shared process-wide,
+# and the per-task resilience policy (backup model, hedging, retry budget) that
+# AgentManager puts in place for the requests a task makes.
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_ERROR_RATE = 0.5
+DEFAULT_WINDOW = 20
+DEFAULT_RESET_TIMEOUT = 30.0
+# Latency samples kept per model, and how many are needed before p95 is trusted
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit is open; the call was not attempted."""
+
+class ProviderHealth:
+    """Circuit breaker for one provider.
+
+    Opens after `failure_threshold` consecutive failures, or once at least half of
+    the window has been seen and `error_rate` of the last `window` calls failed.
+    After `reset_timeout` one probe call is let through (half-open): success closes
+    the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, error_rate=DEFAULT_ERROR_RATE,
+                 window=DEFAULT_WINDOW, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.reset_timeout = reset_timeout
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.latencies = {}
+        self.first_token_latencies = {}
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def is_open(self):
+        """True while calls would be refused; does not use up the half-open probe."""
+        state = self.state
+        return state == "open" or (state == "half_open" and not self._probe_due())
+
+    def _probe_due(self):
+        # A probe that never reported back (e.g. it was cancelled) does not block the next one forever
+        return self.probe_started is None or time.monotonic() - self.probe_started >= self.reset_timeout
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and self._probe_due():
+            self.probe_started = time.monotonic()
+            return
+        raise CircuitOpenError(f"{self.name} circuit is open after repeated failures")
+
+    def record_success(self, model_id=None, seconds=None):
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.opened_at = self.probe_started = None
+        if model_id is not None and seconds is not None:
+            self.latencies.setdefault(model_id, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def record_first_token(self, model_id, seconds):
+        self.first_token_latencies.setdefault(model_id, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        failures = self.outcomes.count(False)
+        if (self.opened_at is not None
+                or self.consecutive_failures >= self.failure_threshold
+                or (len(self.outcomes) * 2 >= self.outcomes.maxlen and failures >= self.error_rate * len(self.outcomes))):
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+    def p95(self, model_id, first_token=False):
+        """95th percentile of recent successful call latencies (or times to first token), or None with too few samples."""
+        samples = (self.first_token_latencies if first_token else self.latencies).get(model_id)
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+_provider_health = {}
+
+def get_provider_health(provider_name):
+    health = _provider_health.get(provider_name)
+    if health is None:
+        health = _provider_health[provider_name] = ProviderHealth(
+            provider_name,
+            failure_threshold=int(os.getenv("THOTH_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)),
+            error_rate=float(os.getenv("THOTH_BREAKER_ERROR_RATE", DEFAULT_ERROR_RATE)),
+            reset_timeout=float(os.getenv("THOTH_BREAKER_RESET_SECONDS", DEFAULT_RESET_TIMEOUT)),
+        )
+    return health
+
+class ResiliencePolicy:
+    """How the requests of one task type survive a slow or failing provider.
+
+    backup_model: model to fail over to when the primary's circuit is open or its call fails.
+    hedge: also send the request to the backup once the primary has taken longer than
+        `hedge_after` seconds (default: the primary's observed p95), and take the first answer.
+        Streams are raced until the first text arrives, against the p95 time to first token.
+    max_retries: attempts on the primary before giving up or failing over.
+    """
+
+    def __init__(self, backup_model=None, hedge=False, hedge_after=None, max_retries=None):
+        self.backup_model = backup_model
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.max_retries = max_retries
+
+_current_policy = contextvars.ContextVar("thoth_resilience_policy", default=None)
+
+def current_policy():
+    return _current_policy.get()
+
+@contextmanager
+def use_policy(policy):
+    token = _current_policy.set(policy)
+    try:
+        yield policy
+    finally:
+        _current_policy.reset(token)
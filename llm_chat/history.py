@@ -0,0 +1,181 @@
+from array import array
+from llm_chat.tokens import count_tokens, count_message_tokens
+from llm_chat.retrieval import BM25Index
+
+# Tokens of history (summary + recent turns) sent with each request
+MODEL_TOKEN_BUDGETS = {
+    "llama-3.1-70b-versatile": 6000,
+    "llama-3.1-8b-instant": 4000,
+    "gemini2-9b-it": 4000,
+    "gemini-1.5-pro-latest": 12000,
+    "gemini-1.5-flash-latest": 12000,
+}
+DEFAULT_TOKEN_BUDGET = 4000
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+RECALL_PREFIX = "Earlier messages that may be relevant:\n"
+# Most recalled messages per prompt, and the BM25 score below which a match is noise
+RECALL_LIMIT = 4
+RECALL_MIN_SCORE = 1.0
+
+class ConversationHistory:
+    """Full turn log plus a prompt view bounded by a token budget.
+
+    Recent turns are sent verbatim. When they outgrow the budget the oldest ones
+    are folded into a rolling summary via `summarize(previous_summary, messages)`,
+    which is only called again once the verbatim window overflows a second time.
+    Folded turns that match the new message are recalled verbatim, within
+    `recall_share` of the budget, from a BM25 index over the whole conversation.
+
+    With a `store`, every turn is written through under `session_id`, an existing
+    session is resumed from it, and folded turns are dropped from memory so only
+    the verbatim window stays resident.
+    """
+
+    def __init__(self, model_id, token_budget=None, summarize=None, min_recent_messages=4, summary_share=0.25, recall_share=0.15, store=None, session_id=None):
+        self.model_id = model_id
+        self.token_budget = token_budget or MODEL_TOKEN_BUDGETS.get(model_id, DEFAULT_TOKEN_BUDGET)
+        self.summarize = summarize
+        self.min_recent_messages = min_recent_messages
+        self.summary_budget = int(self.token_budget * summary_share)
+        self.recall_budget = int(self.token_budget * recall_share)
+        self.store = store
+        self.session_id = session_id
+        self._clear()
+        if store and session_id:
+            self._load()
+
+    def _clear(self):
+        # (role, content) tuples and an int array: a fraction of the size of message dicts
+        self._turns = []
+        self._token_counts = array("I")
+        # Index of _turns[0] in the whole conversation; earlier turns are only in the store
+        self.offset = 0
+        self.summary = None
+        self.summary_tokens = 0
+        # Messages before this index are covered by the summary
+        self.window_start = 0
+        # Built on the first recall, then kept up to date on every append
+        self._index = None
+
+    def _load(self):
+        state = self.store.load(self.session_id)
+        if state is None:
+            return
+        self.summary = state["summary"]
+        self.summary_tokens = state["summary_tokens"]
+        self.window_start = self.offset = state["window_start"]
+        for role, content, tokens in state["messages"]:
+            self._turns.append((role, content))
+            self._token_counts.append(tokens)
+
+    def reset(self):
+        self._clear()
+        if self.store:
+            self.store.reset(self.session_id)
+
+    @property
+    def messages(self):
+        """Every message of the conversation as role/content dicts."""
+        turns = self.store.messages(self.session_id) if self.store and self.offset else self._turns
+        return [{"role": role, "content": content} for role, content in turns]
+
+    def __len__(self):
+        return self.offset + len(self._turns)
+
+    def append(self, role, content):
+        tokens = count_message_tokens({"role": role, "content": content})
+        if self.store:
+            self.store.append(self.session_id, self.model_id, len(self), role, content, tokens)
+        if self._index is not None:
+            self._index.add(len(self), content)
+        self._turns.append((role, content))
+        self._token_counts.append(tokens)
+
+    def window_tokens(self):
+        return self.summary_tokens + sum(self._token_counts[self.window_start - self.offset:])
+
+    async def prompt_messages(self, message):
+        """History to send ahead of `message`, compacted to fit the budget, followed by `message`."""
+        pending = count_tokens(message)
+        if self.window_tokens() + pending > self.token_budget:
+            await self._compact(pending)
+
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + self.summary})
+        room = min(self.recall_budget, self.token_budget - self.window_tokens() - pending)
+        recalled = self.recall(message, room) if self.window_start and room > 0 else []
+        if recalled:
+            excerpt = "\n\n".join(f"{role}: {content}" for role, content in recalled)
+            messages.append({"role": "system", "content": RECALL_PREFIX + excerpt})
+        messages.extend({"role": role, "content": content} for role, content in self._turns[self.window_start - self.offset:])
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def recall(self, query, token_budget):
+        """Folded-away (role, content) turns most similar to `query`, in conversation order."""
+        index = self._ensure_index()
+        hits = index.search(query, RECALL_LIMIT, accept=lambda seq: seq < self.window_start, min_score=RECALL_MIN_SCORE)
+        if not hits:
+            return []
+        seqs = [seq for _, seq in hits]
+        if self.store and min(seqs) < self.offset:
+            turns = self.store.messages_at(self.session_id, seqs)
+        else:
+            turns = {seq: self._turns[seq - self.offset] for seq in seqs}
+
+        chosen, used = [], 0
+        for seq in seqs:
+            role, content = turns[seq]
+            tokens = count_tokens(content) + 4
+            if used + tokens <= token_budget:
+                chosen.append(seq)
+                used += tokens
+        return [turns[seq] for seq in sorted(chosen)]
+
+    def _ensure_index(self):
+        if self._index is None:
+            self._index = BM25Index()
+            if self.store and self.offset:
+                for seq, (_, content) in enumerate(self.store.messages(self.session_id, 0, self.offset)):
+                    self._index.add(seq, content)
+            for seq, (_, content) in enumerate(self._turns, self.offset):
+                self._index.add(seq, content)
+        return self._index
+
+    async def _compact(self, pending_tokens):
+        # Shrink the verbatim window to half of what is left after the summary so
+        # the next few turns fit without another summarisation call.
+        # Indices below are into _turns, i.e. relative to self.offset.
+        target = (self.token_budget - self.summary_budget - pending_tokens) // 2
+        start = self.window_start - self.offset
+        boundary = start
+        kept = 0
+        for index in range(len(self._turns) - 1, start - 1, -1):
+            kept += self._token_counts[index]
+            if kept > target:
+                boundary = index + 1
+                break
+        split = min(boundary, len(self._turns) - self.min_recent_messages)
+        # Cut on a user turn so the window never opens with an orphan reply
+        while split < len(self._turns) and self._turns[split][0] != "user":
+            split += 1
+        if split <= start:
+            return
+
+        folded = [{"role": role, "content": content} for role, content in self._turns[start:split]]
+        if self.summarize:
+            summary = await self.summarize(self.summary, folded)
+            if summary:
+                self.summary = summary
+                self.summary_tokens = count_tokens(summary)
+        # Without a summary the folded turns are simply dropped (sliding window)
+        self.window_start = self.offset + split
+
+        if self.store:
+            self.store.save_summary(self.session_id, self.summary, self.summary_tokens, self.window_start)
+            # Folded turns are safe on disk and never sent again
+            del self._turns[:split]
+            del self._token_counts[:split]
+            self.offset += split
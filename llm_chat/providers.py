@@ -0,0 +1,183 @@
+import inspect
+from llm_chat.rate_limiter import parse_duration
+from llm_chat.tokens import count_tokens
+
+class ResponseBlocked(ValueError):
+    """The provider refused to answer; retrying the same request will not help."""
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, api_key, http_client=None):
+        # SDKs take most of the startup time, so each is imported when its provider is first used
+        from groq import AsyncGroq
+
+        # Retries and backoff are handled by ChatHandler and the rate limiter
+        self.client = AsyncGroq(api_key=api_key, max_retries=0, http_client=http_client)
+
+    async def _create(self, on_headers, **kwargs):
+        raw = await self.client.chat.completions.with_raw_response.create(**kwargs)
+        if on_headers:
+            on_headers(raw.headers)
+        parsed = raw.parse()
+        if inspect.isawaitable(parsed):
+            parsed = await parsed
+        return parsed
+
+    async def complete(self, model_id, messages, system_prompt=None, max_tokens=1024, on_headers=None, **config):
+        if system_prompt:
+            messages = [{"role": "system", "content": system_prompt}] + list(messages)
+
+        chat_completion = await self._create(
+            on_headers,
+            messages=messages,
+            model=model_id,
+            max_tokens=max_tokens,
+            **config
+        )
+        assistant_message = chat_completion.choices[0].message.content
+        usage = {
+            "prompt_tokens": chat_completion.usage.prompt_tokens,
+            "completion_tokens": chat_completion.usage.completion_tokens,
+            "total_tokens": chat_completion.usage.total_tokens
+        }
+        return assistant_message, usage
+
+    async def stream(self, model_id, messages, system_prompt=None, max_tokens=1024, on_headers=None, **config):
+        if system_prompt:
+            messages = [{"role": "system", "content": system_prompt}] + list(messages)
+
+        response = await self._create(
+            on_headers,
+            messages=messages,
+            model=model_id,
+            max_tokens=max_tokens,
+            stream=True,
+            **config
+        )
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            usage = None
+            # Groq reports usage on the final chunk only
+            if chunk.x_groq and chunk.x_groq.usage:
+                usage = {
+                    "prompt_tokens": chunk.x_groq.usage.prompt_tokens,
+                    "completion_tokens": chunk.x_groq.usage.completion_tokens,
+                    "total_tokens": chunk.x_groq.usage.total_tokens
+                }
+            yield delta, usage
+
+    def throttle_delay(self, error):
+        """Seconds to wait if `error` is a rate-limit response (0.0 when unspecified), else None."""
+        from groq import RateLimitError
+
+        if not isinstance(error, RateLimitError):
+            return None
+        headers = error.response.headers
+        retry_after = parse_duration(headers.get("retry-after-ms"))
+        if retry_after is not None:
+            return retry_after / 1000
+        return parse_duration(headers.get("retry-after")) or 0.0
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, api_key):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.models = {}
+
+    def get_model(self, model_id):
+        if model_id not in self.models:
+            self.models[model_id] = self.genai.GenerativeModel(model_id)
+        return self.models[model_id]
+
+    async def complete(self, model_id, messages, system_prompt=None, max_tokens=None, safety_settings=None, on_headers=None, **config):
+        contents = to_gemini_contents(messages, system_prompt)
+        generation_config = dict(config)
+        if max_tokens:
+            generation_config["max_output_tokens"] = max_tokens
+
+        response = await self.get_model(model_id).generate_content_async(
+            contents,
+            safety_settings=safety_settings,
+            generation_config=generation_config or None,
+        )
+        if not response.parts:
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                raise ResponseBlocked(f"Response blocked: {response.prompt_feedback.block_reason}")
+            raise ValueError("Empty response from Gemini API")
+        assistant_message = response.text
+        return assistant_message, gemini_usage(response, contents, assistant_message)
+
+    async def stream(self, model_id, messages, system_prompt=None, max_tokens=None, safety_settings=None, on_headers=None, **config):
+        contents = to_gemini_contents(messages, system_prompt)
+        generation_config = dict(config)
+        if max_tokens:
+            generation_config["max_output_tokens"] = max_tokens
+
+        response = await self.get_model(model_id).generate_content_async(
+            contents,
+            safety_settings=safety_settings,
+            generation_config=generation_config or None,
+            stream=True,
+        )
+        parts = []
+        last_chunk = None
+        async for chunk in response:
+            last_chunk = chunk
+            if not chunk.parts:
+                continue
+            parts.append(chunk.text)
+            yield chunk.text, None
+
+        # The final chunk's usage_metadata covers the whole response
+        yield None, gemini_usage(last_chunk, contents, "".join(parts))
+
+    def throttle_delay(self, error):
+        """Seconds to wait if `error` is a rate-limit response (0.0 when unspecified), else None."""
+        from google.api_core import exceptions as google_exceptions
+
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return 0.0
+        return None
+
+def gemini_usage(response, contents, completion_text):
+    """Token usage reported by Gemini, or counted locally over the whole prompt when the response has none.
+
+    Local counts use the tiktoken encoding, not Gemini's tokenizer, so they are marked `estimated`.
+    """
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata and metadata.total_token_count:
+        return {
+            "prompt_tokens": metadata.prompt_token_count,
+            "completion_tokens": metadata.candidates_token_count,
+            "total_tokens": metadata.total_token_count
+        }
+    prompt_tokens = sum(count_tokens(part) for content in contents for part in content["parts"])
+    completion_tokens = count_tokens(completion_text)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "estimated": True
+    }
+
+def to_gemini_contents(messages, system_prompt=None):
+    contents = [
+        {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+        for m in messages
+        if m["role"] != "system"
+    ]
+    # Gemini has no system role, so system text rides on the latest user turn
+    system_parts = [m["content"] for m in messages if m["role"] == "system"]
+    if system_prompt:
+        system_parts.insert(0, system_prompt)
+    system_prompt = "\n\n".join(system_parts)
+    if system_prompt and contents:
+        last = contents[-1]
+        last["parts"] = [f"{system_prompt}\n\n{last['parts'][0]}"]
+    return contents
+
@@ -0,0 +1,250 @@
+import os
+import re
+import time
+import asyncio
+
+# (requests per minute, tokens per minute); defaults follow the free tiers. Paid tiers can raise them
+# with THOTH_RATE_LIMITS, and Groq's token limit is learned from its response headers.
+MODEL_RATE_LIMITS = {
+    ("groq", "llama-3.1-70b-versatile"): (30, 6000),
+    ("groq", "llama-3.1-8b-instant"): (30, 20000),
+    ("gemini", "gemini-1.5-pro-latest"): (2, 32000),
+    ("gemini", "gemini-1.5-flash-latest"): (15, 1000000),
+}
+# The fake provider is effectively unlimited so benchmarks measure the limiter's overhead, not its waits
+DEFAULT_RATE_LIMITS = {"groq": (30, 6000), "gemini": (15, 32000), "fake": (1000000, 1000000000)}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value):
+    """Parse header durations such as "7.66s", "2m59.56s", "120ms" or a bare "3" into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount):
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        # A request bigger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill(time.monotonic())
+        # May go negative when actual usage exceeds the estimate; later callers wait it off
+        self.tokens -= amount
+
+    def set_limit(self, per_minute):
+        self._refill(time.monotonic())
+        # Capacity the provider grants beyond what was assumed is available at once
+        self.tokens += per_minute - self.capacity
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+
+    def limit_to(self, remaining):
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight requests: +1 per window of successes, halved on throttling."""
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease_factor=0.5, decrease_interval=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        # Concurrent 429s from one burst count as a single congestion signal
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self):
+        # Limiters are process-wide; rebind if a new event loop is in use
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self):
+        # Only grow while the current limit is actually being used
+        if self.in_flight >= int(self.limit):
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_interval:
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            self._last_decrease = now
+
+class RateLimitPermit:
+    def __init__(self, limiter, estimated_tokens):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.throttled = False
+
+    def observe_headers(self, headers):
+        self.limiter.update_from_headers(headers)
+
+    def record_usage(self, usage):
+        if usage and usage.get("total_tokens") is not None:
+            self.limiter.tokens.consume(usage["total_tokens"] - self.estimated_tokens)
+
+    def throttle(self, retry_after=None):
+        self.throttled = True
+        self.limiter.on_throttle(retry_after)
+
+class RateLimiter:
+    """Requests/minute and tokens/minute buckets plus adaptive concurrency for one provider model."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, concurrency=None, learn_limits=True):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        # Limits set explicitly in THOTH_RATE_LIMITS win over the ones a provider reports
+        self.learn_limits = learn_limits
+
+    def request(self, estimated_tokens):
+        return _PermitContext(self, estimated_tokens)
+
+    async def _acquire(self, estimated_tokens):
+        await self.concurrency.acquire()
+        try:
+            while True:
+                delay = max(self.requests.delay_for(1), self.tokens.delay_for(estimated_tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+        except BaseException:
+            await self.concurrency.release()
+            raise
+        return RateLimitPermit(self, estimated_tokens)
+
+    def on_throttle(self, retry_after=None):
+        self.concurrency.on_throttle()
+        # Without Retry-After, back off for the time one request's share of the quota takes
+        pause = retry_after if retry_after is not None else 1.0 / self.requests.rate
+        self.requests.pause(pause)
+        self.tokens.pause(pause)
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        # x-ratelimit-limit-tokens is per minute. Groq's x-ratelimit-limit-requests is per day, so the
+        # request bucket only learns from the remaining count when that runs out.
+        limit_tokens = _header_number(headers, "x-ratelimit-limit-tokens")
+        if self.learn_limits and limit_tokens and limit_tokens != self.tokens.capacity:
+            self.tokens.set_limit(limit_tokens)
+        remaining_tokens = _header_number(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.tokens.limit_to(remaining_tokens)
+            reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            if remaining_tokens <= 0 and reset:
+                self.tokens.pause(reset)
+        remaining_requests = _header_number(headers, "x-ratelimit-remaining-requests")
+        if remaining_requests is not None and remaining_requests <= 0:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.requests.pause(reset)
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.requests.pause(retry_after)
+
+def _header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class _PermitContext:
+    def __init__(self, limiter, estimated_tokens):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.permit = None
+
+    async def __aenter__(self):
+        self.permit = await self.limiter._acquire(self.estimated_tokens)
+        return self.permit
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.permit.throttled:
+            self.limiter.concurrency.on_success()
+        await self.limiter.concurrency.release()
+        return False
+
+def configured_rate_limits():
+    """Parse THOTH_RATE_LIMITS, e.g. "llama-3.1-70b-versatile=1000:300000,gemini=360:" into {name: (rpm, tpm)}."""
+    limits = {}
+    for entry in os.getenv("THOTH_RATE_LIMITS", "").split(","):
+        if not entry.strip():
+            continue
+        name, separator, values = entry.partition("=")
+        requests_per_minute, _, tokens_per_minute = values.partition(":")
+        try:
+            # An empty part keeps the default for that limit
+            limit = tuple(float(value) if value.strip() else None for value in (requests_per_minute, tokens_per_minute))
+        except ValueError:
+            limit = None
+        if not separator or not name.strip() or limit is None or any(value is not None and value <= 0 for value in limit):
+            raise ValueError(f"THOTH_RATE_LIMITS entries look like model=requests:tokens per minute, got {entry.strip()!r}")
+        limits[name.strip()] = limit
+    return limits
+
+_limiters = {}
+
+def get_rate_limiter(provider_name, model_id):
+    key = (provider_name, model_id)
+    if key not in _limiters:
+        requests_per_minute, tokens_per_minute = MODEL_RATE_LIMITS.get(key, DEFAULT_RATE_LIMITS.get(provider_name, (30, 6000)))
+        overrides = configured_rate_limits()
+        override = overrides.get(model_id, overrides.get(provider_name))
+        if override:
+            requests_per_minute = override[0] or requests_per_minute
+            tokens_per_minute = override[1] or tokens_per_minute
+        _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute, learn_limits=not (override and override[1]))
+    return _limiters[key]
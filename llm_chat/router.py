@@ -0,0 +1,177 @@
+import os
+import time
+import random
+from llm_chat.tokens import count_tokens
+from utils.metrics import metrics
+from utils.tracing import add_event
+
+# Cheap requests try a fast model first and escalate to the selected (primary)
+# model when the answer fails a check. Whether trying the fast model pays off is
+# decided per request kind from the latency and success rates seen so far.
+
+FAST_MODEL = "llama-3.1-8b-instant"
+# Model id offered by select_model for routed sessions, and the primary model it routes to
+AUTO_MODEL = "auto"
+AUTO_PRIMARY_MODEL = "llama-3.1-70b-versatile"
+# Chat messages up to this many tokens count as cheap
+CHEAP_CHAT_TOKENS = 200
+# Weight of the newest sample in the latency averages
+LATENCY_SMOOTHING = 0.2
+# Share of requests sent to the fast model even when the statistics advise against it,
+# so a model that has recovered (or a changed workload) is noticed
+EXPLORE_RATE = 0.05
+UNSURE_PHRASES = (
+    "i'm not sure", "i am not sure", "i don't know", "i do not know",
+    "i can't help", "i cannot help", "i'm unable to", "i am unable to",
+)
+
+class RouteStats:
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.latency = None
+
+    @property
+    def success_rate(self):
+        # Laplace prior: an untried model starts at 1/2 and is quickly corrected
+        return (self.successes + 1) / (self.attempts + 2)
+
+    def record(self, success, seconds):
+        self.attempts += 1
+        self.successes += bool(success)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def retract(self):
+        if self.successes:
+            self.successes -= 1
+
+def is_confident(text):
+    """Heuristic check of a fast-model chat answer; False escalates it."""
+    if not text or not text.strip():
+        return False
+    head = text.strip()[:200].lower()
+    return not any(phrase in head for phrase in UNSURE_PHRASES)
+
+class ModelRouter:
+    def __init__(self, fast_model=None, explore_rate=EXPLORE_RATE, seed=None):
+        self.fast_model = fast_model or os.getenv("THOTH_FAST_MODEL", FAST_MODEL)
+        self.explore_rate = explore_rate
+        self.rng = random.Random(seed)
+        self.stats = {}
+        self._fast = None
+
+    def fast_handler(self, primary):
+        if self._fast is None:
+            # Shares the response cache; the conversation stays on the primary handler
+            self._fast = type(primary)(self.fast_model, cache=primary.cache or False, session_store=False)
+        return self._fast
+
+    def route_stats(self, model_id, kind):
+        key = (model_id, kind)
+        if key not in self.stats:
+            self.stats[key] = RouteStats()
+        return self.stats[key]
+
+    def choose(self, kind, primary_model, cheap=True):
+        if not cheap or primary_model == self.fast_model:
+            return primary_model
+        fast = self.route_stats(self.fast_model, kind)
+        primary = self.route_stats(primary_model, kind)
+        if fast.latency is None or primary.latency is None:
+            return self.fast_model
+        # Fast first wins when its latency plus the escalations it causes beat going
+        # straight to the primary: L_fast + (1 - p) * L_primary < L_primary
+        if fast.latency < fast.success_rate * primary.latency:
+            return self.fast_model
+        return self.fast_model if self.rng.random() < self.explore_rate else primary_model
+
+    def record(self, model_id, kind, success, seconds):
+        self.route_stats(model_id, kind).record(success, seconds)
+        metrics.inc("thoth_routed_requests_total", model=model_id, kind=kind, outcome="ok" if success else "failed")
+
+    def retract(self, model_id, kind):
+        """An answer recorded as a success turned out not to work (e.g. the fixed code still fails to run)."""
+        self.route_stats(model_id, kind).retract()
+        metrics.inc("thoth_routed_requests_total", model=model_id, kind=kind, outcome="retracted")
+
+    def _escalate(self, kind, model_id, to):
+        metrics.inc("thoth_escalations_total", model=model_id, kind=kind)
+        add_event("escalate", kind=kind, model=model_id, to=to)
+
+    async def complete(self, kind, handler, messages, system_prompt=None, cheap=True, check=None, primary=None, **kwargs):
+        """`handler.complete(...)`, tried on the fast model first when that is expected to pay off.
+
+        `check(text)` decides whether a fast answer is good enough; without it any
+        answer is accepted. `primary()` replaces the call to `handler` when escalating.
+        """
+        text, usage, _ = await self.complete_routed(kind, handler, messages, system_prompt, cheap, check, primary, **kwargs)
+        return text, usage
+
+    async def complete_routed(self, kind, handler, messages, system_prompt=None, cheap=True, check=None, primary=None, **kwargs):
+        """Like `complete`, plus the id of the model whose answer was returned."""
+        model_id = self.choose(kind, handler.model_id, cheap)
+        if model_id != handler.model_id:
+            started = time.monotonic()
+            text, usage = await self.fast_handler(handler).complete(messages, system_prompt, **kwargs)
+            success = text is not None and (check is None or check(text))
+            self.record(model_id, kind, success, time.monotonic() - started)
+            if success:
+                return text, usage, model_id
+            self._escalate(kind, model_id, handler.model_id)
+
+        started = time.monotonic()
+        if primary:
+            text, usage = await primary()
+        else:
+            text, usage = await handler.complete(messages, system_prompt, **kwargs)
+        self.record(handler.model_id, kind, text is not None, time.monotonic() - started)
+        return text, usage, handler.model_id
+
+    async def stream(self, kind, handler, messages, system_prompt=None, cheap=True, **kwargs):
+        """Streaming counterpart of `complete`.
+
+        Text already shown cannot be taken back, so a fast stream only escalates when
+        it fails before its first token; a doubtful answer just counts against the
+        fast model in later decisions.
+        """
+        model_id = self.choose(kind, handler.model_id, cheap)
+        if model_id != handler.model_id:
+            started = time.monotonic()
+            parts = []
+            try:
+                async for delta, usage in self.fast_handler(handler)._stream_cached(messages, system_prompt, **kwargs):
+                    if delta:
+                        parts.append(delta)
+                    yield delta, usage
+            except Exception:
+                self.record(model_id, kind, False, time.monotonic() - started)
+                if parts:
+                    raise
+                self._escalate(kind, model_id, handler.model_id)
+            else:
+                self.record(model_id, kind, is_confident("".join(parts)), time.monotonic() - started)
+                return
+
+        started = time.monotonic()
+        success = False
+        try:
+            async for chunk in handler._stream_cached(messages, system_prompt, **kwargs):
+                yield chunk
+            success = True
+        finally:
+            self.record(handler.model_id, kind, success, time.monotonic() - started)
+
+def is_cheap_chat(message):
+    return count_tokens(message) <= CHEAP_CHAT_TOKENS
+
+def create_chat_handler(model_id):
+    """ChatHandler for a model id from select_model; AUTO_MODEL routes between the fast and primary model."""
+    from llm_chat.chat_handler import ChatHandler
+    if model_id != AUTO_MODEL:
+        return ChatHandler(model_id)
+    chat_handler = ChatHandler(os.getenv("THOTH_PRIMARY_MODEL", AUTO_PRIMARY_MODEL))
+    chat_handler.router = ModelRouter()
+    return chat_handler
@@ -0,0 +1,232 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_SESSION_PATH = os.path.join(".thoth", "sessions.sqlite")
+# Live sessions nobody has used for this long are dropped from memory
+DEFAULT_IDLE_SECONDS = 600
+DEFAULT_MAX_LIVE_SESSIONS = 1000
+# Signs session tokens; kept next to the session store so tokens survive a restart
+SESSION_SECRET_FILE = "session_secret"
+
+class SessionStore:
+    """SQLite log of conversations, written through on every turn.
+
+    Each session keeps its rolling summary and the index of the first message
+    still sent verbatim, so resuming only has to read the recent window.
+    """
+
+    def __init__(self, path=DEFAULT_SESSION_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A crash may lose the last turn or two, never corrupt the file
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                summary TEXT,
+                summary_tokens INTEGER NOT NULL DEFAULT 0,
+                window_start INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def exists(self, session_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
+
+    def append(self, session_id, model_id, seq, role, content, tokens):
+        now = time.time()
+        with self._lock:
+            # Sessions are created on their first message, so handlers that never chat leave no rows
+            self._conn.execute(
+                "INSERT INTO sessions (id, model_id, created, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated",
+                (session_id, model_id, now, now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO messages (session_id, seq, role, content, tokens) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, tokens),
+            )
+
+    def save_summary(self, session_id, summary, summary_tokens, window_start):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summary_tokens = ?, window_start = ?, updated = ? WHERE id = ?",
+                (summary, summary_tokens, window_start, time.time(), session_id),
+            )
+
+    def load(self, session_id):
+        """Summary, window start and the messages from the window start on, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model_id, summary, summary_tokens, window_start FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            model_id, summary, summary_tokens, window_start = row
+            messages = self._conn.execute(
+                "SELECT role, content, tokens FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq",
+                (session_id, window_start),
+            ).fetchall()
+        return {
+            "model_id": model_id,
+            "summary": summary,
+            "summary_tokens": summary_tokens,
+            "window_start": window_start,
+            "messages": messages,
+        }
+
+    def messages(self, session_id, start=0, end=None):
+        """The transcript from `start` up to `end`, for callers that need more than the window."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, end if end is not None else 2 ** 62),
+            ).fetchall()
+
+    def messages_at(self, session_id, seqs):
+        """{seq: (role, content)} for the given message indices."""
+        seqs = list(seqs)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT seq, role, content FROM messages WHERE session_id = ? AND seq IN ({', '.join('?' * len(seqs))})",
+                (session_id, *seqs),
+            ).fetchall()
+        return {seq: (role, content) for seq, role, content in rows}
+
+    def reset(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute(
+                "UPDATE sessions SET summary = NULL, summary_tokens = 0, window_start = 0, updated = ? WHERE id = ?",
+                (time.time(), session_id),
+            )
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self):
+        with self._lock:
+            (sessions,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            (messages,) = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+        return {"sessions": sessions, "messages": messages}
+
+class SessionPool:
+    """Live sessions by id, loaded lazily and dropped from memory when idle.
+
+    The store is written through on every turn, so evicting a session loses
+    nothing; the next `acquire` rebuilds it from disk.
+    """
+
+    def __init__(self, chat_handler, idle_seconds=DEFAULT_IDLE_SECONDS, max_live=DEFAULT_MAX_LIVE_SESSIONS):
+        self.chat_handler = chat_handler
+        self.idle_seconds = idle_seconds
+        self.max_live = max_live
+        # session_id -> [handler, users, last_used]; least recently used first
+        self._live = OrderedDict()
+
+    @classmethod
+    def from_env(cls, chat_handler):
+        return cls(
+            chat_handler,
+            idle_seconds=float(os.getenv("THOTH_SESSION_IDLE_SECONDS", DEFAULT_IDLE_SECONDS)),
+            max_live=int(os.getenv("THOTH_SESSION_MAX_LIVE", DEFAULT_MAX_LIVE_SESSIONS)),
+        )
+
+    def __len__(self):
+        return len(self._live)
+
+    def acquire(self, session_id=None):
+        """The live handler for `session_id`, resumed from the store if needed, or a new session.
+
+        An unknown id starts a new, empty session under that id.
+        """
+        self.evict_idle()
+        entry = self._live.get(session_id) if session_id else None
+        if entry is None:
+            handler = self.chat_handler.new_session(session_id)
+            entry = [handler, 0, time.monotonic()]
+            self._live[handler.session_id] = entry
+        self._live.move_to_end(entry[0].session_id)
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, handler):
+        entry = self._live.get(handler.session_id)
+        if entry is not None:
+            entry[1] -= 1
+            entry[2] = time.monotonic()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        for session_id, (_, users, last_used) in list(self._live.items()):
+            over_capacity = len(self._live) > self.max_live
+            if users == 0 and (over_capacity or now - last_used > self.idle_seconds):
+                del self._live[session_id]
+
+_session_store = None
+
+def get_session_store():
+    """Process-wide session store, or None when disabled with THOTH_SESSION_STORE=0."""
+    global _session_store
+    if os.getenv("THOTH_SESSION_STORE", "1").lower() in ("0", "false", "off"):
+        return None
+    if _session_store is None:
+        _session_store = SessionStore(os.getenv("THOTH_SESSION_STORE_PATH", DEFAULT_SESSION_PATH))
+    return _session_store
+
+def load_session_secret():
+    """Key that session tokens are signed with.
+
+    THOTH_SESSION_SECRET if set; otherwise a random key stored next to the session
+    store, or held in memory only when the store is disabled.
+    """
+    configured = os.getenv("THOTH_SESSION_SECRET")
+    if configured:
+        return configured.encode()
+    store = get_session_store()
+    if store is None:
+        return secrets.token_bytes(32)
+    path = os.path.join(os.path.dirname(store.path), SESSION_SECRET_FILE)
+    try:
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read()
+    secret = secrets.token_bytes(32)
+    with os.fdopen(descriptor, "wb") as f:
+        f.write(secret)
+    return secret
+
+def session_token(secret, session_id):
+    """The token a client must present to read or resume `session_id`."""
+    return hmac.new(secret, session_id.encode(), hashlib.sha256).hexdigest()
+
+def check_session_token(secret, session_id, token):
+    return bool(token) and hmac.compare_digest(session_token(secret, session_id), token)
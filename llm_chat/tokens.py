@@ -0,0 +1,30 @@
+import re
+from functools import lru_cache
+
+# Llama 3 uses a tiktoken BPE vocabulary that is close to cl100k_base; Gemini's
+# SentencePiece tokenizer lands within a few percent of it on English and code.
+TIKTOKEN_ENCODING = "cl100k_base"
+
+# Fallback when tiktoken is not installed: words, numbers and single punctuation
+# marks each count as one token, plus one more per five characters of a long word.
+_PIECE_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(1 + len(piece) // 5 for piece in _PIECE_PATTERN.findall(text))
+
+def count_message_tokens(message):
+    # Every chat message carries a few tokens of role/format overhead
+    return count_tokens(message["content"]) + 4
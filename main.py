@@ -1,11 +1,20 @@
 import asyncio
+import argparse
 import os
 import signal
+import tempfile
+import time
 from dotenv import load_dotenv, set_key
-from llm_chat.chat_handler import ChatHandler
+from llm_chat.router import AUTO_MODEL, create_chat_handler
+from llm_chat.clients import close_providers
 from auto_coder.code_generator import CodeGenerator
 from agents.agent_manager import AgentManager
-from utils.helpers import setup_logging, print_colored, clear_screen
+from agents.project import ProjectBuilder
+from auto_coder.patching import trim_error
+from auto_coder.static_check import check_file, format_diagnostics, static_check_enabled
+from auto_coder.test_selection import PYTEST_ARGS, changed_names, project_tests, select_tests, strip_pytest_frames
+from utils.helpers import setup_logging, print_colored, clear_screen, print_usage_summary
+from utils.tracing import configure_tracing, start_span, tracer
 import subprocess
 from rich.console import Console
 from rich.panel import Panel
@@ -27,6 +36,7 @@ async def main():
         signal.signal(signal.SIGINT, signal_handler)
         load_dotenv()
         setup_logging()
+        configure_tracing()
         
         while True:
             clear_screen()
@@ -48,7 +58,7 @@ async def main():
             
             if choice in ["1", "2", "3"]:
                 model_id = select_model()
-                chat_handler = ChatHandler(model_id)
+                chat_handler = create_chat_handler(model_id)
                 code_generator = CodeGenerator(chat_handler)
                 agent_manager = AgentManager(chat_handler, code_generator)
             
@@ -58,7 +68,10 @@ async def main():
                 await ai_coder_mode(agent_manager)
             elif choice == "3":
                 await agents_mode(agent_manager)
-            elif choice == "4":
+            if choice in ["1", "2", "3"]:
+                await agent_manager.stop()
+
+            if choice == "4":
                 await web_ui_mode()
             elif choice == "5":
                 settings_mode()
@@ -71,7 +84,7 @@ async def main():
         console.print("[yellow]Please check your internet connection and API key, then try again.[/yellow]")
     finally:
         # Burada gerekirse temizlik işlemleri yapılabilir
-        pass
+        await close_providers()
 
 def select_model():
     clear_screen()
@@ -80,14 +93,15 @@ def select_model():
     console.print("2. Gemini 2 9B")
     console.print("3. Gemini 1.5 Pro")
     console.print("4. Gemini 1.5 Flash")
+    console.print("5. Auto (Llama 3.1 8B Instant first, Llama 3.1 70B when needed)")
     
     model_choice = Prompt.ask("Enter your choice", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9"])
-    s
     model_map = {
         "1": "llama-3.1-70b-versatile",
         "2": "gemini2-9b-it",
         "3": "gemini-1.5-pro-latest",
-        "4": "gemini-1.5-flash-latest"
+        "4": "gemini-1.5-flash-latest",
+        "5": AUTO_MODEL
     }
     
     return model_map.get(model_choice, "llama-3.1-8b-instant")
@@ -102,13 +116,17 @@ async def chat_mode(agent_manager):
         if user_input.lower() == "exit":
             break
         
-        # Asistan yanıtını al
-        response, usage = await agent_manager.process_chat(user_input)
+        # Asistan yanıtını parça parça göster
+        console.print("[bold green]Assistant:[/bold green] ", end="")
+        with start_span("cli.chat") as span:
+            stream = agent_manager.stream_chat(user_input)
+            async for delta in stream:
+                console.print(delta, end="", markup=False, highlight=False)
+        console.print()
+        print_trace_id(span)
+        response, usage = stream.text, stream.usage
         
-        if response:
-            # Önce asistan yanıtını göster
-            console.print(f"[bold green]Assistant:[/bold green] {response}")
-            
+        if response and not stream.error:
             # Token kullanımını göster (eğer varsa)
             if usage:
                 console.print(f"[dim]Estimated Token Usage: Prompt: {usage['prompt_tokens']}, Completion: {usage['completion_tokens']}, Total: {usage['total_tokens']}[/dim]")
@@ -124,13 +142,15 @@ async def ai_coder_mode(agent_manager):
         console.print(Panel("AI Coder Mode", expand=False, border_style="yellow"))
         console.print("1. Generate Code")
         console.print("2. Improve Code")
-        console.print("3. Exit")
+        console.print("3. Generate Code (Speculative)")
+        console.print("4. Generate Project (multiple files)")
+        console.print("5. Exit")
         
-        action = Prompt.ask("Choose action", choices=["1", "2", "3"])
+        action = Prompt.ask("Choose action", choices=["1", "2", "3", "4", "5"])
         
-        if action == "3":
+        if action == "5":
             break
-        elif action == "1":
+        elif action in ["1", "3"]:
             project_name = Prompt.ask("Enter project name")
             instructions = Prompt.ask("Enter code generation instructions")
             
@@ -140,67 +160,245 @@ async def ai_coder_mode(agent_manager):
             main_file = f"{project_name.lower().replace(' ', '_')}.py"
             file_path = os.path.join(project_path, main_file)
             
-            console.print("[yellow]Generating code...[/yellow]")
-            code = await agent_manager.code_generator.generate_code(instructions, file_path)
-            if code:
-                console.print("[green]Code generated successfully![/green]")
-                console.print(code)
+            # One trace covers generation and every run/fix attempt of this request
+            with start_span("cli.ai_coder", speculative=action == "3") as span:
+                code = None
+                if action == "3":
+                    code = await speculative_generate(agent_manager, instructions, project_path, main_file)
+                    if code:
+                        console.print(code)
+                    else:
+                        console.print("[yellow]No candidate ran cleanly, falling back to the fix loop...[/yellow]")
                 
-                # Kodu otomatik olarak çalıştır
-                await run_and_fix_code(agent_manager, project_path, main_file)
-            else:
-                console.print("[red]Failed to generate code.[/red]")
+                if not code:
+                    console.print("[yellow]Generating code...[/yellow]")
+                    code = await agent_manager.code_generator.generate_code(instructions, file_path)
+                    if code:
+                        console.print("[green]Code generated successfully![/green]")
+                        console.print(code)
+                        
+                        # Kodu otomatik olarak çalıştır
+                        await run_and_fix_code(agent_manager, project_path, main_file)
+                    else:
+                        console.print("[red]Failed to generate code.[/red]")
+            print_trace_id(span)
+        elif action == "4":
+            project_name = Prompt.ask("Enter project name")
+            instructions = Prompt.ask("Describe the project")
+            
+            project_path = os.path.join(os.getcwd(), project_name)
+            os.makedirs(project_path, exist_ok=True)
+            
+            with start_span("cli.ai_project") as span:
+                await generate_project(agent_manager, instructions, project_path)
+            print_trace_id(span)
         
         input("Press Enter to continue...")
 
 async def run_and_fix_code(agent_manager, project_path, main_file):
     max_attempts = 3
+    # The project's pytest tests, if any; after a fix, the ones using the changed code run first
+    tests = project_tests(project_path)
+    changed = None
+    # Static findings already sent for fixing; if they come back, the real run decides
+    reported = set()
     for attempt in range(max_attempts):
-        file_path = os.path.join(project_path, main_file)
-        if not os.path.exists(file_path):
-            console.print(f"[bold red]Error: File {file_path} does not exist.[/bold red]")
-            return
+        with start_span("fix_loop.attempt", attempt=attempt + 1):
+            file_path = os.path.join(project_path, main_file)
+            if not os.path.exists(file_path):
+                console.print(f"[bold red]Error: File {file_path} does not exist.[/bold red]")
+                return
 
-        console.print(f"[bold green]Running {main_file} (Attempt {attempt + 1}/{max_attempts})...[/bold green]")
-        process = subprocess.Popen(["python", main_file], cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        stdout, stderr = process.communicate()
-        if process.returncode == 0:
-            console.print("[bold green]Code ran successfully![/bold green]")
-            console.print(stdout)
-            break
-        else:
-            console.print(f"[bold red]Error occurred (Attempt {attempt + 1}/{max_attempts}):[/bold red]")
-            console.print(stderr)
+            diagnostics = []
+            if attempt < max_attempts - 1 and static_check_enabled():
+                # Problems certain to fail at run time are fixed without starting the program
+                # Imports are resolved by the interpreter the code will run under, not this process
+                diagnostics = await check_file(file_path, project_path, executor=agent_manager.executor)
+                diagnostics = [d for d in diagnostics if d.message not in reported]
+                reported.update(d.message for d in diagnostics)
+            if diagnostics:
+                failure = f"Static check found {len(diagnostics)} problem(s)"
+                error_output = format_diagnostics(diagnostics, main_file)
+                console.print(f"[yellow]{error_output}[/yellow]")
+            else:
+                console.print(f"[bold green]Running {main_file} (Attempt {attempt + 1}/{max_attempts})...[/bold green]")
+                failure, error_output = await verify_code(agent_manager, project_path, main_file, tests, changed)
+            if failure is None:
+                console.print(f"[bold green]Code ran successfully{' and its tests pass' if tests else ''}![/bold green]")
+                break
+            else:
+                if attempt > 0:
+                    # The previous attempt's fix did not help
+                    agent_manager.code_generator.report_failed_fix()
+                console.print(f"[bold red]Error occurred (Attempt {attempt + 1}/{max_attempts}):[/bold red] {failure}")
             
-            if attempt < max_attempts - 1:
-                console.print("[yellow]Attempting to fix the error...[/yellow]")
+                if attempt < max_attempts - 1:
+                    console.print("[yellow]Attempting to fix the error...[/yellow]")
                 
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    existing_code = file.read()
+                    with open(file_path, 'r', encoding='utf-8') as file:
+                        existing_code = file.read()
                 
-                fix_instructions = f"Fix the following error in the code:\n\n{stderr}\n\nExisting code:\n\n{existing_code}"
-                try:
-                    improved_code = await agent_manager.code_generator.improve_code(existing_code, fix_instructions, file_path)
+                    try:
+                        # A cached fix that already failed once would just fail again
+                        bypass_cache = attempt > 0
+                        # The first fix may come from the fast model; once one has failed, later ones use the primary
+                        cheap = attempt == 0
+                        if diagnostics:
+                            # No traceback to patch around; the findings go straight to a rewrite
+                            fix_instructions = f"Fix the following problems found by static analysis:\n\n{error_output}"
+                            improved_code = await agent_manager.code_generator.improve_code(existing_code, fix_instructions, file_path, bypass_cache=bypass_cache, cheap=cheap)
+                        else:
+                            # Patch only the code around the traceback; rewrite the whole file if that fails
+                            improved_code = await agent_manager.code_generator.patch_code(existing_code, error_output, file_path, bypass_cache=bypass_cache, cheap=cheap)
+                            if improved_code:
+                                console.print("[green]Applied a targeted patch.[/green]")
+                            else:
+                                fix_instructions = f"Fix the following error in the code:\n\n{failure}\n\n{trim_error(error_output)}"
+                                improved_code = await agent_manager.code_generator.improve_code(existing_code, fix_instructions, file_path, bypass_cache=bypass_cache, cheap=cheap)
                     
-                    if improved_code:
-                        # Check if the improved code is valid Python
-                        if is_valid_python(improved_code):
-                            with open(file_path, 'w', encoding='utf-8') as file:
-                                file.write(improved_code)
-                            console.print("[green]Code has been improved and saved.[/green]")
+                        if improved_code:
+                            # Check if the improved code is valid Python
+                            if is_valid_python(improved_code):
+                                with open(file_path, 'w', encoding='utf-8') as file:
+                                    file.write(improved_code)
+                                console.print("[green]Code has been improved and saved.[/green]")
+                                changed = changed_names(existing_code, improved_code)
+                            else:
+                                console.print("[bold red]The improved code is not valid Python. Keeping the original version.[/bold red]")
+                                console.print("[yellow]Invalid code:[/yellow]")
+                                console.print(improved_code)
                         else:
-                            console.print("[bold red]The improved code is not valid Python. Keeping the original version.[/bold red]")
-                            console.print("[yellow]Invalid code:[/yellow]")
-                            console.print(improved_code)
-                    else:
-                        console.print("[bold red]Failed to improve the code. Keeping the original version.[/bold red]")
-                except Exception as e:
-                    console.print(f"[bold red]Error while trying to improve code: {str(e)}[/bold red]")
+                            console.print("[bold red]Failed to improve the code. Keeping the original version.[/bold red]")
+                    except Exception as e:
+                        console.print(f"[bold red]Error while trying to improve code: {str(e)}[/bold red]")
+                else:
+                    console.print("[bold red]Failed to fix the code after maximum attempts.[/bold red]")
+
+async def verify_code(agent_manager, project_path, main_file, tests=None, changed=None):
+    """Run `main_file`, then the project's tests; (None, None) if all pass, else (failure, error output).
+
+    Tests that use the `changed` functions run before everything else, so a fix
+    that breaks them fails fast. Runs of unchanged code come from the run cache.
+    """
+    executor = agent_manager.executor
+    selected = select_tests(tests, changed) if tests and changed else []
+    if selected:
+        console.print(f"[dim]Running {len(selected)} test(s) that use the changed code...[/dim]")
+        failure, output = await run_tests(executor, project_path, selected)
+        if failure:
+            return failure, output
+
+    # Output is printed live while the script runs
+    result = await executor.run(main_file, project_path, on_output=print_execution_output, cache=True)
+    console.print(f"[dim]{format_execution_stats(result)}[/dim]")
+    if not result.success:
+        return result.describe_failure(), result.stderr
+
+    if tests:
+        # Everything pytest collects, not only the tests found statically
+        deselected = [arg for node_id in selected for arg in ("--deselect", node_id)]
+        console.print("[dim]Running the tests...[/dim]")
+        return await run_tests(executor, project_path, deselected)
+    return None, None
+
+async def run_tests(executor, project_path, args):
+    result = await executor.run_module("pytest", project_path, PYTEST_ARGS + list(args), cache=True)
+    # Exit code 5: every test was deselected
+    if result.success or (result.exit_code == 5 and not result.timed_out):
+        return None, None
+    output = strip_pytest_frames(f"{result.stdout}\n{result.stderr}").strip()
+    summary = output.splitlines()[-1] if output else result.describe_failure()
+    return f"Tests failed: {summary}", output
+
+async def speculative_generate(agent_manager, instructions, project_path, main_file, count=None, model_ids=None):
+    """Request `count` candidates at once, validate and run each as it arrives, keep the first that succeeds."""
+    code_generator = agent_manager.code_generator
+    count = count or int(os.getenv("THOTH_SPECULATIVE_CANDIDATES", "3"))
+    model_ids = model_ids or [m for m in os.getenv("THOTH_SPECULATIVE_MODELS", "").split(",") if m] or None
+    settings = code_generator.candidate_settings(count, model_ids)
+
+    async def try_candidate(index, model_id, temperature):
+        # A repeated (model, temperature) pair would hit the same cache entry (or share its twin's
+        # in-flight call), so it bypasses both and gets its own sample from the provider
+        repeated = settings.index((model_id, temperature)) != index
+        code = await code_generator.generate_candidate(instructions, temperature=temperature, model_id=model_id, bypass_cache=repeated)
+        if not code or not is_valid_python(code):
+            return index, code, None
+        # Each candidate runs in its own scratch directory so parallel runs cannot collide
+        with tempfile.TemporaryDirectory(prefix="thoth_candidate_") as workdir:
+            with open(os.path.join(workdir, main_file), 'w', encoding='utf-8') as file:
+                file.write(code)
+            result = await agent_manager.executor.run(main_file, workdir)
+        return index, code, result
+
+    console.print(f"[yellow]Generating {count} candidates in parallel...[/yellow]")
+    tasks = [asyncio.create_task(try_candidate(i, model_id, temperature)) for i, (model_id, temperature) in enumerate(settings)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, code, result = await next_done
+            model_id, temperature = settings[index]
+            label = f"Candidate {index + 1} ({model_id}, temperature {temperature})"
+            if result is None:
+                console.print(f"[red]{label}: {'not valid Python' if code else 'no response'}.[/red]")
+            elif not result.success:
+                console.print(f"[red]{label}: {result.describe_failure()}[/red]")
             else:
-                console.print("[bold red]Failed to fix the code after maximum attempts.[/bold red]")
-    
-    input("Press Enter to continue...")
+                console.print(f"[bold green]{label} ran successfully. {format_execution_stats(result)}[/bold green]")
+                console.print(result.stdout, markup=False, highlight=False)
+                with open(os.path.join(project_path, main_file), 'w', encoding='utf-8') as file:
+                    file.write(code)
+                code_generator.remember_file(os.path.join(project_path, main_file), code)
+                return code
+        return None
+    finally:
+        # The winner is in; stop the slower requests and kill their runs
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def generate_project(agent_manager, instructions, project_path):
+    """Plan a multi-file project, generate its files in dependency order, then run and fix its entry point."""
+    builder = ProjectBuilder(agent_manager, project_path)
+    console.print("[yellow]Planning the project...[/yellow]")
+    plan = await builder.plan(instructions)
+    if not plan:
+        console.print("[red]Failed to plan the project.[/red]")
+        return None
+
+    console.print(f"[green]{len(plan)} files, longest dependency chain {plan.longest_chain()}:[/green]")
+    for path in plan.order():
+        module = plan.modules[path]
+        uses = f" [dim](uses {', '.join(module.depends_on)})[/dim]" if module.depends_on else ""
+        console.print(f"  {path}: {module.purpose}{uses}")
+
+    started = time.monotonic()
+    results = await builder.build(instructions, plan)
+    written = sum(result.written for result in results.values())
+    console.print(f"[cyan]Generated {written}/{len(plan)} files in {time.monotonic() - started:.1f}s.[/cyan]")
+
+    if results[plan.entry_point].written:
+        await run_and_fix_code(agent_manager, project_path, plan.entry_point)
+    else:
+        console.print(f"[red]The entry point {plan.entry_point} could not be generated.[/red]")
+    return results
+
+def print_execution_output(stream_name, text):
+    console.print(text, end="", markup=False, highlight=False, style="red" if stream_name == "stderr" else None)
+
+def format_execution_stats(result):
+    stats = f"Exit code {result.exit_code} after {result.duration:.2f}s"
+    if result.cpu_time is not None:
+        stats += f", CPU {result.cpu_time:.2f}s"
+    if result.peak_rss_kb is not None:
+        stats += f", peak RSS {result.peak_rss_kb / 1024:.1f} MB"
+    if result.cached:
+        stats += " (cached result of an identical earlier run)"
+    return stats
+
+def print_trace_id(span):
+    # Only worth showing when the spans are being written somewhere
+    if tracer.exporter and span.sampled:
+        console.print(f"[dim]Trace {span.trace_id}[/dim]")
 
 def is_valid_python(code):
     try:
@@ -236,9 +434,10 @@ def settings_mode():
     console.print("1. Set Groq API Key")
     console.print("2. Set OpenAI API Key")
     console.print("3. Set Gemini API Key")
-    console.print("4. Back to Main Menu")
+    console.print("4. Show Usage Statistics")
+    console.print("5. Back to Main Menu")
     
-    choice = Prompt.ask("Enter your choice", choices=["1", "2", "3", "4"])
+    choice = Prompt.ask("Enter your choice", choices=["1", "2", "3", "4", "5"])
     
     if choice == "1":
         set_api_key("GROQ_API_KEY")
@@ -247,6 +446,9 @@ def settings_mode():
     elif choice == "3":
         set_api_key("GEMINI_API_KEY")
     elif choice == "4":
+        print_usage_summary()
+        input("Press Enter to return to the main menu...")
+    elif choice == "5":
         return
 
 def set_api_key(key_name):
@@ -255,8 +457,38 @@ def set_api_key(key_name):
     api_key = api_key.strip().strip("'\"")
     # API anahtarını doğrudan kaydet, tırnak işareti ekleme
     set_key(".env", key_name, api_key, quote_mode="never")
+    # New chat sessions pick up the key (and a client for it) without a restart
+    os.environ[key_name] = api_key
     console.print(f"[green]{key_name} has been updated.[/green]")
     input("Press Enter to continue...")
 
+async def batch_mode(args):
+    # Imported here so the interactive menu does not pay for it
+    from agents.batch import run_batch
+    try:
+        load_dotenv()
+        setup_logging()
+        configure_tracing()
+        await run_batch(args.batch, args.output, args.parallel, args.model, args.restart)
+    finally:
+        await close_providers()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Thoth Bot")
+    parser.add_argument("--batch", metavar="TASKS", help="run the tasks in a JSONL file without the interactive menu")
+    parser.add_argument("--output", help="results JSONL, also used to resume (default: <TASKS>.results.jsonl)")
+    parser.add_argument("--parallel", type=int, default=4, help="tasks running at the same time (default: 4)")
+    parser.add_argument("--model", help="model id for batch tasks, or 'auto' to route between a fast and a large model (default: $THOTH_BATCH_MODEL or llama-3.1-70b-versatile)")
+    parser.add_argument("--restart", action="store_true", help="discard earlier results instead of resuming")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        # asyncio's own Ctrl+C handling cancels the run, so finished results stay on disk
+        try:
+            asyncio.run(batch_mode(args))
+        except KeyboardInterrupt:
+            console.print("[yellow]Interrupted. Run the same command again to resume.[/yellow]")
+    else:
+        asyncio.run(main())
\ No newline at end of file
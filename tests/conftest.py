@@ -0,0 +1,33 @@
+import pytest
+from llm_chat import clients, coalescing, health, rate_limiter
+from llm_chat.clients import register_provider
+from llm_chat.fake_provider import FakeProvider
+
+# Tests run offline against the fake provider, with no cache, session or run files
+# on disk, and with fresh process-wide registries so breakers and limiters tripped
+# by one test cannot leak into the next.
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    for name in ("THOTH_RESPONSE_CACHE", "THOTH_SESSION_STORE", "THOTH_RUN_CACHE"):
+        monkeypatch.setenv(name, "0")
+    monkeypatch.setattr(clients, "_providers", {})
+    monkeypatch.setattr(health, "_provider_health", {})
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(coalescing, "_single_flight", None)
+
+@pytest.fixture
+def fake_provider():
+    """An instant FakeProvider serving every "fake*" model; set its script per test."""
+    provider = FakeProvider(latency="0", tokens_per_second=0, seed=0)
+    register_provider("fake", None, provider)
+    return provider
+
+@pytest.fixture
+def agent_manager(fake_provider):
+    from llm_chat.chat_handler import ChatHandler
+    from auto_coder.code_generator import CodeGenerator
+    from auto_coder.executor import CodeExecutor
+    from agents.agent_manager import AgentManager
+    chat_handler = ChatHandler("fake-model", cache=False, session_store=False)
+    return AgentManager(chat_handler, CodeGenerator(chat_handler), executor=CodeExecutor(run_cache=False))
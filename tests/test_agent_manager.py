@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from agents.agent_manager import AgentManager
+from llm_chat.chat_handler import ChatHandler
+from auto_coder.code_generator import CodeGenerator
+from auto_coder.executor import CodeExecutor
+
+def make_manager(**kwargs):
+    chat_handler = ChatHandler("fake-model", cache=False, session_store=False)
+    return AgentManager(chat_handler, CodeGenerator(chat_handler), executor=CodeExecutor(run_cache=False), quiet=True, **kwargs)
+
+class RecordingTasks:
+    """Stand-in for AgentManager._execute_task that records order and concurrency."""
+
+    def __init__(self, duration=0.01):
+        self.duration = duration
+        self.started = []
+        self.running = 0
+        self.peak = 0
+        self.gate = None
+
+    async def __call__(self, task_type, kwargs):
+        self.started.append(kwargs.get("name"))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            if self.gate is not None and kwargs.get("name") == "blocker":
+                await self.gate.wait()
+            await asyncio.sleep(self.duration)
+            return kwargs.get("name"), None
+        finally:
+            self.running -= 1
+
+def test_chat_task(fake_provider):
+    fake_provider.set_script([{"match": "ping", "response": "pong"}])
+
+    async def run():
+        manager = make_manager()
+        handle = await manager.add_task("chat", message="ping")
+        result = await handle
+        await manager.stop()
+        return result
+
+    response, usage = asyncio.run(run())
+    assert response == "pong"
+    assert usage["completion_tokens"] > 0
+
+def test_concurrency_limit_per_task_type(fake_provider):
+    tasks = RecordingTasks()
+
+    async def run():
+        manager = make_manager(concurrency_limits={"generate_code": 2})
+        manager._execute_task = tasks
+        handles = [await manager.add_task("generate_code", name=i) for i in range(6)]
+        results = await asyncio.gather(*handles)
+        await manager.stop()
+        return results
+
+    assert sorted(result for result, _ in asyncio.run(run())) == list(range(6))
+    assert tasks.peak == 2
+
+def test_higher_priority_runs_first(fake_provider):
+    tasks = RecordingTasks(duration=0)
+
+    async def run():
+        manager = make_manager(num_workers=1)
+        manager._execute_task = tasks
+        tasks.gate = asyncio.Event()
+        blocker = await manager.add_task("generate_code", name="blocker")
+        await asyncio.sleep(0.01)
+        handles = [
+            await manager.add_task("generate_code", name="bulk"),
+            await manager.add_task("chat", name="interactive"),
+        ]
+        tasks.gate.set()
+        await asyncio.gather(blocker, *handles)
+        await manager.stop()
+
+    asyncio.run(run())
+    assert tasks.started == ["blocker", "interactive", "bulk"]
+
+def test_cancelling_a_handle_cancels_the_running_work(fake_provider):
+    tasks = RecordingTasks(duration=10)
+
+    async def run():
+        manager = make_manager()
+        manager._execute_task = tasks
+        handle = await manager.add_task("generate_code", name="slow")
+        await asyncio.sleep(0.01)
+        assert tasks.running == 1
+        handle.cancel()
+        await asyncio.sleep(0.01)
+        running = tasks.running
+        await manager.stop()
+        return handle, running
+
+    handle, running = asyncio.run(run())
+    assert handle.cancelled()
+    assert running == 0
+
+def test_stop_cancels_queued_tasks(fake_provider):
+    tasks = RecordingTasks(duration=10)
+
+    async def run():
+        manager = make_manager(num_workers=1)
+        manager._execute_task = tasks
+        handles = [await manager.add_task("generate_code", name=i) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return handles
+
+    handles = asyncio.run(run())
+    assert all(handle.cancelled() for handle in handles)
+    # Including the one that was running, whose work is stopped too
+    assert tasks.started == [0]
+    assert tasks.running == 0
+
+def test_quiet_manager_raises_task_errors(fake_provider):
+    async def run():
+        manager = make_manager()
+        handle = await manager.add_task("no_such_task")
+        try:
+            return await handle
+        finally:
+            await manager.stop()
+
+    with pytest.raises(ValueError, match="Unknown task type"):
+        asyncio.run(run())
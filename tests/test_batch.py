@@ -0,0 +1,137 @@
+import asyncio
+import json
+import pytest
+from agents.batch import BatchRunner, BatchTaskError, parse_task, read_checkpoint, run_batch
+
+def write_tasks(path, tasks):
+    path.write_text("".join((task if isinstance(task, str) else json.dumps(task)) + "\n" for task in tasks))
+    return str(path)
+
+def read_results(path):
+    return {record["id"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+def test_parse_task():
+    assert parse_task('{"id": 7, "type": "chat", "message": "hi"}', 1) == ("7", "chat", {"message": "hi"})
+    assert parse_task('{"type": "chat", "message": "hi"}', 3)[0] == "line-3"
+
+@pytest.mark.parametrize("line, message", [
+    ("not json", "invalid JSON"),
+    ("[1, 2]", "must be a JSON object"),
+    ('{"id": "a", "type": "deploy"}', "unknown task type 'deploy'"),
+    ('{"id": "a", "type": "generate_code", "instructions": "x"}', "missing file_path"),
+])
+def test_invalid_tasks(line, message):
+    with pytest.raises(BatchTaskError, match=message):
+        parse_task(line, 1)
+
+def test_checkpoint_keeps_finished_ids_and_drops_a_torn_line(tmp_path):
+    output = tmp_path / "results.jsonl"
+    assert read_checkpoint(str(output)) == set()
+    output.write_text(
+        '{"id": "a", "status": "ok"}\n'
+        '{"id": "b", "status": "ok"}\n'
+        '{"id": "c", "status": "error"}\n'
+        '{"id": "b", "status": "error"}\n'
+        '{"id": "d", "sta'
+    )
+    assert read_checkpoint(str(output)) == {"a"}
+    assert output.read_text().endswith('"error"}\n')
+
+def run(agent_manager, tasks_path, output, parallelism=2, **kwargs):
+    async def main():
+        try:
+            return await BatchRunner(agent_manager, str(output), parallelism).run(tasks_path, **kwargs)
+        finally:
+            await agent_manager.stop()
+    return asyncio.run(main())
+
+def test_batch_runs_every_task_type(agent_manager, fake_provider, tmp_path):
+    agent_manager.quiet = True
+    fake_provider.set_script([
+        {"match": "AI code improver", "response": "print('improved')\n"},
+        {"match": "Generate Python code", "response": "print('generated')\n"},
+        {"match": "ping", "response": "pong"},
+    ])
+    existing = tmp_path / "existing.py"
+    existing.write_text("print('old')\n")
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [
+        {"id": "q1", "type": "chat", "message": "ping"},
+        {"id": "c1", "type": "generate_code", "instructions": "print generated", "file_path": str(tmp_path / "out" / "c1.py")},
+        {"id": "c2", "type": "improve_code", "instructions": "improve it", "file_path": str(existing)},
+        "",
+        "not json",
+        {"id": "q1", "type": "chat", "message": "duplicate"},
+    ])
+    output = tmp_path / "results.jsonl"
+
+    assert run(agent_manager, tasks, output) == {"ok": 3, "error": 1, "skipped": 0}
+    results = read_results(output)
+    assert results["q1"]["result"] == "pong"
+    assert results["q1"]["usage"]["completion_tokens"] > 0
+    assert results["c1"]["result"] == "print('generated')"
+    assert (tmp_path / "out" / "c1.py").read_text().strip() == "print('generated')"
+    assert results["c2"]["result"] == "print('improved')"
+    assert results["line-5"]["status"] == "error"
+
+def test_generate_code_to_a_bare_file_name(agent_manager, fake_provider, tmp_path, monkeypatch):
+    agent_manager.quiet = True
+    monkeypatch.chdir(tmp_path)
+    fake_provider.set_script([{"match": "Generate Python code", "response": "print('generated')\n"}])
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [{"id": "c1", "type": "generate_code", "instructions": "print", "file_path": "wc.py"}])
+    output = tmp_path / "results.jsonl"
+    assert run(agent_manager, tasks, output)["ok"] == 1
+    assert (tmp_path / "wc.py").read_text().strip() == "print('generated')"
+
+def test_failed_tasks_are_recorded(agent_manager, fake_provider, tmp_path):
+    agent_manager.quiet = True
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [
+        {"id": "c1", "type": "improve_code", "instructions": "improve it", "file_path": str(tmp_path / "missing.py")},
+    ])
+    output = tmp_path / "results.jsonl"
+    assert run(agent_manager, tasks, output)["error"] == 1
+    assert "missing.py" in read_results(output)["c1"]["error"]
+
+def test_rerun_only_does_the_remaining_work(agent_manager, fake_provider, tmp_path):
+    agent_manager.quiet = True
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [{"id": f"q{i}", "type": "chat", "message": f"question {i}"} for i in range(3)])
+    output = tmp_path / "results.jsonl"
+    output.write_text('{"id": "q0", "status": "ok"}\n{"id": "q1", "sta')
+    runner = BatchRunner(agent_manager, str(output))
+
+    async def main():
+        try:
+            resumed = dict(await runner.run(tasks))
+            calls = fake_provider.calls
+            runner.counts = {"ok": 0, "error": 0, "skipped": 0}
+            return resumed, calls, await runner.run(tasks, restart=True)
+        finally:
+            await agent_manager.stop()
+
+    resumed, calls, restarted = asyncio.run(main())
+    assert resumed == {"ok": 2, "error": 0, "skipped": 1}
+    assert calls == 2
+    assert restarted == {"ok": 3, "error": 0, "skipped": 0}
+    assert sorted(record["id"] for record in map(json.loads, output.read_text().splitlines())) == ["q0", "q1", "q2"]
+
+def test_parallelism_bounds_tasks_in_flight(agent_manager, fake_provider, tmp_path, monkeypatch):
+    agent_manager.quiet = True
+    running, peak = [0], [0]
+
+    async def submit(task_type, kwargs):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return "done", None
+
+    monkeypatch.setattr(BatchRunner, "_submit", lambda self, task_type, kwargs: submit(task_type, kwargs))
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [{"id": f"q{i}", "type": "chat", "message": "hi"} for i in range(8)])
+    assert run(agent_manager, tasks, tmp_path / "results.jsonl", parallelism=3)["ok"] == 8
+    assert peak[0] == 3
+
+def test_run_batch(fake_provider, tmp_path):
+    fake_provider.set_script([{"match": "ping", "response": "pong"}])
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [{"id": "q1", "type": "chat", "message": "ping"}])
+    counts = asyncio.run(run_batch(tasks, model_id="fake-model"))
+    assert counts == {"ok": 1, "error": 0, "skipped": 0}
+    assert read_results(tmp_path / "tasks.results.jsonl")["q1"]["result"] == "pong"
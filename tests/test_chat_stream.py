@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from llm_chat.chat_handler import ChatHandler, ChatStream
+
+USAGE = {"prompt_tokens": 2, "completion_tokens": 3, "total_tokens": 5}
+
+class Upstream:
+    """Async iterator of (delta, usage) chunks that records whether it was closed."""
+
+    def __init__(self, deltas=("a", "b", "c"), error=None, pause=None):
+        self.deltas = deltas
+        self.error = error
+        self.pause = pause
+        self.closed = False
+        self.read = 0
+
+    async def chunks(self):
+        try:
+            for delta in self.deltas:
+                if self.pause is not None:
+                    await self.pause.wait()
+                self.read += 1
+                yield delta, None
+            if self.error:
+                raise self.error
+            yield None, USAGE
+        finally:
+            self.closed = True
+
+def test_iteration_sets_text_and_usage():
+    completed = []
+    stream = ChatStream(Upstream().chunks(), on_complete=completed.append)
+
+    async def main():
+        return [delta async for delta in stream]
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
+    assert (stream.text, stream.usage, stream.error) == ("abc", USAGE, None)
+    assert completed == [stream]
+
+def test_collect_after_partial_iteration_keeps_the_earlier_deltas():
+    completed = []
+    stream = ChatStream(Upstream().chunks(), on_complete=completed.append)
+
+    async def main():
+        async for delta in stream:
+            assert delta == "a"
+            break
+        return await stream.collect()
+
+    assert asyncio.run(main()) == ("abc", USAGE)
+    assert len(completed) == 1
+
+def test_collect_after_full_iteration_does_not_complete_twice():
+    completed = []
+    stream = ChatStream(Upstream().chunks(), on_complete=completed.append)
+
+    async def main():
+        async for _ in stream:
+            pass
+        return await stream.collect()
+
+    assert asyncio.run(main()) == ("abc", USAGE)
+    assert len(completed) == 1
+
+def test_closing_mid_stream_abandons_the_upstream():
+    upstream = Upstream()
+    completed = []
+    stream = ChatStream(upstream.chunks(), on_complete=completed.append)
+
+    async def main():
+        async for _ in stream:
+            await stream.aclose()
+        return await stream.collect()
+
+    assert asyncio.run(main()) == ("a", None)
+    assert upstream.closed
+    assert upstream.read == 1
+    assert completed == []
+
+def test_cancelling_the_reading_task_stops_the_stream():
+    pause = asyncio.Event()
+    upstream = Upstream(pause=pause)
+    completed = []
+    stream = ChatStream(upstream.chunks(), on_complete=completed.append)
+    received = []
+
+    async def read():
+        async for delta in stream:
+            received.append(delta)
+            pause.clear()
+
+    async def main():
+        task = asyncio.create_task(read())
+        pause.set()
+        while not received:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert received == ["a"]
+    assert upstream.closed
+    assert completed == []
+
+def test_errors_are_kept_with_the_partial_text():
+    completed = []
+    stream = ChatStream(Upstream(error=RuntimeError("connection reset")).chunks(), on_complete=completed.append)
+
+    async def main():
+        return [delta async for delta in stream]
+
+    # The error ends the iteration instead of being raised into the loop
+    assert asyncio.run(main()) == ["a", "b", "c"]
+    assert isinstance(stream.error, RuntimeError)
+    assert stream.text == "abc"
+    assert completed == []
+    assert asyncio.run(stream.collect()) == (None, None)
+
+def test_failed_reply_is_not_added_to_the_conversation(fake_provider):
+    fake_provider.error_rate = 1.0
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    handler.retry_base_delay = 0
+    stream = handler.stream_message("hello", coalesce=False)
+    assert asyncio.run(stream.collect()) == (None, None)
+    assert stream.error is not None
+    assert handler.history.messages == []
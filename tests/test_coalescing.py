@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.coalescing import SingleFlight, get_single_flight
+from llm_chat.fake_provider import LatencyDistribution
+
+def test_concurrent_calls_share_one_upstream_call():
+    calls = []
+    shared = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.call("k", factory, on_shared=lambda: shared.append(1)) for _ in range(5)))
+        assert not flight.in_flight("k")
+        return results
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert len(shared) == 4
+
+def test_finished_calls_are_not_reused():
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return await flight.call("k", factory), await flight.call("k", factory)
+
+    assert asyncio.run(main()) == (1, 2)
+
+def test_errors_reach_every_waiter():
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.call("k", factory) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_cancelling_one_waiter_keeps_the_call_for_the_others():
+    started = []
+
+    async def factory():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.call("k", factory))
+        second = asyncio.ensure_future(flight.call("k", factory))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ("result", True)
+    assert len(started) == 1
+
+def test_upstream_call_is_cancelled_once_every_waiter_leaves():
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def factory():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight = SingleFlight()
+        waiters = [asyncio.ensure_future(flight.call("k", factory)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert not flight.in_flight("k")
+
+        # A late arrival starts a fresh call instead of joining the abandoned one
+        async def fresh():
+            return "fresh"
+        return await flight.call("k", fresh)
+
+    assert asyncio.run(main()) == "fresh"
+
+async def chunks(parts, delay=0.01):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+async def read(stream):
+    return [chunk async for chunk in stream]
+
+def test_late_stream_subscribers_replay_from_the_start():
+    opened = []
+
+    def factory():
+        opened.append(1)
+        return chunks(["a", "b", "c"])
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(read(flight.stream("k", factory)))
+        await asyncio.sleep(0.025)
+        second = asyncio.ensure_future(read(flight.stream("k", factory)))
+        return await first, await second
+
+    assert asyncio.run(main()) == (["a", "b", "c"], ["a", "b", "c"])
+    assert len(opened) == 1
+
+def test_stream_errors_reach_every_subscriber():
+    async def failing():
+        yield "a"
+        raise ValueError("stream broke")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(read(flight.stream("k", failing)) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_stream_is_cancelled_once_every_subscriber_leaves():
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def source():
+            try:
+                async for chunk in chunks(["a", "b", "c"], delay=0.05):
+                    yield chunk
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight = SingleFlight()
+        stream = flight.stream("k", source)
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flight.in_flight("k")
+
+    assert asyncio.run(main()) is False
+
+def test_can_be_disabled(monkeypatch):
+    assert get_single_flight() is get_single_flight()
+    monkeypatch.setenv("THOTH_COALESCE", "0")
+    assert get_single_flight() is None
+
+def test_chat_handler_coalesces_identical_requests(fake_provider):
+    fake_provider.latency = LatencyDistribution("0.02")
+    fake_provider.set_script([{"match": "hello", "response": "hi there"}])
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        return await asyncio.gather(*(handler.complete(messages) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert [text for text, _ in results] == ["hi there"] * 3
+    assert fake_provider.calls == 1
+
+@pytest.mark.parametrize("options", [{"coalesce": False}, {"bypass_cache": True}])
+def test_chat_handler_can_opt_out(fake_provider, options):
+    fake_provider.latency = LatencyDistribution("0.02")
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        return await asyncio.gather(*(handler.complete(messages, **options) for _ in range(3)))
+
+    asyncio.run(main())
+    assert fake_provider.calls == 3
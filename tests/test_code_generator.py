@@ -0,0 +1,35 @@
+import asyncio
+from auto_coder.code_generator import CodeGenerator, clean_code
+from llm_chat.chat_handler import ChatHandler
+
+def make_generator():
+    return CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+
+def test_candidate_handlers_are_reused_per_model(fake_provider):
+    generator = make_generator()
+    assert generator.candidate_handler() is generator.chat_handler
+    assert generator.candidate_handler("fake-model") is generator.chat_handler
+    other = generator.candidate_handler("fake-other")
+    assert other.model_id == "fake-other"
+    assert generator.candidate_handler("fake-other") is other
+
+def test_candidates_from_another_model_share_one_handler(fake_provider):
+    fake_provider.set_script([{"match": "Generate Python code", "response": "print('candidate')\n"}])
+    generator = make_generator()
+
+    async def candidates():
+        return await asyncio.gather(*(
+            generator.generate_candidate("print something", temperature=t, model_id="fake-other") for t in (0.2, 0.7)
+        ))
+
+    assert asyncio.run(candidates()) == ["print('candidate')"] * 2
+    assert list(generator._candidate_handlers) == ["fake-other"]
+
+def test_unavailable_candidate_model_gives_no_candidate(fake_provider, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    generator = make_generator()
+    assert asyncio.run(generator.generate_candidate("anything", model_id="llama-3.1-8b-instant")) is None
+
+def test_clean_code_strips_markdown():
+    assert clean_code("```python\nprint(1)\n```") == "print(1)"
+    assert clean_code("Here's the corrected code:\nprint(1)") == "print(1)"
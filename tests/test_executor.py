@@ -0,0 +1,193 @@
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+import pytest
+from auto_coder.executor import CodeExecutor, project_digest, resource
+from llm_chat.response_cache import ResponseCache
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        # A killed process whose parent is gone may linger as a zombie until it is reaped
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+def run(executor, tmp_path, source, **kwargs):
+    (tmp_path / "script.py").write_text(source)
+    return asyncio.run(executor.run("script.py", str(tmp_path), **kwargs))
+
+def test_successful_run(tmp_path):
+    result = run(CodeExecutor(run_cache=False), tmp_path, "import sys\nprint('hello', sys.argv[1:])\n", args=["a"])
+    assert result.success
+    assert result.stdout == "hello ['a']\n"
+    assert result.stderr == ""
+    assert not result.cached
+
+def test_failure_keeps_the_traceback_of_the_script_only(tmp_path):
+    result = run(CodeExecutor(run_cache=False), tmp_path, "def f():\n    raise ValueError('boom')\nf()\n")
+    assert not result.success
+    assert result.exit_code == 1
+    assert "ValueError: boom" in result.stderr
+    assert 'script.py", line 2' in result.stderr
+    assert "runpy" not in result.stderr
+    assert result.describe_failure() == "The script exited with code 1."
+
+def test_stdin_is_passed_to_the_script(tmp_path):
+    result = run(CodeExecutor(run_cache=False), tmp_path, "print(input().upper())\n", stdin="shout\n")
+    assert result.stdout == "SHOUT\n"
+
+def test_wall_clock_timeout_kills_the_script(tmp_path):
+    started = time.monotonic()
+    result = run(CodeExecutor(wall_timeout=0.5, run_cache=False), tmp_path, "import time\ntime.sleep(30)\n")
+    assert result.timed_out
+    assert not result.success
+    assert time.monotonic() - started < 10
+    assert "wall-clock limit" in result.describe_failure()
+
+@pytest.mark.skipif(resource is None, reason="process groups and rlimits need a POSIX system")
+def test_timeout_also_kills_child_processes(tmp_path):
+    source = (
+        "import subprocess, sys, time\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+        "print(child.pid, flush=True)\n"
+        "time.sleep(30)\n"
+    )
+    result = run(CodeExecutor(wall_timeout=1, run_cache=False), tmp_path, source)
+    assert result.timed_out
+    time.sleep(0.2)
+    assert not alive(int(result.stdout.split()[0]))
+
+@pytest.mark.skipif(resource is None, reason="process groups and rlimits need a POSIX system")
+def test_children_holding_the_output_open_are_killed_at_the_deadline(tmp_path):
+    source = (
+        "import subprocess, sys\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+        "print(child.pid, flush=True)\n"
+    )
+    started = time.monotonic()
+    result = run(CodeExecutor(wall_timeout=1, run_cache=False), tmp_path, source)
+    assert time.monotonic() - started < 5
+    # The script itself finished in time; only what it left behind was killed
+    assert result.success
+    time.sleep(0.2)
+    assert not alive(int(result.stdout.split()[0]))
+
+@pytest.mark.skipif(resource is None or not hasattr(signal, "SIGXCPU"), reason="needs RLIMIT_CPU")
+def test_cpu_limit(tmp_path):
+    result = run(CodeExecutor(cpu_timeout=1, wall_timeout=20, run_cache=False), tmp_path, "while True:\n    pass\n")
+    assert not result.timed_out
+    assert not result.success
+    assert "CPU time limit" in result.describe_failure()
+
+def test_output_is_capped_but_streamed_in_full(tmp_path):
+    seen = []
+    result = run(
+        CodeExecutor(output_limit=1000, run_cache=False), tmp_path,
+        "import sys\nprint('x' * 5000)\nsys.stderr.write('e' * 10)\n",
+        on_output=lambda name, text: seen.append((name, text)),
+    )
+    assert result.success
+    assert result.stdout_truncated
+    assert result.stdout.count("x") <= 1000
+    assert not result.stderr_truncated
+    assert result.stderr == "e" * 10
+    assert sum(text.count("x") for name, text in seen if name == "stdout") == 5000
+
+def test_cancelling_a_run_kills_the_script(tmp_path):
+    (tmp_path / "script.py").write_text("import os, time\nprint(os.getpid(), flush=True)\ntime.sleep(30)\n")
+    pids = []
+
+    async def cancel_after_start():
+        executor = CodeExecutor(run_cache=False)
+        task = asyncio.create_task(executor.run("script.py", str(tmp_path), on_output=lambda name, text: pids.append(text)))
+        while not pids:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_after_start())
+    time.sleep(0.2)
+    assert not alive(int(pids[0].split()[0]))
+
+@pytest.mark.skipif(resource is None, reason="stats are only collected on POSIX systems")
+def test_stats_files_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    (tmp_path / "project").mkdir()
+    executor = CodeExecutor(wall_timeout=0.5, run_cache=False)
+    for source in ("print('ok')\n", "import time\ntime.sleep(30)\n"):
+        (tmp_path / "project" / "script.py").write_text(source)
+        asyncio.run(executor.run("script.py", str(tmp_path / "project")))
+
+    async def cancel_after_start():
+        task = asyncio.create_task(executor.run("script.py", str(tmp_path / "project")))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_after_start())
+    assert list(tmp_path.glob("thoth_exec_*")) == []
+
+def test_import_check(tmp_path):
+    (tmp_path / "good.py").write_text("VALUE = 1\n")
+    (tmp_path / "bad.py").write_text("import no_such_module_here\n")
+    executor = CodeExecutor(run_cache=False)
+    assert asyncio.run(executor.check_import("good", str(tmp_path))).success
+    result = asyncio.run(executor.check_import("bad", str(tmp_path)))
+    assert not result.success
+    assert "ModuleNotFoundError" in result.stderr
+
+def test_runs_with_the_configured_interpreter(tmp_path):
+    result = run(CodeExecutor(python=sys.executable, run_cache=False), tmp_path, "import sys\nprint(sys.executable)\n")
+    assert result.stdout.strip() == sys.executable
+
+def cached_run(tmp_path, source, **kwargs):
+    project = tmp_path / "project"
+    project.mkdir(exist_ok=True)
+    (project / "script.py").write_text(source)
+    executor = CodeExecutor(run_cache=ResponseCache(str(tmp_path / "run_cache.sqlite")), wall_timeout=kwargs.pop("wall_timeout", 30))
+    return asyncio.run(executor.run("script.py", str(project), cache=True, **kwargs))
+
+def test_unchanged_runs_come_from_the_run_cache(tmp_path):
+    source = "import time\nprint(time.time())\n"
+    first = cached_run(tmp_path, source)
+    assert not first.cached
+    output = []
+    second = cached_run(tmp_path, source, on_output=lambda stream, text: output.append((stream, text)))
+    assert second.cached
+    assert second.stdout == first.stdout
+    assert output == [("stdout", first.stdout), ("stderr", "")]
+
+def test_run_cache_key_covers_the_project_and_arguments(tmp_path):
+    source = "import time\nprint(time.time())\n"
+    cached_run(tmp_path, source)
+    assert not cached_run(tmp_path, source, args=["a"]).cached
+    assert not cached_run(tmp_path, source, stdin="input").cached
+    (tmp_path / "project" / "data.txt").write_text("changed")
+    assert not cached_run(tmp_path, source).cached
+    assert not cached_run(tmp_path, source + "# edited\n").cached
+    assert cached_run(tmp_path, source + "# edited\n").cached
+
+def test_timeouts_are_not_cached(tmp_path):
+    source = "import time\ntime.sleep(5)\n"
+    assert cached_run(tmp_path, source, wall_timeout=0.2).timed_out
+    assert not cached_run(tmp_path, source, wall_timeout=0.2).cached
+
+def test_project_digest_ignores_caches_and_hidden_directories(tmp_path):
+    (tmp_path / "main.py").write_text("print(1)\n")
+    digest = project_digest(str(tmp_path))
+    for name in ("__pycache__", ".git", "venv"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "junk").write_text("junk")
+    assert project_digest(str(tmp_path)) == digest
+    (tmp_path / "other.py").write_text("")
+    assert project_digest(str(tmp_path)) != digest
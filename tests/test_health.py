@@ -0,0 +1,215 @@
+import asyncio
+import pytest
+from llm_chat import chat_handler
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.clients import provider_name_for, register_provider
+from llm_chat.fake_provider import FakeProvider, LatencyDistribution
+from llm_chat.health import (
+    CircuitOpenError, ProviderHealth, ResiliencePolicy, current_policy, get_provider_health, use_policy,
+)
+
+def expire(health):
+    # Pretend reset_timeout has passed since the circuit opened
+    health.opened_at -= health.reset_timeout
+
+def test_consecutive_failures_open_the_circuit():
+    health = ProviderHealth("p", failure_threshold=3)
+    for _ in range(2):
+        health.record_failure()
+    assert health.state == "closed"
+    health.check()
+    health.record_failure()
+    assert health.state == "open"
+    assert health.is_open()
+    with pytest.raises(CircuitOpenError):
+        health.check()
+
+def test_success_resets_the_consecutive_count():
+    health = ProviderHealth("p", failure_threshold=3)
+    for _ in range(4):
+        health.record_failure()
+        health.record_success()
+    assert health.state == "closed"
+
+def test_error_rate_opens_once_half_the_window_is_seen():
+    health = ProviderHealth("p", failure_threshold=100, error_rate=0.5, window=10)
+    for _ in range(2):
+        health.record_success()
+        health.record_failure()
+    assert health.state == "closed"
+    health.record_failure()
+    assert health.state == "open"
+
+def test_half_open_lets_one_probe_through():
+    health = ProviderHealth("p", failure_threshold=1)
+    health.record_failure()
+    expire(health)
+    assert health.state == "half_open"
+    assert not health.is_open()
+    # Checking is_open does not use up the probe
+    health.check()
+    assert health.is_open()
+    with pytest.raises(CircuitOpenError):
+        health.check()
+
+def test_probe_success_closes_and_failure_reopens():
+    health = ProviderHealth("p", failure_threshold=1)
+    health.record_failure()
+    expire(health)
+    health.check()
+    health.record_failure()
+    assert health.state == "open"
+
+    expire(health)
+    health.check()
+    health.record_success()
+    assert health.state == "closed"
+    assert health.consecutive_failures == 0
+
+def test_a_probe_that_never_reports_back_does_not_block_forever():
+    health = ProviderHealth("p", failure_threshold=1)
+    health.record_failure()
+    expire(health)
+    health.check()
+    health.probe_started -= health.reset_timeout
+    health.check()
+
+def test_p95_needs_enough_samples():
+    health = ProviderHealth("p")
+    for seconds in range(19):
+        health.record_success("m", seconds)
+    assert health.p95("m") is None
+    health.record_success("m", 19)
+    assert health.p95("m") == 19
+    assert health.p95("other") is None
+
+def test_breakers_are_shared_per_provider_and_configurable(monkeypatch):
+    monkeypatch.setenv("THOTH_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("THOTH_BREAKER_RESET_SECONDS", "5")
+    health = get_provider_health("p")
+    assert get_provider_health("p") is health
+    assert (health.failure_threshold, health.reset_timeout) == (2, 5.0)
+
+def test_policies_are_scoped_to_the_context():
+    policy = ResiliencePolicy("backup")
+    with use_policy(policy):
+        assert current_policy() is policy
+        with use_policy(None):
+            assert current_policy() is None
+        assert current_policy() is policy
+    assert current_policy() is None
+
+@pytest.fixture
+def handler(fake_provider):
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    handler.retry_base_delay = 0
+    return handler
+
+@pytest.fixture
+def backup_provider(monkeypatch):
+    """A second fake provider, with its own breaker, serving "backup*" models."""
+    monkeypatch.setattr(chat_handler, "provider_name_for",
+                        lambda model_id: "backup" if model_id.startswith("backup") else provider_name_for(model_id))
+    provider = FakeProvider(latency="0", tokens_per_second=0, seed=0)
+    provider.name = "backup"
+    provider.set_script([{"match": "", "response": "from backup"}])
+    register_provider("backup", None, provider)
+    return provider
+
+def complete(handler, policy=None, message="hello"):
+    async def main():
+        with use_policy(policy):
+            return await handler.complete([{"role": "user", "content": message}], coalesce=False)
+    return asyncio.run(main())
+
+def test_failing_provider_opens_the_circuit_and_calls_stop(handler, fake_provider):
+    fake_provider.error_rate = 1.0
+    handler.health.failure_threshold = 3
+    assert complete(handler) == (None, None)
+    assert handler.health.state == "open"
+    assert fake_provider.calls == 3
+    # Refused without reaching the provider, and without retries
+    assert complete(handler) == (None, None)
+    assert fake_provider.calls == 3
+
+def test_fails_over_to_the_backup_while_the_circuit_is_open(handler, fake_provider, backup_provider):
+    handler.health.failure_threshold = 1
+    handler.health.record_failure()
+    text, _ = complete(handler, ResiliencePolicy("backup-model"))
+    assert text == "from backup"
+    assert fake_provider.calls == 0
+
+def test_fails_over_after_the_primary_gives_up(handler, fake_provider, backup_provider):
+    fake_provider.error_rate = 1.0
+    text, _ = complete(handler, ResiliencePolicy("backup-model", max_retries=2))
+    assert text == "from backup"
+    assert fake_provider.calls == 2
+    assert backup_provider.calls == 1
+
+def test_hedged_request_takes_the_first_answer(handler, fake_provider, backup_provider):
+    fake_provider.latency = LatencyDistribution("0.5")
+    text, _ = complete(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=0.01))
+    assert text == "from backup"
+
+def test_no_hedge_while_the_primary_is_on_time(handler, fake_provider, backup_provider):
+    fake_provider.set_script([{"match": "", "response": "from primary"}])
+    text, _ = complete(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=1))
+    assert text == "from primary"
+    assert backup_provider.calls == 0
+
+def test_stream_fails_over_before_the_first_token(handler, fake_provider, backup_provider):
+    fake_provider.error_rate = 1.0
+    handler.health.failure_threshold = 1
+
+    async def main():
+        with use_policy(ResiliencePolicy("backup-model")):
+            return await handler.stream([{"role": "user", "content": "hello"}], coalesce=False).collect()
+
+    text, _ = asyncio.run(main())
+    assert text == "from backup"
+
+def stream(handler, policy, message="hello"):
+    async def main():
+        with use_policy(policy):
+            chat = handler.stream_message(message, coalesce=False)
+            deltas = [delta async for delta in chat]
+            return "".join(deltas), chat.error
+    return asyncio.run(main())
+
+def test_slow_stream_is_hedged_on_time_to_first_token(handler, fake_provider, backup_provider, monkeypatch):
+    fake_provider.latency = LatencyDistribution("5")
+    text, error = stream(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=0.01))
+    assert (text, error) == ("from backup", None)
+    assert handler.history.messages[-1]["content"] == "from backup"
+
+def test_stream_on_time_is_not_hedged(handler, fake_provider, backup_provider):
+    fake_provider.set_script([{"match": "", "response": "from primary"}])
+    text, _ = stream(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=1))
+    assert text == "from primary"
+    assert backup_provider.calls == 0
+
+def test_hedged_stream_uses_whichever_produces_text(handler, fake_provider, backup_provider):
+    fake_provider.set_script([{"match": "", "response": "from primary"}])
+    fake_provider.latency = LatencyDistribution("0.05")
+    backup_provider.latency = LatencyDistribution("5")
+    text, _ = stream(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=0.01))
+    assert text == "from primary"
+    assert backup_provider.calls == 1
+
+def test_hedged_stream_fails_when_both_fail(handler, fake_provider, backup_provider):
+    fake_provider.latency = LatencyDistribution("0.05")
+    fake_provider.error_rate = backup_provider.error_rate = 1.0
+    text, error = stream(handler, ResiliencePolicy("backup-model", hedge=True, hedge_after=0.01, max_retries=1))
+    assert text == ""
+    assert error is not None
+    # The backup is not asked a second time
+    assert backup_provider.calls == 1
+
+def test_stream_hedge_defaults_to_the_p95_time_to_first_token(handler, fake_provider, backup_provider):
+    for _ in range(20):
+        handler.health.record_first_token("fake-model", 0.01)
+    fake_provider.latency = LatencyDistribution("5")
+    assert handler.health.p95("fake-model", first_token=True) == 0.01
+    assert handler.health.p95("fake-model") is None
+    text, _ = stream(handler, ResiliencePolicy("backup-model", hedge=True))
+    assert text == "from backup"
@@ -0,0 +1,92 @@
+import asyncio
+from llm_chat.history import ConversationHistory, SUMMARY_PREFIX
+from llm_chat.tokens import count_message_tokens
+
+def turn_text(index, words=20):
+    return " ".join(f"word{index}x{n}" for n in range(words))
+
+def fill(history, turns):
+    for index in range(turns):
+        history.append("user" if index % 2 == 0 else "assistant", turn_text(index))
+
+class Summarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, previous, messages):
+        self.calls.append((previous, messages))
+        return f"summary {len(self.calls)}"
+
+def prompt(history, message="next question"):
+    return asyncio.run(history.prompt_messages(message))
+
+def test_short_conversation_is_sent_verbatim():
+    summarize = Summarizer()
+    history = ConversationHistory("fake-model", token_budget=10000, summarize=summarize)
+    fill(history, 4)
+    messages = prompt(history)
+    assert [m["content"] for m in messages] == [turn_text(i) for i in range(4)] + ["next question"]
+    assert summarize.calls == []
+
+def test_overflow_folds_oldest_turns_into_a_summary():
+    summarize = Summarizer()
+    budget = count_message_tokens({"content": turn_text(0)}) * 8
+    history = ConversationHistory("fake-model", token_budget=budget, summarize=summarize)
+    fill(history, 20)
+    messages = prompt(history)
+
+    assert len(summarize.calls) == 1
+    previous, folded = summarize.calls[0]
+    assert previous is None
+    assert folded[0]["content"] == turn_text(0)
+    assert messages[0] == {"role": "system", "content": SUMMARY_PREFIX + "summary 1"}
+    window = messages[1:-1]
+    # The window opens on a user turn and ends with the latest turns
+    assert window[0]["role"] == "user"
+    assert window[-1]["content"] == turn_text(19)
+    assert history.window_tokens() <= budget
+    # The full log is kept
+    assert len(history) == 20
+    assert len(history.messages) == 20
+
+def test_summary_is_only_refreshed_after_the_window_overflows_again():
+    summarize = Summarizer()
+    budget = count_message_tokens({"content": turn_text(0)}) * 8
+    history = ConversationHistory("fake-model", token_budget=budget, summarize=summarize)
+    fill(history, 20)
+    prompt(history)
+    # The compacted window leaves room for a couple more turns without another call
+    history.append("user", "short")
+    prompt(history)
+    assert len(summarize.calls) == 1
+
+    fill(history, 20)
+    prompt(history)
+    assert len(summarize.calls) == 2
+    assert summarize.calls[1][0] == "summary 1"
+
+def test_without_summarizer_old_turns_slide_out():
+    budget = count_message_tokens({"content": turn_text(0)}) * 8
+    history = ConversationHistory("fake-model", token_budget=budget)
+    fill(history, 20)
+    messages = prompt(history)
+    assert all(m["role"] != "system" for m in messages)
+    assert turn_text(0) not in [m["content"] for m in messages]
+    assert history.window_tokens() <= budget
+
+def test_recent_turns_are_kept_even_if_over_budget():
+    history = ConversationHistory("fake-model", token_budget=50, min_recent_messages=4)
+    for index in range(6):
+        history.append("user" if index % 2 == 0 else "assistant", turn_text(index, words=40))
+    messages = prompt(history)
+    assert [m["content"] for m in messages[-5:-1]] == [turn_text(i, words=40) for i in range(2, 6)]
+
+def test_reset_clears_everything():
+    summarize = Summarizer()
+    history = ConversationHistory("fake-model", token_budget=200, summarize=summarize)
+    fill(history, 20)
+    prompt(history)
+    history.reset()
+    assert len(history) == 0
+    assert history.summary is None
+    assert prompt(history) == [{"role": "user", "content": "next question"}]
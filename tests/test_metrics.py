@@ -0,0 +1,73 @@
+import pytest
+from utils import metrics as metrics_module
+from utils.metrics import Histogram, MetricsRegistry
+
+def test_histogram_quantiles_are_bucket_bounds():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert histogram.sum == pytest.approx(5.6)
+
+def test_counters_per_model():
+    registry = MetricsRegistry()
+    registry.inc("thoth_requests_total", model="a", status="ok")
+    registry.inc("thoth_requests_total", status="ok", model="a")
+    registry.inc("thoth_requests_total", model="b", status="error")
+    registry.inc("thoth_tokens_total", 5, model="a", kind="prompt", source="provider")
+    registry.inc("thoth_tokens_total", 2, model="a", kind="prompt", source="estimate")
+    assert registry.counter("thoth_requests_total", model="a", status="ok") == 2
+    assert registry.counter("thoth_requests_total", model="a", status="error") == 0
+    assert registry.total("thoth_tokens_total", model="a", kind="prompt") == 7
+    assert registry.total("thoth_tokens_total", model="b") == 0
+
+def test_per_session_counters_keep_the_most_recent_sessions(monkeypatch):
+    monkeypatch.setattr(metrics_module, "MAX_TRACKED_SESSIONS", 2)
+    registry = MetricsRegistry()
+    registry.record_session("s1", tokens=10, requests=1)
+    registry.record_session("s2", tokens=5, requests=1, errors=1)
+    registry.record_session("s1", tokens=3, requests=1)
+    registry.record_session("s3", requests=1)
+    assert list(registry.sessions) == ["s1", "s3"]
+    assert registry.sessions["s1"] == {"tokens": 13, "requests": 2, "errors": 0}
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.describe("thoth_requests_total", "Provider calls.")
+    registry.inc("thoth_requests_total", model="a", status="ok")
+    registry.inc("thoth_requests_total", model='we"ird\\', status="ok")
+    registry.observe("thoth_request_duration_seconds", 0.3, model="a")
+    registry.record_session("s1", tokens=4, requests=1)
+    lines = registry.render_prometheus().splitlines()
+    assert lines[:4] == [
+        "# HELP thoth_requests_total Provider calls.",
+        "# TYPE thoth_requests_total counter",
+        'thoth_requests_total{model="a",status="ok"} 1',
+        'thoth_requests_total{model="we\\"ird\\\\",status="ok"} 1',
+    ]
+    assert "# TYPE thoth_request_duration_seconds histogram" in lines
+    assert 'thoth_request_duration_seconds_bucket{model="a",le="0.25"} 0' in lines
+    assert 'thoth_request_duration_seconds_bucket{model="a",le="0.5"} 1' in lines
+    assert 'thoth_request_duration_seconds_bucket{model="a",le="+Inf"} 1' in lines
+    assert 'thoth_request_duration_seconds_count{model="a"} 1' in lines
+    assert 'thoth_session_tokens_total{session="s1"} 4' in lines
+    assert 'thoth_session_errors_total{session="s1"} 0' in lines
+    # One TYPE line per metric, however many series it has
+    assert sum(line.startswith("# TYPE thoth_requests_total") for line in lines) == 1
+
+def test_model_summary():
+    registry = MetricsRegistry()
+    for status in ("ok", "ok", "error", "throttled"):
+        registry.inc("thoth_requests_total", model="a", status=status)
+    registry.inc("thoth_cache_hits_total", model="a")
+    registry.inc("thoth_tokens_total", 9, model="a", kind="completion", source="provider")
+    registry.observe("thoth_request_duration_seconds", 0.3, model="a")
+    [row] = registry.model_summary()
+    assert row["model"] == "a"
+    assert (row["requests"], row["errors"], row["throttled"], row["cache_hits"]) == (2, 1, 1, 1)
+    assert (row["prompt_tokens"], row["completion_tokens"], row["estimated_tokens"]) == (0, 9, 0)
+    assert row["p50"] == row["p95"] == 0.5
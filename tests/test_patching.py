@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from auto_coder.code_generator import CodeGenerator
+from auto_coder.patching import (PatchError, apply_replacements, error_lines, format_context, parse_replacements,
+                                 relevant_context, trim_error)
+from llm_chat.chat_handler import ChatHandler
+
+CODE = '''import os
+import sys
+
+LIMIT = 10
+
+class Store:
+    def __init__(self):
+        self.items = []
+
+    def add(self, item):
+        if len(self.items) >= LIMIT:
+            raise ValueError("full")
+        self.items.append(item)
+
+def main():
+    store = Store()
+    store.add(1)
+    print(store.items)
+
+main()
+'''
+
+TRACEBACK = '''Traceback (most recent call last):
+  File "/tmp/project/app.py", line 20, in <module>
+    main()
+  File "/tmp/project/app.py", line 17, in main
+    store.add(1)
+  File "/tmp/project/app.py", line 12, in add
+    raise ValueError("full")
+ValueError: full
+'''
+
+def block(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+def test_parse_replacements():
+    response = block("a = 1", "a = 2") + "\n\n" + block("b = 1", "")
+    assert parse_replacements(response) == [("a = 1", "a = 2"), ("b = 1", "")]
+
+def test_parse_replacements_without_blocks():
+    with pytest.raises(PatchError):
+        parse_replacements("Just rewrite the whole thing.")
+
+def test_apply_exact_replacements():
+    patched = apply_replacements(CODE, [("LIMIT = 10", "LIMIT = 20"), ("        self.items.append(item)", "        self.items.append(item)\n        return item")])
+    assert "LIMIT = 20" in patched
+    assert "        return item\n" in patched
+    assert patched.count("\n") == CODE.count("\n") + 1
+
+def test_apply_ignores_trailing_whitespace_in_search():
+    patched = apply_replacements(CODE, [("def main():   \n    store = Store()  ", "def main():\n    store = Store()\n    store.items.clear()")])
+    assert "    store.items.clear()\n" in patched
+    assert patched.endswith("main()\n")
+
+def test_ambiguous_search_is_rejected():
+    with pytest.raises(PatchError, match="matches 3 places"):
+        apply_replacements(CODE, [("self.items", "self.things")])
+
+def test_missing_search_is_rejected():
+    with pytest.raises(PatchError, match="not found"):
+        apply_replacements(CODE, [("LIMIT = 99", "LIMIT = 1")])
+
+def test_empty_search_is_rejected():
+    with pytest.raises(PatchError, match="Empty"):
+        apply_replacements(CODE, [("  \n", "import json")])
+
+def test_error_lines_of_the_file_only():
+    stderr = TRACEBACK.replace('  File "/tmp/project/app.py", line 17', '  File "/usr/lib/python3/other.py", line 99, in x\n    y\n  File "/tmp/project/app.py", line 17')
+    assert error_lines(stderr, "/tmp/project/app.py") == [20, 17, 12]
+
+def test_trim_error_keeps_the_last_traceback():
+    stderr = "Traceback (most recent call last):\n  first\nKeyError: 1\nlog line\n" + TRACEBACK
+    assert trim_error(stderr) == TRACEBACK.strip()
+
+def test_relevant_context_is_the_innermost_definitions_and_imports():
+    spans = relevant_context(CODE, [12, 17])
+    assert spans == [(1, 2, "imports"), (10, 13, "function Store.add"), (15, 18, "function main")]
+
+def test_module_level_error_shows_surrounding_lines():
+    spans = relevant_context(CODE, [20])
+    assert spans == [(1, 2, "imports"), (15, 20, "module code")]
+
+def test_format_context():
+    text = format_context(CODE, [(1, 2, "imports")])
+    assert text == "# Lines 1-2 (imports)\nimport os\nimport sys"
+
+def test_patch_code_applies_the_model_edits(tmp_path, fake_provider, monkeypatch):
+    prompts = []
+    reply_for = fake_provider.reply_for
+    monkeypatch.setattr(fake_provider, "reply_for", lambda messages, system_prompt=None: prompts.append(messages[-1]["content"]) or reply_for(messages, system_prompt))
+    file_path = tmp_path / "app.py"
+    file_path.write_text(CODE)
+    fake_provider.set_script([{"match": "AI code fixer", "response": block("LIMIT = 10", "LIMIT = 0") + "\n" + block("        if len(self.items) >= LIMIT:", "        if LIMIT and len(self.items) >= LIMIT:")}])
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    stderr = TRACEBACK.replace("/tmp/project/app.py", str(file_path))
+
+    patched = asyncio.run(generator.patch_code(CODE, stderr, str(file_path)))
+    assert "if LIMIT and len(self.items) >= LIMIT:" in patched
+    assert file_path.read_text() == patched
+    # Only the code around the traceback was sent, yet edits anywhere in the file apply
+    assert "def add(self, item):" in prompts[0]
+    assert "LIMIT = 10" not in prompts[0]
+    assert "LIMIT = 0" in patched
+
+def test_patch_code_gives_up_when_edits_do_not_apply(tmp_path, fake_provider):
+    file_path = tmp_path / "app.py"
+    file_path.write_text(CODE)
+    fake_provider.set_script([{"match": "AI code fixer", "response": block("no such line", "x = 1")}])
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    stderr = TRACEBACK.replace("/tmp/project/app.py", str(file_path))
+    assert asyncio.run(generator.patch_code(CODE, stderr, str(file_path))) is None
+    assert file_path.read_text() == CODE
+
+def test_patch_code_needs_a_traceback_into_the_file(tmp_path, fake_provider):
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    assert asyncio.run(generator.patch_code(CODE, "Killed", str(tmp_path / "app.py"))) is None
+    assert fake_provider.calls == 0
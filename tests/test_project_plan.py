@@ -0,0 +1,180 @@
+import asyncio
+import json
+import pytest
+from agents.project import ProjectBuilder
+from auto_coder.project_plan import MAX_PROJECT_FILES, ProjectPlanError, module_interface, parse_plan
+
+def plan_json(files, entry_point="main.py"):
+    return json.dumps({"entry_point": entry_point, "files": files})
+
+def entry(path, *depends_on, interface=""):
+    return {"path": path, "purpose": f"the {path} module", "interface": interface, "depends_on": list(depends_on)}
+
+def test_parse_plan_ignores_fences_and_prose():
+    text = "Here is the plan:\n```json\n" + plan_json([entry("models.py"), entry("main.py", "models.py")]) + "\n```"
+    plan = parse_plan(text)
+    assert list(plan.modules) == ["models.py", "main.py"]
+    assert plan.entry_point == "main.py"
+    assert plan.modules["models.py"].purpose == "the models.py module"
+
+def test_order_puts_dependencies_first():
+    plan = parse_plan(plan_json([
+        entry("main.py", "app/cli.py", "app/store.py"),
+        entry("app/cli.py", "app/store.py"),
+        entry("app/store.py", "app/models.py"),
+        entry("app/models.py"),
+        entry("app/utils.py"),
+    ]))
+    order = plan.order()
+    for path, module in plan.modules.items():
+        assert all(order.index(dep) < order.index(path) for dep in module.depends_on)
+    assert plan.longest_chain() == 4
+    assert plan.modules["app/cli.py"].module_name == "app.cli"
+
+def test_depends_on_keeps_only_project_files():
+    plan = parse_plan(plan_json([
+        entry("models.py", "models.py", "json", "dataclasses.py"),
+        entry("main.py", "./models.py", "models.py", "requests"),
+    ]))
+    assert plan.modules["models.py"].depends_on == []
+    assert plan.modules["main.py"].depends_on == ["models.py"]
+
+def test_cycles_are_rejected():
+    with pytest.raises(ProjectPlanError, match="dependency cycle between a.py, b.py"):
+        parse_plan(plan_json([entry("main.py", "a.py"), entry("a.py", "b.py"), entry("b.py", "a.py")]))
+
+@pytest.mark.parametrize("path, message", [
+    ("models.txt", "invalid file path"),
+    (None, "invalid file path"),
+    ("/etc/models.py", "cannot be imported"),
+    ("../models.py", "cannot be imported"),
+    ("my-models.py", "cannot be imported"),
+    ("app/2fast.py", "cannot be imported"),
+])
+def test_paths_must_be_importable(path, message):
+    with pytest.raises(ProjectPlanError, match=message):
+        parse_plan(plan_json([entry("main.py"), {"path": path}]))
+
+def test_backslashes_and_dots_are_normalized():
+    plan = parse_plan(plan_json([entry("app\\models.py"), entry("./main.py", "app/./models.py")]))
+    assert list(plan.modules) == ["app/models.py", "main.py"]
+    assert plan.modules["main.py"].depends_on == ["app/models.py"]
+
+@pytest.mark.parametrize("text, message", [
+    ("no plan here", "no JSON object"),
+    ("{not json}", "invalid JSON"),
+    ('{"entry_point": "main.py", "files": []}', "lists no files"),
+    (plan_json([entry("main.py"), entry("main.py")]), "listed twice"),
+    (plan_json([entry("main.py")], entry_point="app.py"), "entry point 'app.py'"),
+    (plan_json([dict(entry("main.py"), depends_on="models.py")]), "must be a list"),
+    (plan_json([entry(f"m{i}.py") for i in range(MAX_PROJECT_FILES)] + [entry("main.py")]), "at most"),
+])
+def test_invalid_plans_are_rejected(text, message):
+    with pytest.raises(ProjectPlanError, match=message):
+        parse_plan(text)
+
+MODULE = '''
+"""Storage."""
+import json
+
+VERSION = "1"
+_cache = {}
+
+def load(path: str) -> dict:
+    """Read a store from disk.
+
+    Longer explanation.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+def _helper():
+    pass
+
+@dataclass
+class Item:
+    name: str
+    count: int = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def total(self):
+        return self.count
+
+    def _private(self):
+        pass
+'''
+
+def test_module_interface_keeps_signatures_only():
+    assert module_interface(MODULE) == '''VERSION = "1"
+_cache = {}
+def load(path: str) -> dict:
+    """Read a store from disk."""
+@dataclass
+class Item:
+    name: str
+    count: int = 0
+    def __init__(self, name):
+        ...
+    def total(self):
+        ...'''
+
+def test_module_interface_of_broken_code_is_the_code():
+    assert module_interface("def broken(:\n") == "def broken(:\n"
+
+PLAN = plan_json([
+    entry("main.py", "models.py", interface="main() -> None"),
+    entry("models.py", interface="class Item"),
+])
+
+def test_invalid_plans_are_sent_back_with_the_error(agent_manager, fake_provider, monkeypatch):
+    prompts = []
+    reply_for = fake_provider.reply_for
+    monkeypatch.setattr(fake_provider, "reply_for", lambda messages, system_prompt=None: prompts.append(messages[-1]["content"]) or reply_for(messages, system_prompt))
+    cycle = plan_json([entry("main.py", "a.py"), entry("a.py", "main.py")])
+    fake_provider.set_script([{"match": "Plan the modules", "responses": [cycle, PLAN]}])
+
+    plan = asyncio.run(agent_manager.code_generator.plan_project("an inventory tool"))
+    assert list(plan.modules) == ["main.py", "models.py"]
+    assert len(prompts) == 2
+    assert "Your previous plan was rejected: dependency cycle between a.py, main.py" in prompts[1]
+
+def test_project_is_built_in_dependency_order(agent_manager, fake_provider, tmp_path, monkeypatch):
+    prompts = []
+    reply_for = fake_provider.reply_for
+    monkeypatch.setattr(fake_provider, "reply_for", lambda messages, system_prompt=None: prompts.append(messages[-1]["content"]) or reply_for(messages, system_prompt))
+    fake_provider.set_script([
+        {"match": "Write models.py", "response": "class Item:\n    def __init__(self, name):\n        self.name = name\n"},
+        {"match": "Write main.py", "response": "from models import Item\n\nif __name__ == '__main__':\n    print(Item('x').name)\n"},
+    ])
+    builder = ProjectBuilder(agent_manager, str(tmp_path))
+
+    async def build():
+        try:
+            return await builder.build("an inventory tool", parse_plan(PLAN))
+        finally:
+            await agent_manager.stop()
+
+    results = asyncio.run(build())
+    assert [(path, result.status) for path, result in results.items()] == [("models.py", "ok"), ("main.py", "ok")]
+    # main.py is written against the interface models.py actually has
+    assert "# models.py (import as models)\nclass Item:\n    def __init__(self, name):\n        ..." in prompts[-1]
+    assert (tmp_path / "models.py").read_text().startswith("class Item:")
+    assert (tmp_path / "main.py").exists()
+
+def test_dependents_of_a_failed_file_are_skipped(agent_manager, fake_provider, tmp_path):
+    fake_provider.set_script([{"match": "Write models.py", "response": ""}])
+    agent_manager.chat_handler.retry_base_delay = 0
+    builder = ProjectBuilder(agent_manager, str(tmp_path))
+
+    async def build():
+        try:
+            return await builder.build("an inventory tool", parse_plan(PLAN))
+        finally:
+            await agent_manager.stop()
+
+    results = asyncio.run(build())
+    assert results["models.py"].status == "failed"
+    assert results["main.py"].status == "skipped"
+    assert not (tmp_path / "main.py").exists()
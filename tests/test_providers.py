@@ -0,0 +1,164 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.providers import GeminiProvider, GroqProvider, ResponseBlocked, gemini_usage, to_gemini_contents
+from utils.metrics import metrics
+
+CONTENTS = [{"role": "user", "parts": ["How many tokens is this?"]}]
+
+def test_gemini_usage_reported_by_the_response():
+    metadata = SimpleNamespace(prompt_token_count=7, candidates_token_count=3, total_token_count=10)
+    usage = gemini_usage(SimpleNamespace(usage_metadata=metadata), CONTENTS, "Six.")
+    assert usage == {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+
+def test_gemini_usage_without_metadata_is_an_estimate():
+    for response in (SimpleNamespace(), SimpleNamespace(usage_metadata=None), None):
+        usage = gemini_usage(response, CONTENTS, "Six.")
+        assert usage["estimated"] is True
+        assert usage["prompt_tokens"] > 0
+        assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+def test_estimated_tokens_are_labelled_in_the_metrics(fake_provider, monkeypatch):
+    monkeypatch.setattr(metrics, "counters", {})
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    handler._record_call(0, {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7})
+    handler._record_call(0, {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4, "estimated": True})
+    assert metrics.counter("thoth_tokens_total", model="fake-model", kind="prompt", source="provider") == 5
+    assert metrics.counter("thoth_tokens_total", model="fake-model", kind="prompt", source="estimate") == 3
+    [row] = metrics.model_summary()
+    assert (row["prompt_tokens"], row["completion_tokens"], row["estimated_tokens"]) == (8, 3, 4)
+    assert 'thoth_tokens_total{kind="prompt",model="fake-model",source="estimate"} 3' in metrics.render_prometheus()
+
+@pytest.mark.parametrize("messages, system_prompt, contents", [
+    ([], None, []),
+    ([], "Be brief.", []),
+    (
+        [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}, {"role": "user", "content": "bye"}],
+        None,
+        [{"role": "user", "parts": ["hi"]}, {"role": "model", "parts": ["hello"]}, {"role": "user", "parts": ["bye"]}],
+    ),
+    # Gemini has no system role: system text goes in front of the latest turn, the system prompt first
+    (
+        [{"role": "system", "content": "Earlier summary."}, {"role": "user", "content": "hi"}],
+        "Be brief.",
+        [{"role": "user", "parts": ["Be brief.\n\nEarlier summary.\n\nhi"]}],
+    ),
+    (
+        [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}, {"role": "user", "content": "again"}],
+        "Be brief.",
+        [{"role": "user", "parts": ["hi"]}, {"role": "model", "parts": ["hello"]}, {"role": "user", "parts": ["Be brief.\n\nagain"]}],
+    ),
+])
+def test_to_gemini_contents(messages, system_prompt, contents):
+    assert to_gemini_contents(messages, system_prompt) == contents
+
+def test_to_gemini_contents_leaves_the_messages_alone():
+    messages = [{"role": "user", "content": "hi"}]
+    to_gemini_contents(messages, "Be brief.")
+    assert messages == [{"role": "user", "content": "hi"}]
+
+class FakeGeminiModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requests = []
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        self.requests.append((contents, kwargs))
+        if not stream:
+            return self.chunks[0]
+        return self._stream()
+
+    async def _stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+def gemini_chunk(text=None, usage=None, block_reason=None):
+    return SimpleNamespace(
+        parts=[text] if text else [], text=text,
+        usage_metadata=SimpleNamespace(prompt_token_count=usage[0], candidates_token_count=usage[1],
+                                       total_token_count=sum(usage)) if usage else None,
+        prompt_feedback=SimpleNamespace(block_reason=block_reason),
+    )
+
+def gemini_provider(model):
+    provider = GeminiProvider.__new__(GeminiProvider)
+    provider.models = {"gemini-test": model}
+    return provider
+
+def test_gemini_stream_reads_usage_from_the_final_chunk():
+    model = FakeGeminiModel([gemini_chunk("Hel"), gemini_chunk(), gemini_chunk("lo", usage=(4, 2))])
+    provider = gemini_provider(model)
+
+    async def main():
+        return [chunk async for chunk in provider.stream("gemini-test", [{"role": "user", "content": "hi"}], max_tokens=50)]
+
+    chunks = asyncio.run(main())
+    assert chunks == [("Hel", None), ("lo", None), (None, {"prompt_tokens": 4, "completion_tokens": 2, "total_tokens": 6})]
+    assert model.requests[0][1]["generation_config"] == {"max_output_tokens": 50}
+
+def test_gemini_complete():
+    provider = gemini_provider(FakeGeminiModel([gemini_chunk("Hello", usage=(4, 1))]))
+    text, usage = asyncio.run(provider.complete("gemini-test", [{"role": "user", "content": "hi"}]))
+    assert (text, usage["total_tokens"]) == ("Hello", 5)
+
+def test_gemini_blocked_response():
+    provider = gemini_provider(FakeGeminiModel([gemini_chunk(block_reason="SAFETY")]))
+    with pytest.raises(ResponseBlocked, match="SAFETY"):
+        asyncio.run(provider.complete("gemini-test", [{"role": "user", "content": "hi"}]))
+
+def groq_chunk(content=None, usage=None):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else [],
+        x_groq=SimpleNamespace(usage=SimpleNamespace(prompt_tokens=usage[0], completion_tokens=usage[1],
+                                                     total_tokens=sum(usage))) if usage else None,
+    )
+
+class FakeGroqCompletions:
+    """Stands in for `client.chat.completions.with_raw_response`."""
+
+    def __init__(self, result, headers):
+        self.result = result
+        self.headers = headers
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(headers=self.headers, parse=lambda: self.result)
+
+def groq_provider(result, headers=None):
+    provider = GroqProvider("test-key")
+    completions = FakeGroqCompletions(result, headers or {})
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=completions)))
+    return provider, completions
+
+def test_groq_stream_parsing():
+    async def chunks():
+        for chunk in (groq_chunk("Hel"), groq_chunk("lo"), groq_chunk(), groq_chunk("", usage=(9, 2))):
+            yield chunk
+
+    provider, completions = groq_provider(chunks(), {"x-ratelimit-remaining-tokens": "100"})
+    headers = []
+
+    async def main():
+        stream = provider.stream("llama", [{"role": "user", "content": "hi"}], "Be brief.", on_headers=headers.append)
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(main()) == [
+        ("Hel", None), ("lo", None), (None, None), ("", {"prompt_tokens": 9, "completion_tokens": 2, "total_tokens": 11}),
+    ]
+    assert headers == [{"x-ratelimit-remaining-tokens": "100"}]
+    request = completions.requests[0]
+    assert request["stream"] is True
+    assert request["messages"] == [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "hi"}]
+
+def test_groq_complete():
+    completion = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="Hello"))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1, total_tokens=4),
+    )
+    provider, completions = groq_provider(completion)
+    text, usage = asyncio.run(provider.complete("llama", [{"role": "user", "content": "hi"}], max_tokens=10))
+    assert (text, usage) == ("Hello", {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4})
+    assert completions.requests[0]["max_tokens"] == 10
+    assert completions.requests[0]["messages"] == [{"role": "user", "content": "hi"}]
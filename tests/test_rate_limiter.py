@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from llm_chat import rate_limiter
+from llm_chat.rate_limiter import AdaptiveConcurrency, RateLimiter, TokenBucket, parse_duration
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+@pytest.mark.parametrize("value, seconds", [("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600), ("3", 3.0)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_duration_without_a_duration(value):
+    assert parse_duration(value) is None
+
+def test_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60)  # one per second, 60 at most
+    assert bucket.delay_for(60) == 0
+    bucket.consume(60)
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.delay_for(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.delay_for(1) == 0
+
+def test_bucket_never_overfills(clock):
+    bucket = TokenBucket(60)
+    clock.now += 3600
+    bucket.consume(60)
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+
+def test_request_larger_than_the_bucket_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(30)
+    assert bucket.delay_for(1000) == pytest.approx(30.0)
+
+def test_usage_over_the_estimate_is_paid_off_by_later_requests(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(70)
+    assert bucket.delay_for(1) == pytest.approx(11.0)
+
+def test_pause_and_server_reported_remaining(clock):
+    bucket = TokenBucket(60)
+    bucket.pause(5)
+    assert bucket.delay_for(1) == pytest.approx(5.0)
+    clock.now += 5
+    bucket.limit_to(10)
+    assert bucket.delay_for(10) == 0
+    assert bucket.delay_for(11) == pytest.approx(1.0)
+
+def test_concurrency_grows_additively_while_saturated(clock):
+    concurrency = AdaptiveConcurrency(initial=4, maximum=5)
+    concurrency.on_success()
+    assert concurrency.limit == 4  # not saturated: no growth
+    concurrency.in_flight = 4
+    for _ in range(4):
+        concurrency.on_success()
+    assert concurrency.limit == pytest.approx(5.0, abs=0.1)
+    for _ in range(20):
+        concurrency.on_success()
+    assert concurrency.limit == 5
+
+def test_concurrency_halves_once_per_burst_of_throttling(clock):
+    concurrency = AdaptiveConcurrency(initial=8, minimum=1, decrease_interval=1.0)
+    concurrency.on_throttle()
+    concurrency.on_throttle()
+    assert concurrency.limit == 4
+    clock.now += 1
+    concurrency.on_throttle()
+    assert concurrency.limit == 2
+    for _ in range(5):
+        clock.now += 1
+        concurrency.on_throttle()
+    assert concurrency.limit == 1
+
+def test_acquire_blocks_at_the_limit():
+    async def run():
+        concurrency = AdaptiveConcurrency(initial=2)
+        await concurrency.acquire()
+        await concurrency.acquire()
+        third = asyncio.create_task(concurrency.acquire())
+        await asyncio.sleep(0.01)
+        blocked = not third.done()
+        await concurrency.release()
+        await asyncio.wait_for(third, 1)
+        return blocked, concurrency.in_flight
+
+    assert asyncio.run(run()) == (True, 2)
+
+def test_limiter_throttle_and_headers(clock):
+    limiter = RateLimiter(60, 6000)
+    limiter.on_throttle(retry_after=3)
+    assert limiter.requests.delay_for(1) == pytest.approx(3.0)
+    assert limiter.tokens.delay_for(1) == pytest.approx(3.0)
+    clock.now += 3
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "7.5s"})
+    assert limiter.tokens.delay_for(1) == pytest.approx(7.5)
+    limiter.update_from_headers({"retry-after": "2"})
+    assert limiter.requests.delay_for(1) == pytest.approx(2.0)
+
+def test_permit_accounts_for_actual_usage():
+    async def run():
+        limiter = RateLimiter(600, 6000)
+        async with limiter.request(100) as permit:
+            permit.record_usage({"total_tokens": 1100})
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.tokens.tokens == pytest.approx(6000 - 1100, abs=5)
+    assert limiter.concurrency.in_flight == 0
+
+def test_limit_headers_set_the_token_capacity(clock):
+    limiter = RateLimiter(30, 6000)
+    limiter.tokens.consume(5000)
+    limiter.update_from_headers({"x-ratelimit-limit-tokens": "60000", "x-ratelimit-limit-requests": "14400"})
+    assert limiter.tokens.capacity == 60000
+    assert limiter.tokens.rate == pytest.approx(1000)
+    # The extra capacity is usable at once; the daily request limit is not a per-minute one
+    assert limiter.tokens.tokens == pytest.approx(55000)
+    assert limiter.requests.capacity == 30
+    limiter.update_from_headers({"x-ratelimit-limit-tokens": "60000", "x-ratelimit-remaining-tokens": "20000"})
+    assert limiter.tokens.tokens == pytest.approx(20000)
+
+def test_exhausted_requests_wait_for_the_reset(clock):
+    limiter = RateLimiter(30, 6000)
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "5", "x-ratelimit-reset-requests": "1m"})
+    assert limiter.requests.delay_for(1) == 0
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2m59.56s"})
+    assert limiter.requests.delay_for(1) == pytest.approx(179.56)
+
+@pytest.mark.parametrize("setting, limits", [
+    ("", (30, 6000)),
+    ("llama-3.1-70b-versatile=1000:300000", (1000, 300000)),
+    ("groq=100:,llama-3.1-8b-instant=5:5", (100, 6000)),
+    (" llama-3.1-70b-versatile = :90000 ", (30, 90000)),
+])
+def test_limits_can_be_overridden(monkeypatch, setting, limits):
+    monkeypatch.setenv("THOTH_RATE_LIMITS", setting)
+    limiter = rate_limiter.get_rate_limiter("groq", "llama-3.1-70b-versatile")
+    assert (limiter.requests.capacity, limiter.tokens.capacity) == limits
+
+def test_overridden_token_limits_ignore_the_headers(monkeypatch):
+    monkeypatch.setenv("THOTH_RATE_LIMITS", "groq=:9000")
+    limiter = rate_limiter.get_rate_limiter("groq", "llama-3.1-70b-versatile")
+    limiter.update_from_headers({"x-ratelimit-limit-tokens": "60000"})
+    assert limiter.tokens.capacity == 9000
+
+@pytest.mark.parametrize("setting", ["groq", "groq=fast:1", "=1:1", "groq=0:1"])
+def test_invalid_overrides_are_rejected(monkeypatch, setting):
+    monkeypatch.setenv("THOTH_RATE_LIMITS", setting)
+    with pytest.raises(ValueError, match="THOTH_RATE_LIMITS"):
+        rate_limiter.configured_rate_limits()
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.response_cache import ResponseCache
+
+def test_key_covers_model_prompt_messages_and_config():
+    messages = [{"role": "user", "content": "hi"}]
+    key = ResponseCache.make_key("m", "sys", messages, {"temperature": 0.2})
+    assert key == ResponseCache.make_key("m", "sys", [{"content": "hi", "role": "user"}], {"temperature": 0.2})
+    assert key != ResponseCache.make_key("other", "sys", messages, {"temperature": 0.2})
+    assert key != ResponseCache.make_key("m", "other", messages, {"temperature": 0.2})
+    assert key != ResponseCache.make_key("m", "sys", [{"role": "user", "content": "bye"}], {"temperature": 0.2})
+    assert key != ResponseCache.make_key("m", "sys", messages, {"temperature": 0.7})
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get("k") is None
+    cache.put("k", "response", {"total_tokens": 3})
+    assert cache.get("k") == ("response", {"total_tokens": 3})
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.put("k", "response")
+    cache._conn.execute("UPDATE responses SET created = ?", (time.time() - 120,))
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache._conn.execute("UPDATE responses SET accessed = accessed - 10 WHERE key = 'a'")
+    cache.get("a")
+    cache._conn.execute("UPDATE responses SET accessed = accessed - 5 WHERE key = 'b'")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == ("1", None)
+    assert cache.get("c") == ("3", None)
+
+def test_chat_handler_serves_repeated_requests_from_the_cache(tmp_path, fake_provider):
+    handler = ChatHandler("fake-model", cache=ResponseCache(str(tmp_path / "cache.sqlite")), session_store=False)
+    messages = [{"role": "user", "content": "same question"}]
+
+    async def ask(**kwargs):
+        text, _ = await handler.complete(messages, "system", **kwargs)
+        return text
+
+    first = asyncio.run(ask())
+    assert asyncio.run(ask()) == first
+    assert fake_provider.calls == 1
+    asyncio.run(ask(bypass_cache=True))
+    assert fake_provider.calls == 2
@@ -0,0 +1,103 @@
+import asyncio
+from auto_coder.code_generator import CodeGenerator
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.history import ConversationHistory, RECALL_PREFIX
+from llm_chat.retrieval import BM25Index, tokenize
+from llm_chat.session_store import SessionStore
+from llm_chat.tokens import count_message_tokens
+
+def test_tokenize_splits_identifiers_and_drops_stopwords():
+    assert tokenize("The HTTPServer is parsing snake_case and camelCase 42 times") == [
+        "http", "server", "parsing", "snake", "case", "camel", "case", "42", "times"
+    ]
+    assert tokenize(None) == []
+
+def test_search_ranks_by_relevance():
+    index = BM25Index()
+    index.add(1, "the database connection pool")
+    index.add(2, "rendering the login page template")
+    index.add(3, "database migrations and database backups")
+    hits = index.search("database backups")
+    assert [doc_id for _, doc_id in hits] == [3, 1]
+    assert hits[0][0] > hits[1][0]
+    assert index.search("unrelated words") == []
+
+def test_search_filters_and_limits():
+    index = BM25Index()
+    for doc_id in range(5):
+        index.add(doc_id, f"parser error number {doc_id}")
+    assert len(index.search("parser", limit=2)) == 2
+    assert {doc_id for _, doc_id in index.search("parser", accept=lambda doc_id: doc_id % 2 == 0)} == {0, 2, 4}
+    assert index.search("parser", min_score=100) == []
+
+def test_terms_in_most_documents_are_skipped_in_large_indexes():
+    index = BM25Index()
+    for doc_id in range(20):
+        index.add(doc_id, "common words" if doc_id else "common words and a rare term")
+    assert index.search("common") == []
+    assert [doc_id for _, doc_id in index.search("common rare")] == [0]
+
+def test_add_replaces_and_remove_forgets():
+    index = BM25Index()
+    index.add("a", "apples")
+    index.add("a", "oranges")
+    assert len(index) == 1
+    assert index.search("apples") == []
+    assert [doc_id for _, doc_id in index.search("oranges")] == ["a"]
+    index.remove("a")
+    index.remove("missing")
+    assert "a" not in index
+    assert index.postings == {} and index.total_length == 0
+
+def filler(index):
+    return " ".join(f"filler{index}x{n}" for n in range(20))
+
+def recalled_history(store=None):
+    budget = count_message_tokens({"content": filler(0)}) * 8
+
+    async def summarize(previous, messages):
+        return "summary"
+
+    history = ConversationHistory("fake-model", token_budget=budget, summarize=summarize, recall_share=0.5,
+                                  store=store, session_id="s" if store else None)
+    history.append("user", "my deploy password is kept in vault under ops/deploy")
+    history.append("assistant", "noted")
+    for index in range(2, 20):
+        history.append("user" if index % 2 == 0 else "assistant", filler(index))
+    return history
+
+def test_folded_turns_matching_the_message_are_recalled():
+    history = recalled_history()
+    messages = asyncio.run(history.prompt_messages("where is the deploy password?"))
+    assert history.window_start > 0
+    assert messages[1] == {"role": "system", "content": RECALL_PREFIX + "user: my deploy password is kept in vault under ops/deploy"}
+    assert messages[-1] == {"role": "user", "content": "where is the deploy password?"}
+
+def test_unrelated_messages_recall_nothing():
+    history = recalled_history()
+    messages = asyncio.run(history.prompt_messages("something else entirely"))
+    assert not any(m["content"].startswith(RECALL_PREFIX) for m in messages)
+
+def test_recall_reads_turns_only_left_in_the_store(tmp_path):
+    history = recalled_history(SessionStore(str(tmp_path / "sessions.sqlite")))
+    asyncio.run(history.prompt_messages("something else entirely"))
+    assert history.offset > 0
+    assert history.recall("deploy password", 1000) == [("user", "my deploy password is kept in vault under ops/deploy")]
+    assert history.recall("deploy password", 5) == []
+
+def test_generated_files_are_offered_as_related_code(fake_provider, tmp_path):
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    models = tmp_path / "models.py"
+    models.write_text("class InvoiceRecord:\n    total = 0\n")
+    generator.remember_file(str(models), models.read_text())
+    generator.remember_file(str(tmp_path / "gone.py"), "class InvoiceRecord:\n    total = 1\n")
+    generator.remember_file(str(tmp_path / "other" / "invoice.py"), "class InvoiceRecord: pass\n")
+    generator.remember_file(str(tmp_path / "cli.py"), "import argparse\nparser = argparse.ArgumentParser()\n")
+    generator.remember_file(str(tmp_path / "utils.py"), "def slugify(text): return text.lower()\n")
+
+    related = generator._related_code("sum every InvoiceRecord total", str(tmp_path / "report.py"))
+    assert related == "Related files already in the project:\n\n# models.py\nclass InvoiceRecord:\n    total = 0\n"
+    # Files that no longer exist are dropped from the index
+    assert str(tmp_path / "gone.py") not in generator.code_index
+    # The file being written is never offered as related to itself
+    assert generator._related_code("InvoiceRecord total", str(models)) is None
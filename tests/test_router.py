@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.router import ModelRouter, RouteStats, is_confident
+from utils.metrics import metrics
+
+@pytest.fixture
+def replies(fake_provider, monkeypatch):
+    """Per-model replies (an exception to fail) served by the fake provider; `calls` lists the models asked."""
+    replies = {"calls": []}
+    monkeypatch.setattr(ChatHandler, "retry_base_delay", 0)
+
+    def reply(model_id):
+        replies["calls"].append(model_id)
+        reply = replies[model_id]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    async def complete(model_id, messages, system_prompt=None, **config):
+        return reply(model_id), {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+    async def stream(model_id, messages, system_prompt=None, **config):
+        for word in reply(model_id).split(" "):
+            yield word + " ", None
+        yield None, {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+    monkeypatch.setattr(fake_provider, "complete", complete)
+    monkeypatch.setattr(fake_provider, "stream", stream)
+    return replies
+
+@pytest.fixture
+def handler(replies):
+    handler = ChatHandler("fake-model", cache=False, session_store=False)
+    handler.router = ModelRouter(fast_model="fake-fast", explore_rate=0, seed=0)
+    return handler
+
+def complete(handler, check=is_confident, cheap=True):
+    messages = [{"role": "user", "content": "hello"}]
+    return asyncio.run(handler.router.complete_routed("chat", handler, messages, cheap=cheap, check=check, coalesce=False))
+
+def stats(router, model_id, attempts, successes, latency):
+    route = router.route_stats(model_id, "chat")
+    route.attempts, route.successes, route.latency = attempts, successes, latency
+
+def test_untried_fast_model_goes_first_for_cheap_requests():
+    router = ModelRouter(fast_model="fast", explore_rate=0)
+    assert router.choose("chat", "primary") == "fast"
+    assert router.choose("chat", "primary", cheap=False) == "primary"
+    assert router.choose("chat", "fast") == "fast"
+
+@pytest.mark.parametrize("fast, primary, chosen", [
+    # 0.2s + escalating 1 in 10 beats 2s on the primary
+    ((10, 9, 0.2), (10, 10, 2.0), "fast"),
+    # Escalating most answers costs more than it saves
+    ((10, 1, 1.0), (10, 10, 2.0), "primary"),
+    # Fast but no faster than the primary
+    ((10, 10, 2.0), (10, 10, 2.0), "primary"),
+])
+def test_choice_follows_expected_latency(fast, primary, chosen):
+    router = ModelRouter(fast_model="fast", explore_rate=0)
+    stats(router, "fast", *fast)
+    stats(router, "primary", *primary)
+    assert router.choose("chat", "primary") == chosen
+
+def test_exploration_still_tries_a_losing_fast_model():
+    router = ModelRouter(fast_model="fast", explore_rate=1.0)
+    stats(router, "fast", 10, 0, 5.0)
+    stats(router, "primary", 10, 10, 1.0)
+    assert router.choose("chat", "primary") == "fast"
+
+def test_confident_fast_answer_is_used(handler, replies):
+    replies.update({"fake-fast": "Paris.", "fake-model": "Paris, France."})
+    assert complete(handler)[::2] == ("Paris.", "fake-fast")
+    assert replies["calls"] == ["fake-fast"]
+    assert handler.router.route_stats("fake-fast", "chat").successes == 1
+
+def test_unsure_fast_answer_escalates(handler, replies):
+    replies.update({"fake-fast": "I'm not sure, sorry.", "fake-model": "Paris."})
+    escalations = metrics.counter("thoth_escalations_total", model="fake-fast", kind="chat")
+    assert complete(handler)[::2] == ("Paris.", "fake-model")
+    assert replies["calls"] == ["fake-fast", "fake-model"]
+    assert metrics.counter("thoth_escalations_total", model="fake-fast", kind="chat") == escalations + 1
+    fast, primary = handler.router.route_stats("fake-fast", "chat"), handler.router.route_stats("fake-model", "chat")
+    assert (fast.attempts, fast.successes) == (1, 0)
+    assert (primary.attempts, primary.successes) == (1, 1)
+
+def test_failed_fast_call_escalates(handler, replies):
+    replies.update({"fake-fast": RuntimeError("down"), "fake-model": "Paris."})
+    assert complete(handler, check=None)[::2] == ("Paris.", "fake-model")
+    assert replies["calls"][-1] == "fake-model"
+
+def test_expensive_requests_skip_the_fast_model(handler, replies):
+    replies.update({"fake-fast": "Paris.", "fake-model": "Paris, France."})
+    assert complete(handler, cheap=False)[0] == "Paris, France."
+    assert replies["calls"] == ["fake-model"]
+
+def test_retraction_takes_back_a_success():
+    route = RouteStats()
+    route.record(True, 1.0)
+    route.record(True, 1.0)
+    route.retract()
+    assert (route.attempts, route.successes) == (2, 1)
+    route.retract()
+    route.retract()
+    assert route.successes == 0
+
+def test_router_retract_counts_the_retraction():
+    router = ModelRouter(fast_model="fast")
+    router.record("fast", "improve_code", True, 0.5)
+    retracted = metrics.counter("thoth_routed_requests_total", model="fast", kind="improve_code", outcome="retracted")
+    router.retract("fast", "improve_code")
+    assert router.route_stats("fast", "improve_code").successes == 0
+    assert metrics.counter("thoth_routed_requests_total", model="fast", kind="improve_code", outcome="retracted") == retracted + 1
+
+def stream_message(handler, message="hello"):
+    async def main():
+        stream = handler.stream_message(message, coalesce=False)
+        return await stream.collect()
+    return asyncio.run(main())[0]
+
+def test_fast_stream_is_shown_and_added_to_the_conversation(handler, replies):
+    replies.update({"fake-fast": "Hi there", "fake-model": "Hello"})
+    assert stream_message(handler).strip() == "Hi there"
+    assert replies["calls"] == ["fake-fast"]
+    assert handler.history.messages[-1]["content"].strip() == "Hi there"
+
+def test_unsure_fast_stream_counts_against_the_fast_model(handler, replies):
+    replies.update({"fake-fast": "I don't know", "fake-model": "Hello"})
+    # Text already shown is kept, but the answer is not counted as a success
+    assert stream_message(handler).strip() == "I don't know"
+    route = handler.router.route_stats("fake-fast", "chat")
+    assert (route.attempts, route.successes) == (1, 0)
+
+def test_fast_stream_failing_before_text_escalates(handler, replies):
+    replies.update({"fake-fast": RuntimeError("down"), "fake-model": "Hello"})
+    assert stream_message(handler).strip() == "Hello"
+    assert replies["calls"][-1] == "fake-model"
+    assert handler.router.route_stats("fake-model", "chat").successes == 1
@@ -0,0 +1,136 @@
+import asyncio
+import time
+import pytest
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.history import ConversationHistory
+from llm_chat.session_store import SessionStore, SessionPool, get_session_store
+from llm_chat.tokens import count_message_tokens
+
+def turn_text(index, words=20):
+    return " ".join(f"word{index}x{n}" for n in range(words))
+
+def prompt(history, message="next question"):
+    return asyncio.run(history.prompt_messages(message))
+
+async def summarize(previous, messages):
+    return f"summary of {len(messages)} messages"
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite"))
+
+def test_append_and_load(store):
+    assert store.load("s") is None
+    assert not store.exists("s")
+    store.append("s", "fake-model", 0, "user", "hello", 3)
+    store.append("s", "fake-model", 1, "assistant", "hi", 2)
+    state = store.load("s")
+    assert state["model_id"] == "fake-model"
+    assert state["summary"] is None
+    assert state["window_start"] == 0
+    assert state["messages"] == [("user", "hello", 3), ("assistant", "hi", 2)]
+    assert store.stats() == {"sessions": 1, "messages": 2}
+
+def test_load_only_reads_the_window(store):
+    for seq in range(6):
+        store.append("s", "fake-model", seq, "user", f"message {seq}", 3)
+    store.save_summary("s", "summary", 1, 4)
+    state = store.load("s")
+    assert (state["summary"], state["summary_tokens"], state["window_start"]) == ("summary", 1, 4)
+    assert [content for _, content, _ in state["messages"]] == ["message 4", "message 5"]
+    # The whole transcript is still there for callers that need it
+    assert [content for _, content in store.messages("s")] == [f"message {seq}" for seq in range(6)]
+    assert store.messages("s", 1, 3) == [("user", "message 1"), ("user", "message 2")]
+    assert store.messages_at("s", [0, 5]) == {0: ("user", "message 0"), 5: ("user", "message 5")}
+
+def test_reset_and_delete(store):
+    store.append("s", "fake-model", 0, "user", "hello", 3)
+    store.save_summary("s", "summary", 1, 1)
+    store.reset("s")
+    assert store.load("s") == {"model_id": "fake-model", "summary": None, "summary_tokens": 0,
+                               "window_start": 0, "messages": []}
+    store.delete("s")
+    assert not store.exists("s")
+
+def test_can_be_disabled(monkeypatch, tmp_path):
+    assert get_session_store() is None
+    monkeypatch.setenv("THOTH_SESSION_STORE", "1")
+    monkeypatch.setenv("THOTH_SESSION_STORE_PATH", str(tmp_path / "sessions.sqlite"))
+    monkeypatch.setattr("llm_chat.session_store._session_store", None)
+    assert isinstance(get_session_store(), SessionStore)
+
+def compacted_history(store, turns=20):
+    budget = count_message_tokens({"content": turn_text(0)}) * 8
+    history = ConversationHistory("fake-model", token_budget=budget, summarize=summarize, store=store, session_id="s")
+    for index in range(turns):
+        history.append("user" if index % 2 == 0 else "assistant", turn_text(index))
+    prompt(history)
+    return history
+
+def test_folded_turns_leave_memory_but_stay_in_the_store(store):
+    history = compacted_history(store)
+    assert history.offset == history.window_start > 0
+    assert len(history._turns) == 20 - history.offset
+    assert len(history) == 20
+    assert [m["content"] for m in history.messages] == [turn_text(i) for i in range(20)]
+    assert store.load("s")["window_start"] == history.window_start
+
+def test_appends_after_compaction_use_conversation_indices(store):
+    history = compacted_history(store)
+    history.append("user", "later")
+    assert store.messages_at("s", [20]) == {20: ("user", "later")}
+
+def test_resume_rebuilds_the_window(store):
+    history = compacted_history(store)
+    expected = prompt(history)
+
+    resumed = ConversationHistory("fake-model", token_budget=history.token_budget, store=store, session_id="s")
+    assert resumed.summary == history.summary
+    assert (resumed.offset, resumed.window_start, len(resumed)) == (history.offset, history.window_start, 20)
+    assert prompt(resumed) == expected
+
+def test_reset_clears_the_stored_session(store):
+    history = compacted_history(store)
+    history.reset()
+    assert store.load("s")["messages"] == []
+    resumed = ConversationHistory("fake-model", store=store, session_id="s")
+    assert len(resumed) == 0 and resumed.summary is None
+
+def test_chat_sessions_resume_by_id(fake_provider, store):
+    fake_provider.set_script([{"match": "", "response": "noted"}])
+    handler = ChatHandler("fake-model", cache=False, session_store=store)
+    session = handler.new_session("abc")
+    asyncio.run(session.send_message("remember the number 42"))
+
+    resumed = handler.new_session("abc")
+    assert resumed.conversation_history == [
+        {"role": "user", "content": "remember the number 42"},
+        {"role": "assistant", "content": "noted"},
+    ]
+    assert handler.new_session().conversation_history == []
+
+def test_pool_reuses_live_sessions(fake_provider):
+    pool = SessionPool(ChatHandler("fake-model", cache=False, session_store=False))
+    first = pool.acquire()
+    assert pool.acquire(first.session_id) is first
+    # An unknown id starts a new session under that id
+    assert pool.acquire("new-id").session_id == "new-id"
+    assert len(pool) == 2
+
+def test_pool_evicts_idle_and_excess_sessions(fake_provider):
+    pool = SessionPool(ChatHandler("fake-model", cache=False, session_store=False), idle_seconds=60, max_live=2)
+    sessions = [pool.acquire(f"s{i}") for i in range(3)]
+    # Sessions in use are never evicted
+    pool.evict_idle()
+    assert len(pool) == 3
+
+    for session in sessions:
+        pool.release(session)
+    pool.evict_idle()
+    assert len(pool) == 2
+    assert pool.acquire("s2") is sessions[2]
+    pool.release(sessions[2])
+
+    pool._live["s1"][2] = time.monotonic() - 120
+    pool.evict_idle()
+    assert list(pool._live) == ["s2"]
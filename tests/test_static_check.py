@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+from auto_coder.executor import CodeExecutor
+from auto_coder.static_check import Diagnostic, analyze, check_file, format_diagnostics, imported_modules, static_check_enabled
+
+def messages(code, **kwargs):
+    return [str(diagnostic) for diagnostic in analyze(code, **kwargs)]
+
+def test_syntax_errors():
+    [message] = messages("x = 1\ndef f(:\n    pass\n")
+    assert message.startswith("line 2: SyntaxError: ")
+
+def test_undefined_names_with_suggestions():
+    code = "VALUES = [1, 2]\n\ndef total():\n    return sum(VALEUS)\n\nprint(totl())\nprint(totl())\n"
+    assert messages(code) == [
+        "line 4: NameError: name 'VALEUS' is not defined (did you mean 'VALUES'?)",
+        "line 6: NameError: name 'totl' is not defined (did you mean 'total'?)",
+    ]
+
+def test_missing_modules(tmp_path):
+    (tmp_path / "helpers.py").write_text("")
+    (tmp_path / "pkg").mkdir()
+    code = "import os\nimport no_such_package.sub\nfrom helpers import x\nfrom pkg import y\nfrom . import z\n"
+    assert messages(code, project_path=str(tmp_path)) == ["line 2: ModuleNotFoundError: No module named 'no_such_package'"]
+    assert messages("import no_such_package\n", check_imports=False) == []
+
+def test_imports_are_resolved_by_the_executors_interpreter(tmp_path):
+    (tmp_path / "helpers.py").write_text("")
+    script = tmp_path / "main.py"
+    # llm_chat is importable here, from the bot's own directory, but not from the project
+    script.write_text("import os\nimport helpers\nimport llm_chat.clients\nimport no_such_package\n")
+    assert imported_modules(script.read_text(), str(tmp_path)) == ["os", "llm_chat", "no_such_package"]
+    diagnostics = asyncio.run(check_file(str(script), str(tmp_path), executor=CodeExecutor(run_cache=False)))
+    assert [str(d) for d in diagnostics] == [
+        "line 3: ModuleNotFoundError: No module named 'llm_chat'",
+        "line 4: ModuleNotFoundError: No module named 'no_such_package'",
+    ]
+
+def test_optional_imports_are_left_alone():
+    code = "try:\n    import no_such_package\nexcept ImportError:\n    no_such_package = None\n"
+    assert messages(code) == []
+
+def test_attribute_typos_on_local_classes():
+    code = (
+        "class Counter:\n"
+        "    def __init__(self):\n"
+        "        self.count = 0\n"
+        "    def bump(self):\n"
+        "        self.cuont += 1\n"
+        "counter = Counter()\n"
+        "counter.bump()\n"
+        "print(counter.totl)\n"
+    )
+    assert messages(code) == [
+        "line 5: AttributeError: 'Counter' object has no attribute 'cuont' (did you mean 'count'?)",
+        "line 8: AttributeError: 'Counter' object has no attribute 'totl'",
+    ]
+
+VALID = '''
+from __future__ import annotations
+import sys
+import builtins
+from dataclasses import dataclass
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+if sys.version_info < (3, 8):
+    from typing_extensions import Protocol
+else:
+    from typing import Protocol
+
+builtins.debug_hook = print
+COUNTER = 0
+
+def bump() -> Missing:
+    global COUNTER, LATER
+    COUNTER += 1
+    LATER = COUNTER
+    debug_hook(LATER)
+
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+
+    @property
+    def norm(self):
+        return (self.x ** 2 + self.y ** 2) ** 0.5
+
+class Base:
+    def describe(self):
+        # Only subclasses define label
+        return self.label
+
+class Named(Base):
+    label = "named"
+
+class Dynamic:
+    def __getattr__(self, name):
+        return name
+
+class Plugin(Exception):
+    pass
+
+def main():
+    squares = [n * n for n in range(3)]
+    lookup = {n: (lambda value: value + n) for n in squares}
+    point = Point(1)
+    point.z = 3
+    plugin = Plugin()
+    print(point.norm, point.z, Named().describe(), Dynamic().anything, LATER, lookup, plugin.args)
+    match point:
+        case Point(x=0):
+            pass
+
+if __name__ == "__main__":
+    bump()
+    main()
+'''
+
+def test_valid_code_has_no_false_positives():
+    assert messages(VALID) == []
+
+def test_dynamic_namespaces_are_not_checked():
+    assert messages("from os.path import *\nprint(join, undefined_name)\n") == []
+    assert messages("globals()['value'] = 1\nprint(value)\n") == []
+
+def test_diagnostics_are_capped():
+    code = "\n".join(f"print(name{i})" for i in range(20))
+    assert len(analyze(code)) == 10
+
+def test_format_diagnostics():
+    diagnostics = [Diagnostic(2, "NameError: name 'x' is not defined"), Diagnostic(5, "SyntaxError: oops")]
+    assert format_diagnostics(diagnostics, "main.py") == (
+        "main.py, line 2: NameError: name 'x' is not defined\nmain.py, line 5: SyntaxError: oops"
+    )
+
+def test_check_file(tmp_path):
+    file_path = tmp_path / "main.py"
+    file_path.write_text("import helpers\nprint(helpres)\n")
+    (tmp_path / "helpers.py").write_text("")
+    diagnostics = asyncio.run(check_file(str(file_path), str(tmp_path)))
+    assert [str(d) for d in diagnostics] == ["line 2: NameError: name 'helpres' is not defined (did you mean 'helpers'?)"]
+
+@pytest.mark.parametrize("value, enabled", [(None, True), ("1", True), ("0", False), ("off", False)])
+def test_can_be_disabled(monkeypatch, value, enabled):
+    if value is None:
+        monkeypatch.delenv("THOTH_STATIC_CHECK", raising=False)
+    else:
+        monkeypatch.setenv("THOTH_STATIC_CHECK", value)
+    assert static_check_enabled() is enabled
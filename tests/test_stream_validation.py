@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from auto_coder.stream_validation import StreamingCodeValidator, looks_like_code
+from auto_coder.code_generator import CodeGenerator
+from llm_chat.chat_handler import ChatHandler
+
+def validate(text, chunk=7):
+    """(finish() result, validator) after feeding `text` in small deltas, as a stream would."""
+    validator = StreamingCodeValidator()
+    for start in range(0, len(text), chunk):
+        if not validator.feed(text[start:start + chunk]):
+            return False, validator
+    return validator.finish(), validator
+
+def test_plain_code():
+    ok, validator = validate("import os\n\ndef main():\n    print(os.getcwd())\n\nmain()\n")
+    assert ok
+    assert validator.code.startswith("import os")
+
+def test_fences_and_preamble_are_stripped():
+    ok, validator = validate("Here is the script:\n\n```python\nx = 1\nprint(x)\n```\n\nIt prints 1.\n")
+    assert ok
+    assert validator.code == "x = 1\nprint(x)"
+
+def test_trailing_explanation_is_dropped():
+    ok, validator = validate("print('hi')\n\nThis script prints a greeting.\n")
+    assert ok
+    assert validator.code == "print('hi')"
+
+@pytest.mark.parametrize("trailer", [
+    "Explanation:\n- It prints a greeting.\n",
+    "Note: run it with python.\n",
+    "Note: run it with `python main.py`.",
+    "**Explanation:**\nThe code calls print().\n",
+    "## How it works\nThe script calls greet(), which prints hi.\n",
+    "Usage: python main.py\n",
+    "Output:\nhi\n",
+])
+def test_trailer_after_code_is_cut_off(trailer):
+    ok, validator = validate("def greet():\n    print('hi')\n\ngreet()\n\n" + trailer)
+    assert ok, validator.reason
+    assert validator.code == "def greet():\n    print('hi')\n\ngreet()"
+
+def test_code_after_explanation_is_rejected():
+    ok, validator = validate("print('hi')\n\nThis script prints a greeting.\nprint('again')\n")
+    assert not ok
+    assert "prose" in validator.reason
+
+def test_invalid_statement_aborts_while_streaming():
+    text = "def broken(:\n    pass\n\n" + "print('never needed')\n" * 50
+    validator = StreamingCodeValidator()
+    fed = 0
+    for line in text.splitlines(keepends=True):
+        fed += 1
+        if not validator.feed(line):
+            break
+    assert validator.reason.startswith("line 1:")
+    # Caught as soon as the next statement started, not at the end of the stream
+    assert fed < 10
+
+def test_statement_spanning_lines_is_not_rejected_early():
+    ok, _ = validate("values = [\n    1,\n    2,\n]\ntext = '''a\nb'''\nprint(values, text)\n", chunk=1)
+    assert ok
+
+def test_long_preamble_is_rejected():
+    validator = StreamingCodeValidator(max_preamble=50)
+    assert not validator.feed("I will now explain at some length what the program does.\n" * 2)
+    assert "no code" in validator.reason
+
+def test_empty_response():
+    ok, validator = validate("Sorry, I cannot help with that.")
+    assert not ok
+    assert validator.reason == "no code in the response"
+
+@pytest.mark.parametrize("first_line", [
+    "match command:\n    case 'go':\n        pass\n    case _:\n        pass",
+    "x: int = 0",
+    "global counter",
+    "del cache",
+    "pass",
+    "assert True",
+    "raise SystemExit(0)",
+])
+def test_any_statement_may_start_the_code(first_line):
+    ok, validator = validate(f"{first_line}\nprint('done')\n")
+    assert ok, validator.reason
+
+@pytest.mark.parametrize("line", ["Sure!", "Sure", "Here is the code:", "Usage: python", "This script prints things."])
+def test_prose_does_not_look_like_code(line):
+    assert not looks_like_code(line)
+
+def test_invalid_response_is_requested_again(fake_provider):
+    good = "def add(a, b):\n    return a + b\n\nprint(add(1, 2))\n"
+    fake_provider.set_script([{"match": "Generate Python code", "responses": ["def add(a, b:\n    return a + b\n\nprint(add(1, 2))\n", good]}])
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    code = asyncio.run(generator.generate_candidate("add two numbers"))
+    assert code == good.strip()
+    assert fake_provider.calls == 2
+
+def test_code_with_a_trailer_is_not_requested_again(fake_provider):
+    fake_provider.set_script([{"match": "Generate Python code", "response": "print('hi')\n\nExplanation:\nIt prints hi.\n"}])
+    generator = CodeGenerator(ChatHandler("fake-model", cache=False, session_store=False))
+    assert asyncio.run(generator.generate_candidate("greet")) == "print('hi')"
+    assert fake_provider.calls == 1
@@ -0,0 +1,134 @@
+import asyncio
+from auto_coder.executor import CodeExecutor
+from auto_coder.test_selection import (
+    PYTEST_ARGS, changed_names, collect_tests, find_test_files, project_tests, select_tests, strip_pytest_frames,
+)
+
+MODULE = '''import math
+
+LIMIT = 10
+
+def area(r):
+    return math.pi * r * r
+
+def perimeter(r):
+    return 2 * math.pi * r
+
+class Store:
+    size = 0
+
+    def add(self, item):
+        self.size += 1
+
+    def clear(self):
+        self.size = 0
+'''
+
+def test_changed_functions_are_named():
+    assert changed_names(MODULE, MODULE) == set()
+    assert changed_names(MODULE, MODULE.replace("2 * math.pi", "math.tau")) == {"perimeter"}
+
+def test_changed_methods_count_as_their_class():
+    assert changed_names(MODULE, MODULE.replace("self.size = 0", "self.size = None")) == {"Store", "clear"}
+    assert changed_names(MODULE, MODULE.replace("    size = 0", "    size = 1")) == {"Store"}
+
+def test_added_and_removed_definitions_are_changes():
+    assert changed_names(MODULE, MODULE + "\ndef volume(r):\n    return r\n") == {"volume"}
+    assert changed_names(MODULE, MODULE.replace("    def clear(self):\n        self.size = 0\n", "")) == {"Store", "clear"}
+
+def test_module_level_changes_select_everything():
+    assert changed_names(MODULE, MODULE.replace("LIMIT = 10", "LIMIT = 20")) is None
+    assert changed_names(MODULE, "def broken(:\n") is None
+
+TESTS = '''import pytest
+from shapes import area, perimeter, Store
+
+@pytest.fixture
+def store():
+    return Store()
+
+def make_circle():
+    return area(2)
+
+def test_area():
+    assert area(1) > 3
+
+def test_perimeter():
+    assert perimeter(1) > 6
+
+def test_helper():
+    assert make_circle() > 12
+
+def test_store(store):
+    store.add(1)
+
+class TestStore:
+    def setup_method(self):
+        self.store = Store()
+
+    def test_size(self):
+        assert self.store.size == 0
+'''
+
+def write_project(tmp_path):
+    (tmp_path / "shapes.py").write_text(MODULE)
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_shapes.py").write_text(TESTS)
+    (tmp_path / "tests" / "helpers.py").write_text("")
+    (tmp_path / "tests" / "store_test.py").write_text("def test_nothing():\n    pass\n")
+    (tmp_path / ".venv").mkdir()
+    (tmp_path / ".venv" / "test_vendored.py").write_text("")
+
+def test_find_test_files_uses_pytest_naming(tmp_path):
+    write_project(tmp_path)
+    assert find_test_files(str(tmp_path)) == ["tests/store_test.py", "tests/test_shapes.py"]
+
+def test_tests_are_selected_by_the_names_they_use(tmp_path):
+    write_project(tmp_path)
+    tests = collect_tests(str(tmp_path), ["tests/test_shapes.py", "tests/missing_test.py"])
+    node = "tests/test_shapes.py::"
+    assert [node_id for node_id, _ in tests] == [node + name for name in
+                                                  ("test_area", "test_perimeter", "test_helper", "test_store", "TestStore::test_size")]
+    assert select_tests(tests, {"perimeter"}) == [node + "test_perimeter"]
+    # Through a module helper
+    assert select_tests(tests, {"area"}) == [node + "test_area", node + "test_helper"]
+    # Through a fixture, and a class's setup method
+    assert select_tests(tests, {"Store"}) == [node + "test_store", node + "TestStore::test_size"]
+    assert select_tests(tests, {"unused"}) == []
+
+def test_project_tests_can_be_disabled(tmp_path, monkeypatch):
+    assert project_tests(str(tmp_path)) is None
+    write_project(tmp_path)
+    assert len(project_tests(str(tmp_path))) == 6
+    monkeypatch.setenv("THOTH_FIX_TESTS", "0")
+    assert project_tests(str(tmp_path)) is None
+
+def test_pytest_frames_are_stripped():
+    output = (
+        "Traceback (most recent call last):\n"
+        '  File "/usr/lib/python3/site-packages/_pytest/runner.py", line 341, in from_call\n'
+        "    result = func()\n"
+        '  File "/usr/lib/python3/site-packages/pluggy/_callers.py", line 102, in _multicall\n'
+        "    res = hook_impl.function(*args)\n"
+        '  File "/project/tests/test_shapes.py", line 12, in test_area\n'
+        "    assert area(1) > 4\n"
+        "AssertionError\n"
+    )
+    assert strip_pytest_frames(output) == (
+        "Traceback (most recent call last):\n"
+        '  File "/project/tests/test_shapes.py", line 12, in test_area\n'
+        "    assert area(1) > 4\n"
+        "AssertionError\n"
+    )
+
+def test_selected_tests_run_under_the_executor(tmp_path):
+    write_project(tmp_path)
+    (tmp_path / "shapes.py").write_text(MODULE.replace("2 * math.pi * r", "r"))
+    tests = project_tests(str(tmp_path))
+    selected = select_tests(tests, changed_names(MODULE, (tmp_path / "shapes.py").read_text()))
+    result = asyncio.run(CodeExecutor(run_cache=False).run_module("pytest", str(tmp_path), PYTEST_ARGS + selected))
+    assert not result.success
+    output = strip_pytest_frames(result.stdout + result.stderr)
+    assert "test_perimeter" in output
+    assert "1 failed" in output
+    assert "/_pytest/" not in output
@@ -0,0 +1,119 @@
+import json
+import time
+import signal
+import asyncio
+import pytest
+from utils import tracing
+from utils.tracing import SamplingProfiler, add_event, configure_tracing, current_trace_id, start_span, tracer
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    """Path of the JSONL file spans are written to during the test."""
+    monkeypatch.setattr(tracer, "configured", tracer.configured)
+    path = tmp_path / "traces.jsonl"
+    tracer.configure(str(path))
+    yield path
+    tracer.configure()
+
+def read_spans(path):
+    return {span["name"]: span for span in map(json.loads, path.read_text().splitlines())}
+
+def test_nested_spans_share_a_trace_and_point_to_their_parent(traces):
+    with start_span("request", kind="chat") as root:
+        with start_span("llm.complete"):
+            with start_span("llm.provider_call") as call:
+                call.set(prompt_tokens=5)
+                add_event("retry", attempt=1)
+        assert current_trace_id() == root.trace_id
+    assert current_trace_id() is None
+
+    lines = traces.read_text().splitlines()
+    # Written as each span ends, innermost first
+    assert [json.loads(line)["name"] for line in lines] == ["llm.provider_call", "llm.complete", "request"]
+    spans = read_spans(traces)
+    assert {span["traceId"] for span in spans.values()} == {root.trace_id}
+    assert spans["request"]["parentSpanId"] is None
+    assert spans["llm.complete"]["parentSpanId"] == spans["request"]["spanId"]
+    assert spans["llm.provider_call"]["parentSpanId"] == spans["llm.complete"]["spanId"]
+    assert spans["request"]["attributes"] == {"kind": "chat"}
+    assert spans["llm.provider_call"]["attributes"] == {"prompt_tokens": 5}
+    assert spans["llm.provider_call"]["events"][0]["name"] == "retry"
+    assert spans["request"]["status"]["code"] == "OK"
+    assert spans["request"]["endTimeUnixNano"] >= spans["llm.complete"]["endTimeUnixNano"]
+
+def test_separate_requests_get_separate_traces(traces):
+    for _ in range(2):
+        with start_span("request"):
+            pass
+    trace_ids = [json.loads(line)["traceId"] for line in traces.read_text().splitlines()]
+    assert len(set(trace_ids)) == 2
+    assert all(len(trace_id) == 32 for trace_id in trace_ids)
+
+def test_failed_span_records_the_error(traces):
+    with pytest.raises(ValueError):
+        with start_span("request"):
+            raise ValueError("boom")
+    assert read_spans(traces)["request"]["status"] == {"code": "ERROR", "message": "ValueError: boom"}
+
+def test_tasks_inherit_the_current_span(traces):
+    async def work():
+        with start_span("task"):
+            await asyncio.sleep(0)
+
+    async def main():
+        with start_span("request"):
+            await asyncio.gather(work(), work())
+
+    asyncio.run(main())
+    lines = [json.loads(line) for line in traces.read_text().splitlines()]
+    root = next(span for span in lines if span["name"] == "request")
+    tasks = [span for span in lines if span["name"] == "task"]
+    assert len(tasks) == 2
+    assert all(span["parentSpanId"] == root["spanId"] and span["traceId"] == root["traceId"] for span in tasks)
+
+def test_unsampled_traces_are_not_written(traces):
+    tracer.sample_rate = 0.0
+    with start_span("request") as root:
+        with start_span("child") as child:
+            pass
+    assert not root.sampled and not child.sampled
+    assert traces.read_text() == ""
+
+def test_configure_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer, "configured", tracer.configured)
+    path = tmp_path / "env.jsonl"
+    monkeypatch.setenv("THOTH_TRACE", str(path))
+    monkeypatch.setenv("THOTH_TRACE_SAMPLE", "0.5")
+    monkeypatch.delenv("THOTH_PROFILE", raising=False)
+    try:
+        configure_tracing(force=True)
+        assert tracer.sample_rate == 0.5
+        # Under a sampled parent, so the 0.5 sample rate cannot drop it
+        with start_span("request", parent=tracing.Span("root")):
+            pass
+        assert read_spans(path)["request"]
+    finally:
+        tracer.configure()
+
+@pytest.mark.skipif(not SamplingProfiler.available(), reason="needs setitimer on the main thread")
+def test_profiler_attributes_samples_to_spans_and_stops_cleanly(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer, "configured", tracer.configured)
+    previous_handler = signal.getsignal(signal.SIGPROF)
+    profile_path = tmp_path / "profile.folded"
+    tracer.configure(profile=True, profile_path=str(profile_path))
+    try:
+        assert tracer.profiler is not None
+        with start_span("busy") as span:
+            deadline = time.monotonic() + 10
+            while span.cpu_samples < 3 and time.monotonic() < deadline:
+                sum(range(1000))
+        assert span.cpu_samples >= 3
+    finally:
+        tracer.configure()
+
+    assert tracer.profiler is None
+    assert signal.getitimer(signal.ITIMER_PROF) == (0.0, 0.0)
+    assert signal.getsignal(signal.SIGPROF) == previous_handler
+    stacks = profile_path.read_text().splitlines()
+    assert any(line.startswith("busy;") for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
@@ -0,0 +1,119 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from llm_chat.chat_handler import ChatHandler
+from llm_chat.session_store import SessionPool, SessionStore, load_session_secret, session_token
+from webui.app import create_app
+from utils.metrics import metrics
+
+@pytest.fixture
+def client(agent_manager):
+    app = create_app(agent_manager, max_connections=1, sessions=SessionPool(agent_manager.chat_handler))
+    with TestClient(app) as client:
+        yield client
+
+def chat(websocket, message):
+    websocket.send_text(message)
+    while True:
+        frame = websocket.receive_json()
+        if frame["type"] != "delta":
+            return frame
+
+def test_chat_over_websocket(client, fake_provider):
+    fake_provider.set_script([{"match": "hello", "response": "Hi there"}])
+    with client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        frame = chat(websocket, "hello")
+    assert frame["type"] == "done"
+    assert frame["content"] == "Hi there"
+
+def test_binary_frame_closes_connection_and_frees_its_slot(client):
+    with client.websocket_connect("/ws") as websocket:
+        websocket.receive_json()
+        websocket.send_bytes(b"\x00\x01")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1003
+
+    # With max_connections=1 the next client only gets in if the first one was cleaned up
+    with client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        assert chat(websocket, "still there?")["type"] == "done"
+
+def test_disconnect_frees_connection_slot(client):
+    for _ in range(3):
+        with client.websocket_connect("/ws") as websocket:
+            websocket.receive_json()
+            assert chat(websocket, "hi")["type"] == "done"
+
+def test_metrics_endpoint(client, fake_provider, monkeypatch):
+    monkeypatch.setattr(metrics, "counters", {})
+    monkeypatch.setattr(metrics, "histograms", {})
+    monkeypatch.setattr(metrics, "sessions", type(metrics.sessions)())
+    with client.websocket_connect("/ws") as websocket:
+        session_id = websocket.receive_json()["session_id"]
+        assert chat(websocket, "hello")["type"] == "done"
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert 'thoth_requests_total{model="fake-model",status="ok"} 1' in lines
+    assert 'thoth_time_to_first_token_seconds_count{model="fake-model"} 1' in lines
+    assert f'thoth_session_requests_total{{session="{session_id}"}} 1' in lines
+
+@pytest.fixture
+def stored_client(agent_manager, tmp_path):
+    """A client whose conversations are saved to a session store."""
+    chat_handler = ChatHandler("fake-model", cache=False, session_store=SessionStore(str(tmp_path / "sessions.sqlite")))
+    agent_manager.chat_handler = chat_handler
+    app = create_app(agent_manager, sessions=SessionPool(chat_handler), session_secret=b"secret")
+    with TestClient(app) as client:
+        yield client
+
+def test_sessions_are_resumed_and_read_with_their_token(stored_client, fake_provider):
+    fake_provider.set_script([{"match": "", "response": "Hi there"}])
+    with stored_client.websocket_connect("/ws") as websocket:
+        frame = websocket.receive_json()
+        assert chat(websocket, "hello")["type"] == "done"
+    session_id, token = frame["session_id"], frame["token"]
+    assert token == session_token(b"secret", session_id)
+
+    with stored_client.websocket_connect(f"/ws?session={session_id}&token={token}") as websocket:
+        assert websocket.receive_json()["session_id"] == session_id
+    response = stored_client.get(f"/sessions/{session_id}", params={"token": token})
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()["messages"]] == ["hello", "Hi there"]
+
+@pytest.mark.parametrize("token", [None, "", "0" * 64])
+def test_sessions_cannot_be_read_or_resumed_without_their_token(stored_client, fake_provider, token):
+    with stored_client.websocket_connect("/ws") as websocket:
+        session_id = websocket.receive_json()["session_id"]
+        assert chat(websocket, "hello")["type"] == "done"
+
+    params = {"token": token} if token is not None else {}
+    response = stored_client.get(f"/sessions/{session_id}", params=params)
+    assert response.status_code == 404
+    query = f"/ws?session={session_id}" + (f"&token={token}" if token is not None else "")
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with stored_client.websocket_connect(query) as websocket:
+            websocket.receive_json()
+    assert closed.value.code == 1008
+
+def test_a_client_cannot_pick_its_own_session_id(stored_client):
+    with pytest.raises(WebSocketDisconnect):
+        with stored_client.websocket_connect("/ws?session=chosen-by-client") as websocket:
+            websocket.receive_json()
+
+def test_session_secret(tmp_path, monkeypatch):
+    monkeypatch.setenv("THOTH_SESSION_SECRET", "configured")
+    assert load_session_secret() == b"configured"
+    monkeypatch.delenv("THOTH_SESSION_SECRET")
+    # Store disabled: a new key per process
+    assert load_session_secret() != load_session_secret()
+    monkeypatch.setenv("THOTH_SESSION_STORE", "1")
+    monkeypatch.setenv("THOTH_SESSION_STORE_PATH", str(tmp_path / "sessions.sqlite"))
+    monkeypatch.setattr("llm_chat.session_store._session_store", None)
+    secret = load_session_secret()
+    assert load_session_secret() == secret
+    assert (tmp_path / "session_secret").stat().st_mode & 0o777 == 0o600
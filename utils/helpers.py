@@ -1,7 +1,8 @@
 import logging
-import os
 from rich.logging import RichHandler
 from rich.console import Console
+from rich.table import Table
+from utils.metrics import metrics, LATENCY_BUCKETS
 
 console = Console()
 
@@ -14,13 +15,44 @@ def setup_logging():
     )
 
 def log_token_usage(component, usage):
-    console.print(f"[bold yellow]Token usage for {component}:[/bold yellow]")
-    console.print(f"  Prompt tokens: {usage.prompt_tokens}")
-    console.print(f"  Completion tokens: {usage.completion_tokens}")
-    console.print(f"  Total tokens: {usage.total_tokens}")
+    """Attribute a call's token usage to `component`; per-model totals are recorded by ChatHandler."""
+    if not usage:
+        return
+    metrics.inc("thoth_component_tokens_total", usage.get("prompt_tokens", 0), component=component, kind="prompt")
+    metrics.inc("thoth_component_tokens_total", usage.get("completion_tokens", 0), component=component, kind="completion")
+    logging.getLogger(__name__).debug(
+        "Token usage for %s: prompt=%s completion=%s total=%s",
+        component, usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("total_tokens")
+    )
+
+def print_usage_summary():
+    rows = metrics.model_summary()
+    if not rows:
+        console.print("[yellow]No model calls recorded yet.[/yellow]")
+        return
+    table = Table(title="Usage This Session")
+    for column in ("Model", "Requests", "Errors", "429s", "Retries", "Cache hits", "Prompt tokens", "Completion tokens", "p50", "p95"):
+        table.add_column(column, justify="left" if column == "Model" else "right")
+    for row in rows:
+        # Counted locally because the provider reported no usage
+        approximate = "~" if row["estimated_tokens"] else ""
+        if approximate:
+            table.caption = "~ includes locally estimated token counts"
+        table.add_row(
+            row["model"], str(row["requests"]), str(row["errors"]), str(row["throttled"]), str(row["retries"]),
+            str(row["cache_hits"]), f"{approximate}{row['prompt_tokens']}", f"{approximate}{row['completion_tokens']}",
+            _format_seconds(row["p50"]), _format_seconds(row["p95"]),
+        )
+    console.print(table)
+
+def _format_seconds(value):
+    if value is None:
+        return "-"
+    return f"> {LATENCY_BUCKETS[-1]:g}s" if value == float("inf") else f"<= {value:g}s"
 
 def print_colored(text, color):
     console.print(f"[{color}]{text}[/{color}]")
 
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
\ No newline at end of file
+    # ANSI clear written by rich; no shell is spawned on every menu redraw
+    console.clear()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import time
+import bisect
+from collections import OrderedDict
+
+# Upper bounds in seconds; chosen to separate cache hits, fast models and long generations
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Per-session totals kept in memory (and exported) for the most recently active sessions only
+MAX_TRACKED_SESSIONS = 1000
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf if it is past the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    """In-memory counters and fixed-bucket histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.sessions = OrderedDict()
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def counter(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def total(self, name, **labels):
+        """Sum of the counters named `name` whose labels include `labels`, whatever their other labels."""
+        wanted = set(labels.items())
+        return sum(value for (counter, counter_labels), value in self.counters.items()
+                   if counter == name and wanted <= set(counter_labels))
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def record_session(self, session_id, tokens=0, requests=0, errors=0):
+        totals = self.sessions.pop(session_id, None) or {"tokens": 0, "requests": 0, "errors": 0}
+        totals["tokens"] += tokens
+        totals["requests"] += requests
+        totals["errors"] += errors
+        self.sessions[session_id] = totals
+        if len(self.sessions) > MAX_TRACKED_SESSIONS:
+            self.sessions.popitem(last=False)
+
+    def render_prometheus(self):
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for session_id, totals in self.sessions.items():
+            for field, value in totals.items():
+                name = f"thoth_session_{field}_total"
+                header(name, "counter")
+                lines.append(f"{name}{_format_labels((('session', session_id),))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def model_summary(self):
+        """Per-model rows for the CLI: requests, errors, cache hits, tokens and latency percentiles."""
+        models = sorted({dict(labels)["model"] for (name, labels) in self.counters if name == "thoth_requests_total"})
+        rows = []
+        for model in models:
+            latency = self.histogram("thoth_request_duration_seconds", model=model)
+            rows.append({
+                "model": model,
+                "requests": self.counter("thoth_requests_total", model=model, status="ok"),
+                "errors": self.counter("thoth_requests_total", model=model, status="error"),
+                "throttled": self.counter("thoth_requests_total", model=model, status="throttled"),
+                "retries": self.counter("thoth_retries_total", model=model),
+                "cache_hits": self.counter("thoth_cache_hits_total", model=model),
+                "prompt_tokens": self.total("thoth_tokens_total", model=model, kind="prompt"),
+                "completion_tokens": self.total("thoth_tokens_total", model=model, kind="completion"),
+                "estimated_tokens": self.total("thoth_tokens_total", model=model, source="estimate"),
+                "p50": latency.quantile(0.5) if latency else None,
+                "p95": latency.quantile(0.95) if latency else None,
+            })
+        return rows
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+metrics = MetricsRegistry()
+metrics.describe("thoth_requests_total", "Provider calls by model and outcome (ok, error, throttled).")
+metrics.describe("thoth_retries_total", "Provider calls that were retried.")
+metrics.describe("thoth_cache_hits_total", "Requests answered from the response cache.")
+metrics.describe("thoth_coalesced_requests_total", "Requests that shared an identical in-flight provider call.")
+metrics.describe("thoth_cache_misses_total", "Requests that missed the response cache.")
+metrics.describe("thoth_tokens_total", "Tokens by kind (prompt, completion) and source (provider, or estimate when counted locally).")
+metrics.describe("thoth_request_duration_seconds", "Provider call latency.")
+metrics.describe("thoth_time_to_first_token_seconds", "Latency until the first streamed token.")
+metrics.describe("thoth_routed_requests_total", "Routed requests by model, request kind and outcome (ok, failed, retracted).")
+metrics.describe("thoth_escalations_total", "Fast-model answers that were escalated to the primary model, by request kind.")
+metrics.describe("thoth_hedged_requests_total", "Requests that were also sent to a backup model after exceeding the primary's p95 latency.")
+metrics.describe("thoth_failovers_total", "Requests served by a backup model because the primary's circuit was open or its call failed.")
+metrics.describe("thoth_rejected_code_responses_total", "Code responses discarded as invalid Python, by whether the stream was cut short (streaming) or not (complete).")
+metrics.describe("thoth_component_tokens_total", "Tokens by calling component (chat, generate_code, ...).")
+metrics.describe("thoth_session_tokens_total", "Tokens used by a conversation session (most recent sessions only).")
+metrics.describe("thoth_session_requests_total", "Provider calls made by a conversation session.")
+metrics.describe("thoth_session_errors_total", "Failed provider calls made by a conversation session.")
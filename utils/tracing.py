@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import random
+import atexit
+import signal
+import secrets
+import threading
+import contextvars
+from collections import Counter
+
+# Field names follow the OpenTelemetry span model (trace/span ids as lowercase hex, unix-nano times)
+SERVICE_NAME = "thoth-bot"
+DEFAULT_TRACE_PATH = os.path.join(".thoth", "traces.jsonl")
+DEFAULT_PROFILE_PATH = os.path.join(".thoth", "profile.folded")
+DEFAULT_PROFILE_INTERVAL = 0.005
+
+_current_span = contextvars.ContextVar("thoth_current_span", default=None)
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None, sampled=True):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.sampled = parent.sampled if parent else sampled
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = "UNSET"
+        self.status_message = None
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.cpu_samples = 0
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def add_event(self, name, **attributes):
+        self.events.append({"name": name, "timeUnixNano": time.time_ns(), "attributes": attributes})
+
+    def set_error(self, error):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration(self):
+        end = self.end_time or time.time_ns()
+        return (end - self.start_time) / 1e9
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.set_error(exc)
+        self.end()
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended from another context, e.g. an async generator closed by a different task
+            pass
+        return False
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        if self.status == "UNSET":
+            self.status = "OK"
+        if self.sampled and tracer.exporter:
+            tracer.exporter.export(self)
+
+    def to_dict(self):
+        attributes = dict(self.attributes)
+        if self.cpu_samples:
+            attributes["profile.cpu_samples"] = self.cpu_samples
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_time,
+            "endTimeUnixNano": self.end_time,
+            "durationMs": round((self.end_time - self.start_time) / 1e6, 3),
+            "status": {"code": self.status, "message": self.status_message},
+            "attributes": attributes,
+            "events": self.events,
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+class JsonlExporter:
+    """Appends one JSON object per finished span to `path`."""
+
+    def __init__(self, path=DEFAULT_TRACE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class SamplingProfiler:
+    """CPU sampling profiler driven by SIGPROF.
+
+    The handler runs on the main thread in whatever context is executing, so each
+    sample is attributed to the span that was actually on the CPU. Samples are
+    written as folded stacks (flamegraph.pl / speedscope format) rooted at the span name.
+    """
+
+    def __init__(self, interval=DEFAULT_PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous_handler = None
+
+    @staticmethod
+    def available():
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def start(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def _sample(self, signum, frame):
+        span = _current_span.get()
+        if span is not None:
+            span.cpu_samples += 1
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(span.name if span is not None else "(no span)")
+        self.stacks[";".join(reversed(frames))] += 1
+
+    def write(self, path=DEFAULT_PROFILE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(f"{stack} {count}\n")
+
+class Tracer:
+    def __init__(self):
+        self.exporter = None
+        self.sample_rate = 1.0
+        self.profiler = None
+        self.profile_path = DEFAULT_PROFILE_PATH
+        self.configured = False
+
+    def configure(self, trace_path=None, sample_rate=1.0, profile=False, profile_path=DEFAULT_PROFILE_PATH):
+        self.shutdown()
+        self.configured = True
+        self.exporter = JsonlExporter(trace_path) if trace_path else None
+        self.sample_rate = sample_rate
+        self.profile_path = profile_path
+        if profile and SamplingProfiler.available():
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+
+    def shutdown(self):
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.write(self.profile_path)
+            self.profiler = None
+        if self.exporter:
+            self.exporter.close()
+            self.exporter = None
+
+tracer = Tracer()
+atexit.register(tracer.shutdown)
+
+def configure_tracing(force=False):
+    """Set up tracing from the environment (once, unless `force`); call after .env has been loaded.
+
+    THOTH_TRACE: `1` to write spans to .thoth/traces.jsonl, or a file path.
+    THOTH_TRACE_SAMPLE: fraction of traces to export (default 1.0).
+    THOTH_PROFILE: `1` to run the sampling profiler (written to .thoth/profile.folded on exit).
+    """
+    if tracer.configured and not force:
+        return
+    setting = os.getenv("THOTH_TRACE", "")
+    trace_path = None
+    if setting and setting.lower() not in ("0", "false", "no"):
+        trace_path = DEFAULT_TRACE_PATH if setting.lower() in ("1", "true", "yes") else setting
+    profile = os.getenv("THOTH_PROFILE", "").lower() in ("1", "true", "yes")
+    tracer.configure(trace_path, float(os.getenv("THOTH_TRACE_SAMPLE", "1.0")), profile)
+
+def start_span(name, parent=None, **attributes):
+    """Child span of `parent` (default: the current span), or a new trace's root span.
+
+    Use it as a context manager so the span becomes current for the code inside;
+    asyncio tasks created inside inherit it.
+    """
+    parent = parent or _current_span.get()
+    sampled = True if parent else random.random() < tracer.sample_rate
+    return Span(name, parent, attributes, sampled)
+
+def current_span():
+    return _current_span.get()
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+def add_event(name, **attributes):
+    span = _current_span.get()
+    if span is not None:
+        span.add_event(name, **attributes)
@@ -1,13 +1,31 @@
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
+import os
 import asyncio
 from agents.agent_manager import AgentManager
+from llm_chat.session_store import SessionPool, check_session_token, load_session_secret, session_token
+from utils.metrics import metrics
+from utils.tracing import start_span, configure_tracing
 
-def create_app(agent_manager: AgentManager):
+MAX_CONNECTIONS = 500
+# Messages a client may queue while its previous reply is still streaming
+MAX_PENDING_MESSAGES = 4
+# Provider streams in flight across all connections
+MAX_ACTIVE_STREAMS = 32
+
+def create_app(agent_manager: AgentManager, max_connections=MAX_CONNECTIONS, max_pending_messages=MAX_PENDING_MESSAGES, max_active_streams=MAX_ACTIVE_STREAMS, sessions: SessionPool = None, session_secret: bytes = None):
+    configure_tracing()
     app = FastAPI()
+    connections = set()
+    # Conversations outlive connections: a client reconnects with ?session=<id>&token=<token>
+    sessions = sessions or SessionPool.from_env(agent_manager.chat_handler)
+    # Session ids show up in /metrics and traces, so only the token issued with a session grants access to it
+    session_secret = session_secret or load_session_secret()
+    stream_slots = asyncio.Semaphore(max_active_streams)
 
-    app.mount("/static", StaticFiles(directory="webui/static"), name="static")
+    if os.path.isdir("webui/static"):
+        app.mount("/static", StaticFiles(directory="webui/static"), name="static")
 
     @app.get("/")
     async def get():
@@ -15,22 +33,89 @@ def create_app(agent_manager: AgentManager):
             content = f.read()
         return HTMLResponse(content)
 
+    @app.get("/metrics")
+    async def get_metrics():
+        # Prometheus text exposition format
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/sessions/{session_id}")
+    async def get_session(session_id: str, token: str = None):
+        store = agent_manager.chat_handler.session_store
+        # A wrong token looks the same as a missing session
+        if store is None or not check_session_token(session_secret, session_id, token) or not store.exists(session_id):
+            return JSONResponse({"error": "unknown session"}, status_code=404)
+        return {"session_id": session_id, "messages": [{"role": role, "content": content} for role, content in store.messages(session_id)]}
+
     @app.websocket("/ws")
     async def websocket_endpoint(websocket: WebSocket):
+        if len(connections) >= max_connections:
+            # 1013: try again later
+            await websocket.close(code=1013)
+            return
+        requested = websocket.query_params.get("session")
+        if requested and not check_session_token(session_secret, requested, websocket.query_params.get("token")):
+            # 1008: policy violation; a conversation is only resumed with the token it was issued with
+            await websocket.close(code=1008)
+            return
+
         await websocket.accept()
-        while True:
-            data = await websocket.receive_text()
-            await agent_manager.add_task("chat", message=data)
-            response = await asyncio.wait_for(get_next_response(agent_manager), timeout=30.0)
-            await websocket.send_text(response)
-
-    async def get_next_response(agent_manager):
-        while True:
-            await agent_manager.process_next_task()
-            if agent_manager.chat_handler.conversation_history:
-                last_message = agent_manager.chat_handler.conversation_history[-1]
-                if last_message["role"] == "assistant":
-                    return last_message["content"]
-            await asyncio.sleep(0.1)
-
-    return app
\ No newline at end of file
+        connections.add(websocket)
+        # Each connection has its own conversation; provider clients are shared
+        session = sessions.acquire(requested)
+        await websocket.send_json({"type": "session", "session_id": session.session_id,
+                                   "token": session_token(session_secret, session.session_id)})
+        inbox = asyncio.Queue(maxsize=max_pending_messages)
+        receiver = asyncio.create_task(receive_messages(websocket, inbox))
+        try:
+            while True:
+                getter = asyncio.ensure_future(inbox.get())
+                # The receiver ending means the client is gone, even if its None did not fit in the inbox
+                await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                data = getter.result()
+                if data is None:
+                    break
+                await reply(websocket, data, session)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            connections.discard(websocket)
+            sessions.release(session)
+            # Last: when the endpoint itself is being cancelled, this await is cancelled too
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+
+    async def receive_messages(websocket, inbox):
+        # A full inbox stops us reading, which pushes back on the client through TCP
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") is None:
+                    # 1003: unsupported data; the protocol only uses text messages
+                    await websocket.close(code=1003)
+                    break
+                await inbox.put(message["text"])
+        finally:
+            # Wake the endpoint on every exit path; if the inbox is full it notices this task ending
+            if not inbox.full():
+                inbox.put_nowait(None)
+
+    async def reply(websocket, data, session):
+        # The trace id goes back to the client so a slow reply can be found in the trace log
+        with start_span("ws.message", session=session.session_id) as span:
+            async with stream_slots:
+                span.set(stream_slot_wait_ms=round(span.duration * 1000, 3))
+                stream = agent_manager.stream_chat(data, chat_handler=session)
+                async for delta in stream:
+                    await websocket.send_json({"type": "delta", "content": delta})
+            if stream.error:
+                span.set_error(stream.error)
+                await websocket.send_json({"type": "error", "content": str(stream.error), "trace_id": span.trace_id})
+            else:
+                await websocket.send_json({"type": "done", "content": stream.text, "usage": stream.usage, "trace_id": span.trace_id})
+
+    return app